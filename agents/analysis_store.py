@@ -0,0 +1,482 @@
+"""Stores for completed analyses and job status.
+
+AnalysisStore (default) replaces the API's plain dict, which kept every
+analysis for the life of the process. Entries are evicted least-recently-used
+once the store exceeds its entry or byte budget, and expire after a TTL.
+Large text blobs (the raw document dump, unparsed model output) can be
+spilled to files so that only the structured results stay resident; they are
+read back transparently.
+
+SqliteAnalysisStore keeps the same interface in a SQLite file (WAL mode), so
+every uvicorn worker on the host sees the same results and job status, and
+results survive restarts. It is used when ANALYSIS_STORE_PATH is set.
+
+document_store holds pre-extracted documents by content hash, with the
+same backend choice and TTL but its own entry budget.
+"""
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Callable, Dict, Any, Iterator, NamedTuple, Optional, Tuple
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+MAX_ENTRIES = int(os.environ.get("ANALYSIS_STORE_MAX_ENTRIES", "500"))
+MAX_BYTES = int(os.environ.get("ANALYSIS_STORE_MAX_MB", "256")) * 1024 * 1024
+TTL_S = float(os.environ.get("ANALYSIS_STORE_TTL_S", str(24 * 3600)))
+# Unset: keep blobs in memory
+SPILL_DIR = os.environ.get("ANALYSIS_STORE_SPILL_DIR") or None
+SPILL_MIN_BYTES = int(os.environ.get("ANALYSIS_STORE_SPILL_KB", "16")) * 1024
+# Set to use the shared SQLite store instead of per-process memory
+STORE_PATH = os.environ.get("ANALYSIS_STORE_PATH") or None
+# Pre-extracted documents (POST /documents); kept in their own store so
+# analysis listings and exports never include them
+DOCUMENT_MAX_ENTRIES = int(os.environ.get("DOCUMENT_STORE_MAX_ENTRIES", "200"))
+
+# (state key, field) pairs holding large free text worth spilling
+SPILL_FIELDS = (
+    ("extracted_data", "full_text"),
+    ("ico_result", "raw_response"),
+    ("eu_act_result", "raw_response"),
+    ("dpa_result", "raw_response"),
+    ("iso_result", "raw_response"),
+)
+
+EVICTION_REASONS = ("lru", "bytes", "ttl")
+
+
+class _Entry(NamedTuple):
+    record: Dict[str, Any]
+    size: int
+    stored_at: float
+    spilled: Dict[Tuple[str, str], str]   # (state key, field) -> file path
+    spilled_bytes: int
+
+
+def record_size(record: Dict[str, Any]) -> int:
+    """Approximate resident size of a record: its JSON-encoded length."""
+    return len(json.dumps(record, default=str, separators=(",", ":")))
+
+
+class AnalysisStore(MutableMapping):
+    """Thread-safe, dict-like {job_id: {"state": ..., "created_at": ...}} with bounds.
+
+    Reading an entry refreshes its LRU position but not its TTL.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = MAX_ENTRIES,
+        max_bytes: int = MAX_BYTES,
+        ttl_s: float = TTL_S,
+        spill_dir: Optional[str] = SPILL_DIR,
+        spill_min_bytes: int = SPILL_MIN_BYTES,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.spill_dir = spill_dir
+        self.spill_min_bytes = spill_min_bytes
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._spilled_bytes = 0
+        self._lock = threading.Lock()
+        # Held across update()'s read and write; separate so _lock stays short
+        self._update_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = dict.fromkeys(EVICTION_REASONS, 0)
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    # ── Mapping interface ─────────────────────────────────────────────────
+
+    def __getitem__(self, job_id: str) -> Dict[str, Any]:
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(job_id)
+            if entry is None:
+                self.misses += 1
+                raise KeyError(job_id)
+            self._entries.move_to_end(job_id)
+            self.hits += 1
+        return self._rehydrate(entry)
+
+    def __setitem__(self, job_id: str, record: Dict[str, Any]) -> None:
+        record, spilled, spilled_bytes = self._spill(job_id, record)
+        entry = _Entry(record, record_size(record), time.monotonic(), spilled, spilled_bytes)
+        with self._lock:
+            if job_id in self._entries:
+                # Same job id means same spill paths; keep the files just written
+                self._drop(job_id, keep=frozenset(spilled.values()))
+            self._entries[job_id] = entry
+            self._bytes += entry.size
+            self._spilled_bytes += entry.spilled_bytes
+            self._expire()
+            self._enforce_bounds()
+
+    def __delitem__(self, job_id: str) -> None:
+        with self._lock:
+            if job_id not in self._entries:
+                raise KeyError(job_id)
+            self._drop(job_id)
+
+    def __contains__(self, job_id: object) -> bool:
+        with self._lock:
+            self._expire()
+            return job_id in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        # Iterate a snapshot so callers can read entries while iterating
+        with self._lock:
+            self._expire()
+            return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._expire()
+            return len(self._entries)
+
+    def update(
+        self, job_id: str, change: Callable[[Dict[str, Any]], Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """Replace an entry with change(entry), with no other update in between.
+
+        Returns the new record, or None (without calling change) if the entry
+        is missing or expired.
+        """
+        with self._update_lock:
+            record = self.get(job_id)
+            if record is None:
+                return None
+            record = change(record)
+            self[job_id] = record
+            return record
+
+    def put_job(self, job: Dict[str, Any]) -> None:
+        """Job status is only shared by the SQLite store; in memory the JobManager is authoritative."""
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._expire()
+            return {
+                "backend": "memory",
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "spilled_bytes": self._spilled_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": dict(self.evictions),
+            }
+
+    # ── Internals (callers hold the lock unless noted) ────────────────────
+
+    def _expire(self) -> None:
+        if self.ttl_s <= 0:
+            return
+        cutoff = time.monotonic() - self.ttl_s
+        expired = [job_id for job_id, entry in self._entries.items() if entry.stored_at < cutoff]
+        for job_id in expired:
+            self._drop(job_id)
+            self.evictions["ttl"] += 1
+
+    def _enforce_bounds(self) -> None:
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+            self.evictions["lru"] += 1
+        # Always keep the newest entry, even if it alone exceeds the budget
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            self._drop(next(iter(self._entries)))
+            self.evictions["bytes"] += 1
+
+    def _drop(self, job_id: str, keep: frozenset = frozenset()) -> None:
+        entry = self._entries.pop(job_id)
+        self._bytes -= entry.size
+        # What this entry wrote, not what is on disk now: an overwrite has
+        # already replaced the files at the same paths
+        self._spilled_bytes -= entry.spilled_bytes
+        for path in entry.spilled.values():
+            if path in keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _spill(self, job_id: str, record: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[Tuple[str, str], str], int]:
+        """Move large SPILL_FIELDS to files. Copies what it changes; no lock needed."""
+        spilled: Dict[Tuple[str, str], str] = {}
+        total = 0
+        state = record.get("state")
+        if not self.spill_dir or not isinstance(state, dict):
+            return record, spilled, total
+
+        state = dict(state)
+        for key, field in SPILL_FIELDS:
+            holder = state.get(key)
+            if not isinstance(holder, dict):
+                continue
+            text = holder.get(field)
+            if not isinstance(text, str):
+                continue
+            data = text.encode("utf-8")
+            if len(data) < self.spill_min_bytes:
+                continue
+            path = os.path.join(self.spill_dir, f"{job_id}.{key}.{field}.txt")
+            with open(path, "wb") as fh:
+                fh.write(data)
+            state[key] = {k: v for k, v in holder.items() if k != field}
+            spilled[(key, field)] = path
+            total += len(data)
+        return {**record, "state": state}, spilled, total
+
+    @staticmethod
+    def _rehydrate(entry: _Entry) -> Dict[str, Any]:
+        """The record with spilled fields read back. No lock needed."""
+        if not entry.spilled:
+            return entry.record
+        state = dict(entry.record["state"])
+        for (key, field), path in entry.spilled.items():
+            try:
+                with open(path, encoding="utf-8") as fh:
+                    text = fh.read()
+            except FileNotFoundError:
+                continue   # evicted concurrently; serve the structured results
+            state[key] = {**state[key], field: text}
+        return {**entry.record, "state": state}
+
+
+
+# ── SQLite ────────────────────────────────────────────────────────────────
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    job_id              TEXT PRIMARY KEY,
+    created_at          TEXT NOT NULL,
+    stored_at           REAL NOT NULL,
+    document_type       TEXT,
+    uk_alignment_score  INTEGER,
+    frameworks          TEXT,
+    size                INTEGER NOT NULL,
+    record              TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS analyses_stored_at ON analyses (stored_at);
+CREATE INDEX IF NOT EXISTS analyses_score ON analyses (uk_alignment_score);
+
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id      TEXT PRIMARY KEY,
+    status      TEXT NOT NULL,
+    updated_at  REAL NOT NULL,
+    job         TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_updated_at ON jobs (updated_at);
+"""
+
+
+class SqliteAnalysisStore(MutableMapping):
+    """Dict-like analysis store in a SQLite file shared by every process on the host.
+
+    Records are stored as JSON alongside indexed metadata (creation time,
+    document type, score, frameworks). Retention is by TTL and entry count,
+    oldest first; reads never write, so they don't contend with writers.
+    Reports themselves stay as files in the report cache (REPORT_CACHE_DIR),
+    which workers already share.
+    """
+
+    def __init__(self, path: str, max_entries: int = MAX_ENTRIES, ttl_s: float = TTL_S):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = dict.fromkeys(EVICTION_REASONS, 0)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections aren't shareable
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _record_lookup(self, hit: bool) -> None:
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _record_evictions(self, reason: str, count: int) -> None:
+        with self._stats_lock:
+            self.evictions[reason] += count
+
+    def _cutoff(self) -> float:
+        return time.time() - self.ttl_s if self.ttl_s > 0 else float("-inf")
+
+    # ── Mapping interface ─────────────────────────────────────────────────
+
+    def __getitem__(self, job_id: str) -> Dict[str, Any]:
+        row = self._connection().execute(
+            "SELECT record FROM analyses WHERE job_id = ? AND stored_at >= ?", (job_id, self._cutoff())
+        ).fetchone()
+        self._record_lookup(row is not None)
+        if row is None:
+            raise KeyError(job_id)
+        return json.loads(row[0])
+
+    def __setitem__(self, job_id: str, record: Dict[str, Any]) -> None:
+        conn = self._connection()
+        self._write(conn, job_id, record)
+        self._prune(conn)
+
+    def __delitem__(self, job_id: str) -> None:
+        cursor = self._connection().execute("DELETE FROM analyses WHERE job_id = ?", (job_id,))
+        if cursor.rowcount == 0:
+            raise KeyError(job_id)
+
+    def __contains__(self, job_id: object) -> bool:
+        return self._connection().execute(
+            "SELECT 1 FROM analyses WHERE job_id = ? AND stored_at >= ?", (job_id, self._cutoff())
+        ).fetchone() is not None
+
+    def __iter__(self) -> Iterator[str]:
+        rows = self._connection().execute(
+            "SELECT job_id FROM analyses WHERE stored_at >= ? ORDER BY stored_at", (self._cutoff(),)
+        ).fetchall()
+        return iter([row[0] for row in rows])
+
+    def __len__(self) -> int:
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM analyses WHERE stored_at >= ?", (self._cutoff(),)
+        ).fetchone()[0]
+
+    def update(
+        self, job_id: str, change: Callable[[Dict[str, Any]], Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """Replace a row with change(row) in one write transaction.
+
+        BEGIN IMMEDIATE takes the database's write lock before the read, so
+        an update from another process waits rather than reading the same
+        row and overwriting this one. Returns the new record, or None (without
+        calling change) if the row is missing or expired.
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT record FROM analyses WHERE job_id = ? AND stored_at >= ?", (job_id, self._cutoff())
+            ).fetchone()
+            self._record_lookup(row is not None)
+            if row is None:
+                conn.execute("ROLLBACK")
+                return None
+            record = change(json.loads(row[0]))
+            self._write(conn, job_id, record)
+            self._prune(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return record
+
+    # ── Job status ────────────────────────────────────────────────────────
+
+    def put_job(self, job: Dict[str, Any]) -> None:
+        """Record a job's latest status so any worker can answer GET /jobs/{id}."""
+        self._connection().execute(
+            "INSERT OR REPLACE INTO jobs (job_id, status, updated_at, job) VALUES (?, ?, ?, ?)",
+            (job["job_id"], job["status"], time.time(), json.dumps(job, default=str)),
+        )
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute("SELECT job FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def stats(self) -> Dict[str, Any]:
+        # Expired rows linger until the next write prunes them; don't count them
+        entries, size = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analyses WHERE stored_at >= ?", (self._cutoff(),)
+        ).fetchone()
+        with self._stats_lock:
+            return {
+                "backend": "sqlite",
+                "path": self.path,
+                "entries": entries,
+                "bytes": size,
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": dict(self.evictions),
+            }
+
+    def _write(self, conn: sqlite3.Connection, job_id: str, record: Dict[str, Any]) -> None:
+        state = record.get("state") or {}
+        synthesis = state.get("synthesis") or {}
+        payload = json.dumps(record, default=str, separators=(",", ":"))
+        conn.execute(
+            "INSERT OR REPLACE INTO analyses "
+            "(job_id, created_at, stored_at, document_type, uk_alignment_score, frameworks, size, record) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                job_id,
+                record.get("created_at") or "",
+                time.time(),
+                (state.get("extracted_data") or {}).get("document_type"),
+                synthesis.get("uk_alignment_score"),
+                ",".join(state.get("selected_frameworks") or []),
+                len(payload),
+                payload,
+            ),
+        )
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        if self.ttl_s > 0:
+            cutoff = self._cutoff()
+            expired = conn.execute("DELETE FROM analyses WHERE stored_at < ?", (cutoff,)).rowcount
+            conn.execute("DELETE FROM jobs WHERE updated_at < ?", (cutoff,))
+            if expired:
+                self._record_evictions("ttl", expired)
+        excess = conn.execute(
+            "DELETE FROM analyses WHERE job_id IN ("
+            "SELECT job_id FROM analyses ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        ).rowcount
+        if excess:
+            self._record_evictions("lru", excess)
+
+
+def open_analysis_store(path: Optional[str] = STORE_PATH, max_entries: int = MAX_ENTRIES):
+    """The configured store: SQLite if ANALYSIS_STORE_PATH is set, else in memory."""
+    if path:
+        return SqliteAnalysisStore(path, max_entries)
+    return AnalysisStore(max_entries)
+
+
+def _documents_path(path: Optional[str]) -> Optional[str]:
+    """Sibling SQLite file for the document store, e.g. analyses.documents.db."""
+    if not path:
+        return None
+    root, ext = os.path.splitext(path)
+    return f"{root}.documents{ext}"
+
+
+analysis_store = open_analysis_store()
+document_store = open_analysis_store(_documents_path(STORE_PATH), DOCUMENT_MAX_ENTRIES)
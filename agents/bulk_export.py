@@ -0,0 +1,202 @@
+"""Bulk PDF report export for a portfolio of analyses.
+
+reportlab is pure Python and CPU-bound, so reports are rendered across a
+process pool. Each worker writes its PDF to a scratch file and the parent
+appends finished files to the zip archive as they complete, keeping at most
+`max_in_flight` reports pending at once. Memory use therefore depends on the
+window size, not on how many reports are in the bundle.
+
+stream_reports serves the API's export instead: it renders through the
+report cache, so reports already downloaded cost nothing, and yields the
+archive in chunks as it is built rather than writing it out first.
+"""
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import BinaryIO, Dict, Any, Iterable, Iterator, List, Mapping, Optional, Set, Tuple, Union
+import io
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import zipfile
+
+from agents.report_cache import REPORT_INPUT_KEYS, open_report
+from agents.reporter import build_report
+from agents.synthesizer import synthesize_gaps
+
+
+WORKERS = int(os.environ.get("BULK_EXPORT_WORKERS", "0")) or os.cpu_count() or 1
+
+# Framework codes as used in selected_frameworks, per result key
+_FRAMEWORK_CODES = {"ico_result": "ICO", "eu_act_result": "EU_AI_ACT", "dpa_result": "DPA", "iso_result": "ISO_42001"}
+
+_UNSAFE_NAME = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+def report_inputs(record: Dict[str, Any]) -> Dict[str, Any]:
+    """The subset of a stored analysis that build_report needs.
+
+    Accepts a final graph state, a stored record ({"state": ...}) or an
+    /analyze response ({"analysis": ...}). Synthesis is recomputed when it is
+    missing, e.g. for payloads saved without it. The raw document text is
+    dropped so it isn't pickled across to the workers.
+    """
+    state = record.get("state") or record.get("analysis") or record
+    inputs = {key: state.get(key) for key in REPORT_INPUT_KEYS}
+    extracted = dict(inputs["extracted_data"] or {})
+    extracted.pop("full_text", None)
+    inputs["extracted_data"] = extracted
+
+    if not inputs["synthesis"]:
+        selected = state.get("selected_frameworks") or [
+            code for key, code in _FRAMEWORK_CODES.items() if inputs[key]
+        ]
+        inputs["synthesis"] = synthesize_gaps(
+            ico_result=inputs["ico_result"],
+            eu_act_result=inputs["eu_act_result"],
+            dpa_result=inputs["dpa_result"],
+            iso_result=inputs["iso_result"],
+            selected_frameworks=selected,
+        )
+    return inputs
+
+
+def _render_to_file(inputs: Dict[str, Any], path: str) -> int:
+    """Worker entry point: render one report to `path` and return its size."""
+    build_report(path, **inputs)
+    return os.path.getsize(path)
+
+
+def report_filename(analysis_id: str, taken: Optional[Set[str]] = None) -> str:
+    """Zip member name for an analysis' report.
+
+    Different ids can sanitise to the same name (e.g. "a/b" and "a_b"); with
+    `taken`, a counter is appended until the name is unused, and it is added
+    to the set. manifest.json maps each id to its file.
+    """
+    stem = f"compliance_report_{_UNSAFE_NAME.sub('_', analysis_id)}"
+    name = f"{stem}.pdf"
+    if taken is None:
+        return name
+    counter = 2
+    while name in taken:
+        name = f"{stem}_{counter}.pdf"
+        counter += 1
+    taken.add(name)
+    return name
+
+
+def export_reports(
+    analyses: Union[Mapping[str, Dict[str, Any]], Iterable[Tuple[str, Dict[str, Any]]]],
+    output: Union[str, BinaryIO],
+    workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Render a report per analysis into a zip archive at `output`.
+
+    `analyses` maps analysis id → stored analysis (see report_inputs); an
+    iterable of pairs is consumed lazily. A report that fails to render is
+    left out of the archive and listed in manifest.json and the returned
+    summary rather than aborting the whole export.
+    """
+    items = analyses.items() if isinstance(analyses, Mapping) else analyses
+    workers = workers or WORKERS
+    max_in_flight = max_in_flight or workers * 2
+    written: List[Dict[str, Any]] = []
+    failed: List[Dict[str, str]] = []
+    names: Set[str] = set()
+
+    # PDFs are already compressed; storing them saves CPU for no loss in size
+    with tempfile.TemporaryDirectory(prefix="report-export-") as scratch, \
+            zipfile.ZipFile(output, "w", compression=zipfile.ZIP_STORED) as archive, \
+            ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        pending: Dict[Any, Tuple[str, str]] = {}
+
+        def drain(until_below: int) -> None:
+            while pending and len(pending) >= until_below:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    analysis_id, path = pending.pop(future)
+                    try:
+                        size = future.result()
+                    except Exception as exc:
+                        failed.append({"id": analysis_id, "error": f"{type(exc).__name__}: {exc}"})
+                        continue
+                    name = report_filename(analysis_id, names)
+                    archive.write(path, name)
+                    os.remove(path)
+                    written.append({"id": analysis_id, "file": name, "bytes": size})
+
+        for index, (analysis_id, record) in enumerate(items):
+            analysis_id = str(analysis_id)
+            try:
+                inputs = report_inputs(record)
+            except Exception as exc:
+                failed.append({"id": analysis_id, "error": f"{type(exc).__name__}: {exc}"})
+                continue
+            path = os.path.join(scratch, f"{index}.pdf")
+            pending[pool.submit(_render_to_file, inputs, path)] = (analysis_id, path)
+            drain(max_in_flight)
+        drain(1)
+
+        archive.writestr("manifest.json", json.dumps({"reports": written, "failed": failed}, indent=2))
+
+    return {
+        "reports": len(written),
+        "failed": failed,
+        "bytes": sum(item["bytes"] for item in written),
+    }
+
+
+class _Chunks(io.RawIOBase):
+    """Write-only, unseekable sink that collects what zipfile writes until taken."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def stream_reports(
+    analyses: Union[Mapping[str, Dict[str, Any]], Iterable[Tuple[str, Dict[str, Any]]]],
+    chunk_size: int = 1024 * 1024,
+) -> Iterator[bytes]:
+    """Yield a zip archive of reports, as export_reports writes, chunk by chunk.
+
+    Reports come from the report cache (rendered on a miss), one at a time,
+    so at most one report is being rendered or copied at once. The archive
+    is never held whole in memory or on disk.
+    """
+    items = analyses.items() if isinstance(analyses, Mapping) else analyses
+    written: List[Dict[str, Any]] = []
+    failed: List[Dict[str, str]] = []
+    names: Set[str] = set()
+    sink = _Chunks()
+
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as archive:
+        for analysis_id, record in items:
+            analysis_id = str(analysis_id)
+            try:
+                report, _ = open_report(report_inputs(record))
+            except Exception as exc:
+                failed.append({"id": analysis_id, "error": f"{type(exc).__name__}: {exc}"})
+                continue
+            name = report_filename(analysis_id, names)
+            size = 0
+            with report, archive.open(name, "w") as member:
+                while chunk := report.read(chunk_size):
+                    member.write(chunk)
+                    size += len(chunk)
+                    yield sink.take()
+            written.append({"id": analysis_id, "file": name, "bytes": size})
+        archive.writestr("manifest.json", json.dumps({"reports": written, "failed": failed}, indent=2))
+    yield sink.take()
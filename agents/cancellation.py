@@ -0,0 +1,41 @@
+"""Cooperative cancellation for pipeline runs.
+
+A run is cancelled by setting its threading.Event. Code on the pipeline's
+path (graph nodes, model calls, PDF page loop) calls check_cancelled() at
+safe points and stops with Cancelled; nothing is interrupted mid-call, so
+a model request already in flight finishes but no further ones are made.
+
+The event travels in a context variable rather than through every function
+signature, so agents stay unaware of it.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+import threading
+
+_cancel_event: ContextVar[Optional[threading.Event]] = ContextVar("cancel_event", default=None)
+
+
+class Cancelled(Exception):
+    """The current run was cancelled."""
+
+
+@contextmanager
+def cancellable(event: threading.Event) -> Iterator[threading.Event]:
+    """Make `event` the cancel signal for code run inside the block."""
+    token = _cancel_event.set(event)
+    try:
+        yield event
+    finally:
+        _cancel_event.reset(token)
+
+
+def cancel_requested() -> bool:
+    event = _cancel_event.get()
+    return event is not None and event.is_set()
+
+
+def check_cancelled() -> None:
+    """Raise Cancelled if the current run has been cancelled (no-op outside a run)."""
+    if cancel_requested():
+        raise Cancelled("Run was cancelled")
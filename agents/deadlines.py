@@ -0,0 +1,64 @@
+"""Time budgets for pipeline runs.
+
+A run may have an overall deadline (set by the API around a whole analysis)
+and each graph node gets its own timeout; whichever ends first applies.
+The active deadline travels in a context variable, like the cancel event
+in agents.cancellation. Model clients are built with a request timeout
+derived from it, and check_deadline() stops work between calls once it
+has passed.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+import os
+import time
+
+# Whole analysis through the API, in seconds (0 = no limit)
+ANALYSIS_DEADLINE_S = float(os.environ.get("ANALYSIS_DEADLINE_S", "900"))
+# Each graph node, in seconds (0 = no limit)
+NODE_TIMEOUT_S = float(os.environ.get("NODE_TIMEOUT_S", "300"))
+# Client retries; the remaining budget is split across the attempts
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "2"))
+
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The current run or node ran out of time."""
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """Limit code inside the block to `seconds` (or less, if an outer deadline is sooner)."""
+    if seconds <= 0:
+        yield
+        return
+    current = _deadline.get()
+    ends = time.monotonic() + seconds
+    token = _deadline.set(ends if current is None else min(current, ends))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the active deadline, or None if there is none."""
+    ends = _deadline.get()
+    return None if ends is None else ends - time.monotonic()
+
+
+def check_deadline() -> None:
+    """Raise DeadlineExceeded if the active deadline has passed (no-op without one)."""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("Deadline exceeded")
+
+
+def client_limits() -> Dict[str, Any]:
+    """timeout/max_retries kwargs for a chat model client built under the active deadline."""
+    left = remaining()
+    if left is None:
+        return {"max_retries": LLM_MAX_RETRIES}
+    check_deadline()
+    return {"timeout": left / (LLM_MAX_RETRIES + 1), "max_retries": LLM_MAX_RETRIES}
@@ -1,8 +1,9 @@
 from langchain_core.language_models import BaseChatModel
 from typing import Dict, Any
-import json
-import ast
 from prompts.dpa_prompt import get_dpa_prompt
+from agents.schemas import DPAAnalysis
+from agents.evidence import schema_for_mode, rehydrate_evidence
+from agents.parsing import invoke_for_json, count_critical_clauses, not_evaluated_result
 
 
 def analyze_dpa_compliance(extracted_data: Dict[str, Any], model: BaseChatModel) -> Dict[str, Any]:
@@ -10,60 +11,19 @@ def analyze_dpa_compliance(extracted_data: Dict[str, Any], model: BaseChatModel)
     
     prompt = get_dpa_prompt(extracted_data)
     
-    response = model.invoke(prompt)
+    result, content = invoke_for_json(model, prompt, schema_for_mode(DPAAnalysis), "dpa")
     
-    try:
-        # Handle AIMessage response
-        content = response.content if hasattr(response, 'content') else str(response)
-        # Clean potential markdown formatting
-        content = content.strip()
-        if content.startswith("```json"):
-            content = content[7:]
-        if content.startswith("```"):
-            content = content[3:]
-        if content.endswith("```"):
-            content = content[:-3]
-        content = content.strip()
-
-        # Robust JSON parsing
-        try:
-            result = json.loads(content)
-        except json.JSONDecodeError:
-            start = content.find("{")
-            end = content.rfind("}")
-            if start != -1 and end != -1 and end > start:
-                inner = content[start : end + 1]
-                try:
-                    result = json.loads(inner)
-                except json.JSONDecodeError:
-                    result = ast.literal_eval(inner)
-            else:
-                result = ast.literal_eval(content)
-
-        if not isinstance(result, dict):
-            raise ValueError("Parsed analysis is not a JSON object")
-
-        # Count critical gaps
-        critical_gaps_count = sum(
-            1 for key, value in result.items()
-            if isinstance(value, dict) and value.get("priority") == "CRITICAL"
+    if result is None:
+        return not_evaluated_result(
+            "UK DPA / GDPR",
+            content,
+            "UK DPA/GDPR analysis could not be generated from the model output. Treat this framework as not yet assessed."
         )
-        
-        result["critical_gaps_count"] = critical_gaps_count
-        result["score"] = result.get("overall_score", 0)
-        result["framework"] = "UK DPA / GDPR"
-        
-        return result
-        
-    except Exception:
-        return {
-            "framework": "UK DPA / GDPR",
-            "score": 0,
-            "critical_gaps_count": 0,
-            "status": "NOT_EVALUATED",
-            "raw_response": content if 'content' in locals() else "",
-            "critical_gaps": [],
-            "priority_actions": [],
-            "strengths": [],
-            "compliance_summary": "UK DPA/GDPR analysis could not be generated from the model output. Treat this framework as not yet assessed."
-        }
+
+    result["critical_gaps_count"] = count_critical_clauses(result)
+    result["score"] = result.get("overall_score", 0)
+    # Anchor-mode evidence comes back as line references; restore the quotes
+    rehydrate_evidence(result, extracted_data.get("full_text", ""))
+    result["framework"] = "UK DPA / GDPR"
+    
+    return result
@@ -0,0 +1,101 @@
+"""Evidence as line anchors instead of verbatim quotes.
+
+In "anchors" mode the document is sent with each non-empty line prefixed by
+an anchor ([L1], [L2], ...) and agents return compact references such as
+"L12-L14" in `evidence_refs`. Quotes are rehydrated locally from `full_text`,
+so the model no longer spends output tokens echoing the document back.
+"quotes" mode keeps the original schema.
+"""
+from functools import lru_cache
+from pydantic import BaseModel, Field, create_model
+from typing import Dict, Any, List, Type
+import os
+import re
+
+
+EVIDENCE_MODE = os.environ.get("EVIDENCE_MODE", "quotes").lower()
+if EVIDENCE_MODE not in ("quotes", "anchors"):
+    EVIDENCE_MODE = "quotes"
+
+MAX_QUOTE_CHARS = 300
+MAX_LINES_PER_REF = 6
+
+_REF_PATTERN = re.compile(r"L?(\d+)(?:\s*[-–]\s*L?(\d+))?", re.IGNORECASE)
+
+
+def anchor_lines(text: str) -> List[str]:
+    """Non-empty lines of `text`; line N in the prompt is index N-1 here."""
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def number_lines(text: str) -> str:
+    """Render `text` with an [L<n>] anchor in front of every non-empty line."""
+    return "\n".join(f"[L{i}] {line}" for i, line in enumerate(anchor_lines(text), start=1))
+
+
+def resolve_refs(refs: List[Any], lines: List[str]) -> List[str]:
+    """Turn references like "L12" or "L12-L14" back into quotes."""
+    quotes = []
+    for ref in refs:
+        match = _REF_PATTERN.search(str(ref))
+        if not match:
+            continue
+        start = int(match.group(1))
+        end = int(match.group(2) or start)
+        if end < start:
+            start, end = end, start
+        end = min(end, start + MAX_LINES_PER_REF - 1, len(lines))
+        if start < 1 or start > end:
+            continue
+        quote = " ".join(lines[start - 1:end])
+        if len(quote) > MAX_QUOTE_CHARS:
+            quote = quote[:MAX_QUOTE_CHARS].rstrip() + "..."
+        quotes.append(quote)
+    return quotes
+
+
+def rehydrate_evidence(result: Dict[str, Any], full_text: str) -> Dict[str, Any]:
+    """Fill `evidence_found` from `evidence_refs` throughout an agent result.
+
+    Covers the result itself, each clause object, and nested obligation
+    groups (EU AI Act). Mutates and returns `result`.
+    """
+    lines = anchor_lines(full_text or "")
+
+    def _fill(node: Dict[str, Any], depth: int) -> None:
+        if isinstance(node.get("evidence_refs"), list):
+            node["evidence_found"] = resolve_refs(node["evidence_refs"], lines)
+        if depth < 2:
+            for value in node.values():
+                if isinstance(value, dict):
+                    _fill(value, depth + 1)
+
+    _fill(result, 0)
+    return result
+
+
+@lru_cache(maxsize=None)
+def anchored_schema(schema: Type[BaseModel]) -> Type[BaseModel]:
+    """Derive a copy of `schema` with every `evidence_found` swapped for `evidence_refs`."""
+    fields: Dict[str, Any] = {}
+    for name, field in schema.model_fields.items():
+        annotation = field.annotation
+        if name == "evidence_found":
+            fields["evidence_refs"] = (
+                List[str],
+                Field(default_factory=list, description="Line anchors from the document, e.g. 'L12' or 'L12-L14'"),
+            )
+        elif isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            nested = anchored_schema(annotation)
+            if field.is_required():
+                fields[name] = (nested, Field(description=field.description))
+            else:
+                fields[name] = (nested, Field(default_factory=nested, description=field.description))
+        else:
+            fields[name] = (annotation, field)
+    return create_model(f"{schema.__name__}Anchored", __doc__=schema.__doc__, **fields)
+
+
+def schema_for_mode(schema: Type[BaseModel]) -> Type[BaseModel]:
+    """The response schema to bind for the configured evidence mode."""
+    return anchored_schema(schema) if EVIDENCE_MODE == "anchors" else schema
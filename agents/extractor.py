@@ -1,24 +1,23 @@
-import pdfplumber
-from typing import Dict, Any
 from langchain_core.language_models import BaseChatModel
-import json
+from typing import Dict, Any
+from agents.schemas import ExtractedDocument
+from agents.parsing import invoke_for_json
+# Re-exported: callers read PDFs through this module
+from agents.pdf_text import PdfSource, read_pdf_text  # noqa: F401
 
 
-def extract_pdf_data(pdf_path: str, model: BaseChatModel) -> Dict[str, Any]:
+def extract_pdf_data(pdf_source: PdfSource, model: BaseChatModel) -> Dict[str, Any]:
     """Extract structured data from PDF using pdfplumber + Perplexity"""
     
     # Extract raw text – capture more pages for richer context
-    with pdfplumber.open(pdf_path) as pdf:
-        text = ""
-        for page in pdf.pages[:30]:  # Process up to first 30 pages (~50-60k chars)
-            text += (page.extract_text() or "") + "\n"
+    text, extraction_stats = read_pdf_text(pdf_source)
 
     # Prompt Perplexity to structure the data & detect document type
     extraction_prompt = f"""
 You are extracting key information from a document related to AI systems.
 
 Document text (first portion):
-{text[:50000]}
+{text}
 
 FIRST: Determine the document type:
 - "GUIDANCE"  = Policy, playbook, framework, best-practice guide (tells others what to do)
@@ -48,23 +47,9 @@ Return ONLY valid JSON with the following keys:
 CRITICAL: Output ONLY JSON – no markdown, no commentary.
 """
     
-    response = model.invoke(extraction_prompt)
+    extracted, _ = invoke_for_json(model, extraction_prompt, ExtractedDocument, "extractor")
     
-    try:
-        # Handle AIMessage response
-        content = response.content if hasattr(response, 'content') else str(response)
-        # Clean potential markdown formatting
-        content = content.strip()
-        if content.startswith("```json"):
-            content = content[7:]
-        if content.startswith("```"):
-            content = content[3:]
-        if content.endswith("```"):
-            content = content[:-3]
-        content = content.strip()
-        
-        extracted = json.loads(content)
-    except json.JSONDecodeError:
+    if extracted is None:
         # Fallback extraction
         extracted = {
             "document_type": "SYSTEM_SPEC",
@@ -90,5 +75,6 @@ CRITICAL: Output ONLY JSON – no markdown, no commentary.
     extracted.setdefault("pii_categories", [])
     extracted.setdefault("region_residency", "Not specified")
 
-    extracted["full_text"] = text[:50000]
+    extracted["full_text"] = text
+    extracted["extraction_stats"] = extraction_stats
     return extracted
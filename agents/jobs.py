@@ -0,0 +1,553 @@
+"""Background job queue for long-running analyses.
+
+Submitting work returns a Job immediately; a fixed pool of worker threads
+runs queued jobs, highest-priority lane first and in submission order
+within a lane. Throughput is bounded by the pool size rather than by how
+many HTTP connections are held open. The work function is generic: it
+receives its Job so it can report progress as it goes.
+
+Admission is bounded too: a lane's backlog and each owner's (API key's)
+active jobs are capped, and a rejected submission raises JobRejected with
+an estimate of when capacity should free up, instead of queueing without
+limit until the process runs out of memory.
+
+Each job also keeps an append-only event log. Subscribers (e.g. SSE
+clients) read it by index and sleep on an asyncio.Event until the worker
+publishes more, so any number of them can follow a job for the cost of a
+list slice per event. Events may name a slimmer `retained` payload; once the
+job has finished and its live subscribers have gone, the log keeps only
+those, so finished jobs in history don't pin every partial result.
+
+Cancellation is cooperative: a queued job is dropped at once, and a running
+one has its cancel event set, which the pipeline checks between nodes and
+before each model call (see agents.cancellation).
+"""
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, Any, List, Optional, Set, Tuple
+import asyncio
+import itertools
+import logging
+import math
+import os
+import queue
+import threading
+import time
+from uuid import uuid4
+
+from agents.cancellation import Cancelled, cancellable
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+# Finished jobs kept for status lookups before the oldest are forgotten
+HISTORY = int(os.environ.get("JOB_HISTORY", "1000"))
+
+# Jobs waiting in a lane (and every lane ahead of it) before submissions are rejected
+MAX_QUEUED = int(os.environ.get("JOB_MAX_QUEUED", "100"))
+# Queued + running jobs allowed per owner (API key); 0 = unlimited
+MAX_ACTIVE_PER_OWNER = int(os.environ.get("JOB_MAX_ACTIVE_PER_KEY", "0"))
+
+JOB_STATUSES = ("queued", "running", "done", "failed", "cancelled")
+# Priority lanes, most urgent first: CI gates jump ahead of interactive and bulk work
+PRIORITIES = ("ci", "normal", "bulk")
+REJECT_REASONS = ("queue_full", "quota")
+# Assumed job duration for Retry-After until real runs have been timed
+DEFAULT_RUN_S = 30.0
+
+
+class JobRejected(RuntimeError):
+    """A submission was refused by admission control; retry after `retry_after` seconds."""
+
+    def __init__(self, message: str, reason: str, retry_after: int):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+class Job:
+    """One unit of queued work and its observable state."""
+
+    def __init__(
+        self,
+        fn: Callable[["Job"], Any],
+        kind: str,
+        job_id: Optional[str] = None,
+        on_update: Optional[Callable[[Dict[str, Any]], None]] = None,
+        priority: str = "normal",
+        owner: Optional[str] = None,
+    ):
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority!r}; expected one of {', '.join(PRIORITIES)}")
+        self.id = job_id or str(uuid4())
+        self.kind = kind
+        self.priority = priority
+        # Whose quota the job counts against (not exposed in to_dict)
+        self.owner = owner
+        # Identical submissions coalesced onto this job (see JobManager.submit_once)
+        self.key: Optional[str] = None
+        self.requests = 1
+        self.status = "queued"
+        self.progress: Dict[str, Any] = {}
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = _now()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self._fn: Optional[Callable[["Job"], Any]] = fn
+        self._on_update = on_update
+        self._done = threading.Event()
+        self._callbacks: List[Callable[["Job"], None]] = []
+        self._lock = threading.Lock()
+        self.events: List[Dict[str, Any]] = []
+        # Event index -> payload to keep once the job is finished and unobserved
+        self._retained: Dict[int, Dict[str, Any]] = {}
+        self._subscribers = 0
+        self._waiters: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+        # Cancellation: requested via JobManager.cancel() or when the last
+        # connected waiter goes away (unless someone polls by id)
+        self._cancel = threading.Event()
+        self.keep_partial = False
+        self.watchers = 0
+        self.pinned = False
+
+    @property
+    def finished(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    def watch(self) -> None:
+        """Register a caller holding a connection open for this job's result."""
+        with self._lock:
+            self.watchers += 1
+
+    def unwatch(self) -> bool:
+        """Drop a watcher; True if nobody is left who wants the result."""
+        with self._lock:
+            self.watchers -= 1
+            return self.watchers <= 0 and not self.pinned and not self._done.is_set()
+
+    def add_done_callback(self, callback: Callable[["Job"], None]) -> None:
+        """Call `callback(job)` once the job finishes (immediately if it already has)."""
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def update_progress(self, **progress: Any) -> None:
+        self.progress = {**self.progress, **progress}
+        self._notify()
+
+    def _notify(self) -> None:
+        """Report the job's current status to the manager's observer, if any."""
+        if self._on_update is None:
+            return
+        try:
+            self._on_update(self.to_dict())
+        except Exception:
+            logger.exception("Job %s status update failed", self.id)
+
+    def publish(self, event: str, data: Dict[str, Any], retained: Optional[Dict[str, Any]] = None) -> None:
+        """Append an event to the job's log and wake its subscribers.
+
+        `retained`, if given, replaces `data` in the log once the job has
+        finished and nobody is subscribed any more.
+        """
+        with self._lock:
+            index = len(self.events)
+            self.events.append({"id": index, "event": event, "data": data})
+            if retained is not None:
+                self._retained[index] = retained
+        self._wake()
+
+    def _compact_events(self) -> None:
+        """Swap in retained payloads unless someone is reading the log. Caller holds the lock."""
+        if not self._retained or self._subscribers:
+            return
+        for index, data in self._retained.items():
+            self.events[index] = {**self.events[index], "data": data}
+        self._retained = {}
+
+    def _wake(self) -> None:
+        with self._lock:
+            waiters = list(self._waiters)
+        for loop, wake in waiters:
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:
+                pass  # subscriber's loop has shut down
+
+    async def subscribe(self, start: int = 0, heartbeat: Optional[float] = None) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """Yield events from index `start` onwards until the job finishes.
+
+        With `heartbeat`, yields None after that many idle seconds so callers
+        can keep connections alive.
+        """
+        loop = asyncio.get_running_loop()
+        index = start
+        with self._lock:
+            self._subscribers += 1
+        try:
+            while True:
+                waiter = (loop, asyncio.Event())
+                with self._lock:
+                    pending = self.events[index:]
+                    finished = self._done.is_set()
+                    if not pending and not finished:
+                        self._waiters.add(waiter)
+                if pending:
+                    index += len(pending)
+                    for event in pending:
+                        yield event
+                    continue
+                if finished:
+                    return
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+                finally:
+                    with self._lock:
+                        self._waiters.discard(waiter)
+        finally:
+            with self._lock:
+                self._subscribers -= 1
+                if self._done.is_set():
+                    self._compact_events()
+
+    def _run(self, settle: Callable[[], None]) -> None:
+        """Run the work function; `settle()` runs once the outcome is known, before anyone is told."""
+        self.status = "running"
+        self.started_at = _now()
+        self._notify()
+        self.publish("status", {"status": self.status})
+        try:
+            with cancellable(self._cancel):
+                self.result = self._fn(self)
+            self.status = "done"
+        except Cancelled:
+            logger.info("Job %s (%s) cancelled", self.id, self.kind)
+            self.error = "Cancelled"
+            self.status = "cancelled"
+        except Exception as exc:
+            logger.exception("Job %s (%s) failed", self.id, self.kind)
+            self.error = f"{type(exc).__name__}: {exc}"
+            self.status = "failed"
+        finally:
+            settle()
+            self._finish()
+
+    def _finish(self) -> None:
+        # The closure may hold the upload; finished jobs outlive it in history
+        self._fn = None
+        self.finished_at = _now()
+        self._notify()
+        self.publish("status", {"status": self.status, "error": self.error})
+        with self._lock:
+            # Before _done, so waiters see the compacted log
+            self._compact_events()
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        self._wake()
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception:
+                logger.exception("Job %s done-callback failed", self.id)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "priority": self.priority,
+            "status": self.status,
+            "requests": self.requests,
+            "progress": dict(self.progress),
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """Priority queue drained by a fixed pool of daemon worker threads.
+
+    `on_update`, if set, receives each job's status dict whenever it changes,
+    e.g. to share status with other processes through a common store.
+    """
+
+    def __init__(
+        self,
+        workers: int = WORKERS,
+        history: int = HISTORY,
+        on_update: Optional[Callable[[Dict[str, Any]], None]] = None,
+        max_queued: int = MAX_QUEUED,
+        max_active_per_owner: int = MAX_ACTIVE_PER_OWNER,
+    ):
+        self.workers = workers
+        self.history = history
+        self.on_update = on_update
+        self.max_queued = max_queued
+        self.max_active_per_owner = max_active_per_owner
+        # (lane rank, submission order, job); a job promoted to a faster
+        # lane is queued again and its stale entry skipped when dequeued
+        self._queue: "queue.PriorityQueue[Tuple[int, int, Job]]" = queue.PriorityQueue()
+        self._order = itertools.count()
+        self._jobs: Dict[str, Job] = {}
+        self._inflight: Dict[str, Job] = {}
+        # Ids of registered jobs held back until another job finishes
+        self._deferred: Set[str] = set()
+        self._finished: List[str] = []
+        self._queued = dict.fromkeys(PRIORITIES, 0)
+        self._active_by_owner: Dict[str, int] = {}
+        self._mean_run_s = DEFAULT_RUN_S
+        self.coalesced = 0
+        self.rejected = dict.fromkeys(REJECT_REASONS, 0)
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    def submit(
+        self,
+        fn: Callable[[Job], Any],
+        kind: str = "analysis",
+        job_id: Optional[str] = None,
+        priority: str = "normal",
+        owner: Optional[str] = None,
+    ) -> Job:
+        """Queue `fn(job)` and return the Job without waiting for it.
+
+        Raises JobRejected if the lane's backlog or the owner's quota is full.
+        """
+        job = Job(fn, kind, job_id, on_update=self.on_update, priority=priority, owner=owner)
+        with self._lock:
+            self._admit(job)
+            self._register(job)
+        self._enqueue(job)
+        return job
+
+    def submit_once(
+        self,
+        fn: Callable[[Job], Any],
+        key: str,
+        kind: str = "analysis",
+        priority: str = "normal",
+        owner: Optional[str] = None,
+        after: Optional[Job] = None,
+    ) -> Tuple[Job, bool]:
+        """Single-flight submit: (job, created).
+
+        If a job with the same `key` is still queued or running, the request
+        attaches to it and `fn` is not queued (created is False); every caller
+        then shares that job's id and result. Attaching needs no capacity, so
+        it is never rejected, and a more urgent caller moves a still-queued
+        job up to its lane.
+
+        With `after`, a new job is registered (and counted as queued) at once
+        but only joins the queue when `after` finishes, so no worker sits
+        waiting on it.
+        """
+        with self._lock:
+            job = self._inflight.get(key)
+            if job is not None:
+                job.requests += 1
+                self.coalesced += 1
+                self._promote(job, priority)
+                return job, False
+            job = Job(fn, kind, on_update=self.on_update, priority=priority, owner=owner)
+            self._admit(job)
+            job.key = key
+            self._inflight[key] = job
+            self._register(job)
+            if after is not None:
+                self._deferred.add(job.id)
+        if after is None:
+            self._enqueue(job)
+        else:
+            job._notify()
+            after.add_done_callback(lambda _: self._undefer(job))
+        return job, True
+
+    def inflight(self, key: str, priority: Optional[str] = None) -> Optional[Job]:
+        """The queued or running job submitted under `key`, if any.
+
+        With `priority`, a still-queued job is moved up to that lane, so a job
+        that will wait on it is never dequeued ahead of it.
+        """
+        with self._lock:
+            job = self._inflight.get(key)
+            if job is not None and priority is not None:
+                self._promote(job, priority)
+            return job
+
+    def check_admission(self, priority: str = "normal", owner: Optional[str] = None) -> None:
+        """Raise JobRejected if a job in `priority`'s lane for `owner` would be refused now.
+
+        Lets callers refuse work before doing anything expensive for it (e.g.
+        reading an upload); submit() re-checks atomically.
+        """
+        with self._lock:
+            self._check(priority, owner)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job: Job, keep_partial: bool = False) -> bool:
+        """Cancel a queued or running job; False if it had already finished.
+
+        A queued job is finished as "cancelled" immediately. A running job is
+        asked to stop and finishes at its next cancellation check; with
+        `keep_partial`, its work function may store what it has so far.
+        """
+        with self._lock:
+            if job.finished:
+                return False
+            job.keep_partial = job.keep_partial or keep_partial
+            job._cancel.set()
+            dropped = job.status == "queued"
+            if dropped:
+                # Its queue entry is skipped when a worker dequeues it
+                job.status = "cancelled"
+                job.error = "Cancelled"
+                self._queued[job.priority] -= 1
+                self._release(job)
+        if dropped:
+            job._finish()
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict.fromkeys(JOB_STATUSES, 0)
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return {
+                **counts,
+                "queued_by_priority": dict(self._queued),
+                "workers": self.workers,
+                "max_queued": self.max_queued,
+                "max_active_per_key": self.max_active_per_owner,
+                "mean_run_s": round(self._mean_run_s, 3),
+                "coalesced": self.coalesced,
+                "rejected": dict(self.rejected),
+            }
+
+    # ── Admission (callers hold the lock) ─────────────────────────────────
+
+    def _check(self, priority: str, owner: Optional[str]) -> None:
+        rank = PRIORITIES.index(priority)
+        # Only jobs that would run before this one count against its lane
+        ahead = sum(self._queued[lane] for lane in PRIORITIES[: rank + 1])
+        if self.max_queued > 0 and ahead >= self.max_queued:
+            self.rejected["queue_full"] += 1
+            raise JobRejected(
+                f"Job queue is full ({ahead} {priority}-or-higher priority jobs waiting)",
+                "queue_full",
+                self._retry_after(ahead - self.max_queued + 1),
+            )
+        if owner is not None and self.max_active_per_owner > 0:
+            active = self._active_by_owner.get(owner, 0)
+            if active >= self.max_active_per_owner:
+                self.rejected["quota"] += 1
+                raise JobRejected(
+                    f"API key already has {active} active jobs (limit {self.max_active_per_owner})",
+                    "quota",
+                    self._retry_after(1),
+                )
+
+    def _admit(self, job: Job) -> None:
+        self._check(job.priority, job.owner)
+        self._queued[job.priority] += 1
+        if job.owner is not None:
+            self._active_by_owner[job.owner] = self._active_by_owner.get(job.owner, 0) + 1
+
+    def _promote(self, job: Job, priority: str) -> None:
+        if job.status == "queued" and PRIORITIES.index(priority) < PRIORITIES.index(job.priority):
+            self._queued[job.priority] -= 1
+            self._queued[priority] += 1
+            job.priority = priority
+            if job.id not in self._deferred:
+                self._queue.put((PRIORITIES.index(priority), next(self._order), job))
+
+    def _release(self, job: Job) -> None:
+        """Return a job's admission slot and single-flight key, and file it in history."""
+        if job.owner is not None:
+            remaining = self._active_by_owner.get(job.owner, 1) - 1
+            if remaining > 0:
+                self._active_by_owner[job.owner] = remaining
+            else:
+                self._active_by_owner.pop(job.owner, None)
+        if job.key is not None and self._inflight.get(job.key) is job:
+            del self._inflight[job.key]
+        self._finished.append(job.id)
+        while len(self._finished) > self.history:
+            self._jobs.pop(self._finished.pop(0), None)
+
+    def _retry_after(self, jobs_to_finish: int) -> int:
+        """Seconds until roughly `jobs_to_finish` running or queued jobs have completed."""
+        return max(1, math.ceil(jobs_to_finish / max(1, self.workers) * self._mean_run_s))
+
+    # ── Workers ───────────────────────────────────────────────────────────
+
+    def _register(self, job: Job) -> None:
+        # Caller holds the lock
+        self._jobs[job.id] = job
+        self._start_workers()
+
+    def _enqueue(self, job: Job) -> None:
+        job._notify()
+        self._queue.put((PRIORITIES.index(job.priority), next(self._order), job))
+
+    def _undefer(self, job: Job) -> None:
+        # In its current lane (it may have been promoted while it waited); a
+        # job cancelled meanwhile is skipped when dequeued
+        with self._lock:
+            self._deferred.discard(job.id)
+            entry = (PRIORITIES.index(job.priority), next(self._order), job)
+        self._queue.put(entry)
+
+    def _start_workers(self) -> None:
+        # Caller holds the lock; threads start on first use so importing is free
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"job-worker-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self) -> None:
+        while True:
+            _, _, job = self._queue.get()
+            with self._lock:
+                # A promoted job has two queue entries; the first one dequeued runs it
+                claimed = job.status == "queued"
+                if claimed:
+                    job.status = "running"
+                    self._queued[job.priority] -= 1
+            if not claimed:
+                self._queue.task_done()
+                continue
+            started = time.monotonic()
+            try:
+                job._run(lambda: self._settle(job, time.monotonic() - started))
+            finally:
+                self._queue.task_done()
+
+    def _settle(self, job: Job, run_s: float) -> None:
+        # Runs before the job publishes completion, so nobody who has seen it
+        # finish can coalesce onto it or find its quota slot still taken
+        with self._lock:
+            # Moving average of run time, for Retry-After estimates
+            self._mean_run_s += 0.2 * (run_s - self._mean_run_s)
+            self._release(job)
+
+
+job_manager = JobManager()
@@ -0,0 +1,252 @@
+"""In-process metrics in the Prometheus text exposition format.
+
+A deliberately small counter/gauge/histogram set rather than a client
+library dependency. Recording is a dict lookup and an add under a
+per-metric lock, so it is cheap enough for every node and model call.
+Values that other components already track (cache and store occupancy,
+queue depth) are read from them at scrape time through collectors instead
+of being updated on the hot path.
+
+Metrics are per process: with several uvicorn workers, each exposes its
+own /metrics and Prometheus aggregates them.
+"""
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import math
+import threading
+
+LabelValues = Tuple[str, ...]
+
+# Seconds; spans a fast node (~ms) up to a slow extraction (minutes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labelvalues: Sequence[str]) -> LabelValues:
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labelvalues)}")
+        return tuple(str(value) for value in labelvalues)
+
+    def samples(self) -> Iterable[Tuple[str, str, float]]:
+        """(sample name, rendered labels, value) triples."""
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(f"{name}{labels} {_format_value(value)}" for name, labels, value in self.samples())
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing total per label set."""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self) -> Iterable[Tuple[str, str, float]]:
+        for key, value in sorted(self.values().items()):
+            yield self.name, _labels(self.labelnames, key), value
+
+
+class Gauge(_Metric):
+    """Current value per label set."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, *labelvalues: str) -> None:
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, *labelvalues: str, amount: float = 1) -> None:
+        self.inc(*labelvalues, amount=-amount)
+
+    def samples(self) -> Iterable[Tuple[str, str, float]]:
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield self.name, _labels(self.labelnames, key), value
+
+
+class Histogram(_Metric):
+    """Observation counts in cumulative buckets, plus their sum and count."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (last is +Inf)..., sum]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        key = self._key(labelvalues)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * (len(self.buckets) + 2)
+            row[index] += 1
+            row[-1] += value
+
+    def samples(self) -> Iterable[Tuple[str, str, float]]:
+        with self._lock:
+            values = sorted((key, list(row)) for key, row in self._values.items())
+        bounds = [*map(_format_value, self.buckets), "+Inf"]
+        for key, row in values:
+            cumulative = 0
+            for bound, count in zip(bounds, row):
+                cumulative += count
+                yield f"{self.name}_bucket", _labels(self.labelnames, key, f'le="{bound}"'), cumulative
+            yield f"{self.name}_sum", _labels(self.labelnames, key), row[-1]
+            yield f"{self.name}_count", _labels(self.labelnames, key), cumulative
+
+
+class Collected(_Metric):
+    """Metric whose values are read from `collect()` at scrape time.
+
+    `collect` returns {label values tuple: value}; use it for numbers another
+    component already maintains, so nothing extra runs on the hot path.
+    """
+
+    def __init__(self, name: str, help: str, type: str, collect: Callable[[], Dict[LabelValues, float]],
+                 labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self.type = type
+        self.collect = collect
+
+    def samples(self) -> Iterable[Tuple[str, str, float]]:
+        for key, value in sorted(self.collect().items()):
+            yield self.name, _labels(self.labelnames, key), value
+
+
+class Registry:
+    """Named metrics rendered together for a /metrics scrape."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            # Collectors are re-bound when their module is reloaded; recorded metrics never are
+            if existing is not None and not (isinstance(existing, Collected) and isinstance(metric, Collected)):
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def collected(self, name: str, help: str, type: str, collect: Callable[[], Dict[LabelValues, float]],
+                  labelnames: Sequence[str] = ()) -> Collected:
+        return self.register(Collected(name, help, type, collect, labelnames))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+registry = Registry()
+
+
+# ── Pipeline metrics (recorded where the work happens) ────────────────────
+
+NODE_SECONDS = registry.histogram(
+    "compliance_node_duration_seconds", "Wall time of each graph node.", ["node"],
+)
+LLM_CALLS = registry.counter(
+    "compliance_llm_calls_total", "Model calls by model, caller and outcome (ok/error).",
+    ["model", "caller", "outcome"],
+)
+LLM_SECONDS = registry.histogram(
+    "compliance_llm_call_duration_seconds", "Latency of individual model calls.", ["model"],
+)
+LLM_TOKENS = registry.counter(
+    "compliance_llm_tokens_total",
+    "Tokens reported by the model, by caller, direction (input/output) and evidence mode (quotes/anchors).",
+    ["model", "caller", "direction", "evidence_mode"],
+)
+PARSE_OUTCOMES = registry.counter(
+    "compliance_parse_outcomes_total",
+    "How each model response was obtained (structured/repaired/salvaged/failed), per caller.",
+    ["caller", "outcome"],
+)
+PDF_PAGES = registry.counter(
+    "compliance_pdf_pages_total", "PDF pages read by the extractor (skipped pages included).",
+)
+PDF_SECONDS = registry.counter(
+    "compliance_pdf_extraction_seconds_total",
+    "Time spent reading PDF text; rate(pages) / rate(seconds) is pages per second.",
+)
+PDF_PAGES_PER_SECOND = registry.histogram(
+    "compliance_pdf_pages_per_second", "Text extraction throughput per document.",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000),
+)
+
+
+def model_name(model: object) -> str:
+    """Label for a chat model: its configured model name, else its class name."""
+    return getattr(model, "model_name", None) or getattr(model, "model", None) or type(model).__name__
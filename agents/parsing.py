@@ -0,0 +1,368 @@
+"""Shared LLM response handling for the extractor and framework agents.
+
+Responses are requested in the model's native structured-output mode. When a
+model doesn't support it, or returns something that fails validation, the raw
+text goes through one lenient JSON repair path instead of a copy per agent.
+"""
+from langchain_core.language_models import BaseChatModel
+from openai import BadRequestError, ContentFilterFinishReasonError, LengthFinishReasonError
+from pydantic import BaseModel, ValidationError, create_model
+from typing import Dict, Any, List, Optional, Set, Tuple, Type
+import ast
+import json
+import re
+import time
+from agents.evidence import EVIDENCE_MODE
+from agents import metrics
+from agents.cancellation import check_cancelled
+from agents.deadlines import check_deadline
+from agents.schemas import ResponseSchema
+
+
+# ── Parse-failure tracking ────────────────────────────────────────────────
+# Per caller ("ico", "extractor", ...): how each response was obtained.
+#   structured – validated by the model's structured-output mode
+#   repaired   – recovered from raw text by the fallback parser
+#   salvaged   – truncated output; complete keys kept, the rest re-requested
+#   failed     – unusable; the caller falls back to NOT_EVALUATED/defaults
+PARSE_OUTCOMES = ("structured", "repaired", "salvaged", "failed")
+
+# Parse outcomes are counted in agents.metrics (compliance_parse_outcomes_total)
+
+
+def record_parse_outcome(name: str, outcome: str) -> None:
+    metrics.PARSE_OUTCOMES.inc(name, outcome)
+
+
+def output_token_stats() -> Dict[str, Dict[str, Any]]:
+    """Mean output tokens per call, keyed "<caller>:<evidence mode>".
+
+    Read from compliance_llm_tokens_total and compliance_llm_calls_total.
+    The evidence mode is fixed per process, so comparing e.g. "ico:quotes"
+    from one deployment with "ico:anchors" from another measures what
+    anchor evidence saves against the verbatim-quote schema.
+    """
+    calls: Dict[str, float] = {}
+    for (_, caller, outcome), count in metrics.LLM_CALLS.values().items():
+        if outcome == "ok":
+            calls[caller] = calls.get(caller, 0) + count
+
+    tokens: Dict[Tuple[str, str], float] = {}
+    for (_, caller, direction, mode), count in metrics.LLM_TOKENS.values().items():
+        if direction == "output":
+            tokens[(caller, mode)] = tokens.get((caller, mode), 0) + count
+
+    return {
+        f"{caller}:{mode}": {
+            "calls": int(calls.get(caller, 0)),
+            "output_tokens": int(count),
+            "mean_output_tokens": count / calls[caller] if calls.get(caller) else 0.0,
+        }
+        for (caller, mode), count in sorted(tokens.items())
+    }
+
+
+def parse_stats() -> Dict[str, Dict[str, int]]:
+    """Snapshot of parse outcome counts per caller."""
+    stats: Dict[str, Dict[str, int]] = {}
+    for (name, outcome), count in metrics.PARSE_OUTCOMES.values().items():
+        stats.setdefault(name, dict.fromkeys(PARSE_OUTCOMES, 0))[outcome] = int(count)
+    return stats
+
+
+def parse_failure_rate(name: Optional[str] = None) -> float:
+    """Fraction of responses that could not be parsed (all callers if name is None)."""
+    stats = parse_stats()
+    rows = [stats[name]] if name else list(stats.values())
+    total = sum(sum(row.values()) for row in rows if row)
+    failed = sum(row.get("failed", 0) for row in rows if row)
+    return failed / total if total else 0.0
+
+
+# ── Text → JSON ───────────────────────────────────────────────────────────
+
+def response_text(response: Any) -> str:
+    """Content of an AIMessage (or any response object) as a string."""
+    content = response.content if hasattr(response, "content") else response
+    return content if isinstance(content, str) else str(content)
+
+
+def strip_code_fences(content: str) -> str:
+    """Remove the ```json ... ``` wrapper models like to add."""
+    content = content.strip()
+    if content.startswith("```json"):
+        content = content[7:]
+    if content.startswith("```"):
+        content = content[3:]
+    if content.endswith("```"):
+        content = content[:-3]
+    return content.strip()
+
+
+def parse_json_object(content: str) -> Dict[str, Any]:
+    """Leniently parse a JSON object from model text.
+
+    Tries plain JSON, then the outermost {...} span, then a Python literal
+    (single quotes, True/False). Raises ValueError if nothing yields a dict.
+    """
+    content = strip_code_fences(content)
+    try:
+        result = json.loads(content)
+    except json.JSONDecodeError:
+        start = content.find("{")
+        end = content.rfind("}")
+        candidate = content[start : end + 1] if start != -1 and end > start else content
+        try:
+            result = json.loads(candidate)
+        except json.JSONDecodeError:
+            try:
+                result = ast.literal_eval(candidate)
+            except (ValueError, SyntaxError) as exc:
+                raise ValueError("Model output is not valid JSON") from exc
+
+    if not isinstance(result, dict):
+        raise ValueError("Parsed analysis is not a JSON object")
+    return result
+
+
+_WHITESPACE = re.compile(r"\s*")
+
+
+def salvage_json_object(content: str) -> Dict[str, Any]:
+    """Recover every complete top-level member of a truncated JSON object.
+
+    Walks the object one key/value pair at a time and stops at the first
+    member that is cut off, so `{"a": {...}, "b": {"status": "ME` yields
+    `{"a": {...}}`. A value only counts once the following `,` or `}` has
+    been seen, which keeps a number truncated mid-digit from slipping in.
+    """
+    content = strip_code_fences(content)
+    start = content.find("{")
+    if start == -1:
+        return {}
+
+    decoder = json.JSONDecoder()
+    result: Dict[str, Any] = {}
+    pos = start + 1
+    while True:
+        pos = _WHITESPACE.match(content, pos).end()
+        try:
+            key, pos = decoder.raw_decode(content, pos)
+        except json.JSONDecodeError:
+            break
+        pos = _WHITESPACE.match(content, pos).end()
+        if not isinstance(key, str) or content[pos:pos + 1] != ":":
+            break
+        pos = _WHITESPACE.match(content, pos + 1).end()
+        try:
+            value, pos = decoder.raw_decode(content, pos)
+        except json.JSONDecodeError:
+            break
+        pos = _WHITESPACE.match(content, pos).end()
+        terminator = content[pos:pos + 1]
+        if terminator not in (",", "}"):
+            break
+        result[key] = value
+        if terminator == "}":
+            break
+        pos += 1
+    return result
+
+
+# ── Model invocation ──────────────────────────────────────────────────────
+
+# (model, schema) pairs whose schema the API refused; later calls go straight to text
+_schema_rejected: Set[Tuple[str, str]] = set()
+
+
+def _bind_structured(model: BaseChatModel, schema: Type[BaseModel]):
+    """Bind `schema` via the model's native JSON-schema mode, or None if unsupported."""
+    if (metrics.model_name(model), schema.__name__) in _schema_rejected:
+        return None
+    try:
+        return model.with_structured_output(schema, method="json_schema", include_raw=True)
+    except (NotImplementedError, TypeError, ValueError):
+        return None
+
+
+def _is_schema_rejection(exc: BadRequestError) -> bool:
+    """Whether a 400 was about the response_format rather than the prompt."""
+    return getattr(exc, "param", None) == "response_format" or "response_format" in str(exc)
+
+
+# The OpenAI SDK's structured parse() raises these for a response that was
+# cut off, instead of returning the partial message
+_CUT_OFF_ERRORS = (LengthFinishReasonError, ContentFilterFinishReasonError)
+
+
+def _cut_off_completion(exc: Exception) -> Tuple[str, Dict[str, int]]:
+    """Text and token usage of a completion the SDK refused to parse."""
+    completion = getattr(exc, "completion", None)
+    if completion is None or not completion.choices:
+        return "", {}
+    content = completion.choices[0].message.content or ""
+    usage = completion.usage
+    if usage is None:
+        return content, {}
+    return content, {"input_tokens": usage.prompt_tokens, "output_tokens": usage.completion_tokens}
+
+
+def _invoke_once(
+    model: BaseChatModel,
+    prompt: str,
+    schema: Type[BaseModel],
+    name: str,
+) -> Tuple[Optional[Dict[str, Any]], str, bool]:
+    """One model call: (validated dict or None, raw text, whether output was truncated)."""
+    # Don't start a new request for a run that has been cancelled or is out of time
+    check_cancelled()
+    check_deadline()
+    structured = _bind_structured(model, schema)
+    model_label = metrics.model_name(model)
+
+    started = time.perf_counter()
+    parsed = None
+    try:
+        if structured is not None:
+            try:
+                output = structured.invoke(prompt)
+            except BadRequestError as exc:
+                # Binding never fails for json_schema; a model or deployment
+                # that can't take the schema refuses the request instead
+                if not _is_schema_rejection(exc):
+                    raise
+                _schema_rejected.add((model_label, schema.__name__))
+                output = {"raw": model.invoke(prompt), "parsed": None}
+            raw = output.get("raw")
+            parsed = output.get("parsed")
+        else:
+            raw = model.invoke(prompt)
+    except _CUT_OFF_ERRORS as exc:
+        # Hit the output limit (or the content filter): keep what was generated
+        # so the caller can salvage it, as for a plain-text response
+        content, usage = _cut_off_completion(exc)
+        truncated = True
+    except Exception:
+        metrics.LLM_CALLS.inc(model_label, name, "error")
+        raise
+    else:
+        content = response_text(raw) if raw is not None else ""
+        usage = getattr(raw, "usage_metadata", None) or {}
+        metadata = getattr(raw, "response_metadata", None) or {}
+        truncated = metadata.get("finish_reason") in ("length", "content_filter")
+    finally:
+        metrics.LLM_SECONDS.observe(time.perf_counter() - started, model_label)
+    metrics.LLM_CALLS.inc(model_label, name, "ok")
+
+    if usage.get("input_tokens") is not None:
+        metrics.LLM_TOKENS.inc(model_label, name, "input", EVIDENCE_MODE, amount=usage["input_tokens"])
+    if usage.get("output_tokens") is not None:
+        metrics.LLM_TOKENS.inc(model_label, name, "output", EVIDENCE_MODE, amount=usage["output_tokens"])
+    return (parsed.model_dump() if parsed is not None else None), content, truncated
+
+
+def _continuation_prompt(prompt: str, received: Dict[str, Any], missing: List[str]) -> str:
+    return (
+        f"{prompt}\n\n---\n\n"
+        "Your previous answer was cut off by the output limit. These keys were "
+        f"already received and must NOT be repeated: {', '.join(received)}.\n"
+        "Return ONLY a JSON object containing exactly these remaining keys: "
+        f"{', '.join(missing)}."
+    )
+
+
+def _request_missing_keys(
+    model: BaseChatModel,
+    prompt: str,
+    schema: Type[BaseModel],
+    received: Dict[str, Any],
+    name: str,
+) -> Dict[str, Any]:
+    """Ask the model for just the schema keys absent from `received`."""
+    missing = [field for field in schema.model_fields if field not in received]
+    if not missing:
+        return {}
+
+    # A schema restricted to the missing fields keeps the follow-up output small
+    partial_schema = create_model(
+        f"{schema.__name__}Continuation",
+        __base__=ResponseSchema,
+        **{field: (schema.model_fields[field].annotation, schema.model_fields[field]) for field in missing},
+    )
+    parsed, content, _ = _invoke_once(
+        model, _continuation_prompt(prompt, received, missing), partial_schema, name
+    )
+    if parsed is not None:
+        return parsed
+    try:
+        tail = parse_json_object(content)
+    except ValueError:
+        tail = salvage_json_object(content)
+    return {field: value for field, value in tail.items() if field in missing}
+
+
+def invoke_for_json(
+    model: BaseChatModel,
+    prompt: str,
+    schema: Type[BaseModel],
+    name: str,
+) -> Tuple[Optional[Dict[str, Any]], str]:
+    """Invoke `model` and return (parsed dict or None, raw response text).
+
+    If the response was cut off mid-object, the fully formed members are kept
+    and a single continuation request asks only for the missing keys, rather
+    than discarding the whole call.
+    """
+    parsed, content, truncated = _invoke_once(model, prompt, schema, name)
+    if parsed is not None:
+        record_parse_outcome(name, "structured")
+        return parsed, content
+
+    if not truncated:
+        try:
+            result = parse_json_object(content)
+        except ValueError:
+            pass
+        else:
+            record_parse_outcome(name, "repaired")
+            return result, content
+
+    salvaged = salvage_json_object(content)
+    if not salvaged:
+        record_parse_outcome(name, "failed")
+        return None, content
+
+    salvaged.update(_request_missing_keys(model, prompt, schema, salvaged, name))
+    try:
+        result = schema.model_validate(salvaged).model_dump()
+    except ValidationError:
+        result = salvaged
+    record_parse_outcome(name, "salvaged")
+    return result, content
+
+
+# ── Result helpers ────────────────────────────────────────────────────────
+
+def count_critical_clauses(clauses: Dict[str, Any]) -> int:
+    """Number of clause objects in `clauses` flagged CRITICAL priority."""
+    return sum(
+        1 for value in clauses.values()
+        if isinstance(value, dict) and value.get("priority") == "CRITICAL"
+    )
+
+
+def not_evaluated_result(framework: str, raw_response: str, summary: str, **extra: Any) -> Dict[str, Any]:
+    """Placeholder result for a framework whose analysis could not be parsed."""
+    result = {
+        "framework": framework,
+        "score": 0,
+        "critical_gaps_count": 0,
+        "status": "NOT_EVALUATED",
+        "raw_response": raw_response,
+        "critical_gaps": [],
+        "priority_actions": [],
+        "strengths": [],
+        "compliance_summary": summary,
+    }
+    result.update(extra)
+    return result
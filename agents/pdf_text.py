@@ -0,0 +1,393 @@
+"""Reading the text layer of PDFs under memory, time and object budgets.
+
+Kept free of model and LangChain imports: isolated reads start a fresh
+interpreter that imports only this module, so start-up stays cheap.
+"""
+from contextlib import contextmanager
+from io import BytesIO
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Tuple, Union
+import os
+import pickle
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import pdfplumber
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdftypes import resolve1
+from pdfplumber.page import Page
+
+from agents import metrics
+from agents.cancellation import check_cancelled
+from agents.deadlines import check_deadline
+
+# A PDF can arrive as a filesystem path, raw bytes (e.g. a Streamlit upload)
+# or a readable binary stream (e.g. FastAPI's spooled UploadFile).
+PdfSource = Union[str, bytes, bytearray, memoryview, BinaryIO]
+
+
+def _as_pdfplumber_input(source: PdfSource):
+    """Adapt a PdfSource to something `pdfplumber.open` reads without copying to disk."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return BytesIO(source)
+    if hasattr(source, "read"):
+        # Streams may have been partially consumed by the caller (size checks, hashing)
+        source.seek(0)
+    return source
+
+
+# Extraction limits (overridable per deployment)
+MAX_PAGES = int(os.environ.get("PDF_MAX_PAGES", "30"))  # ~50-60k chars
+MAX_CHARS = 50000
+# Bounded mode walks pages lazily and drops each page's parsed layout after use
+BOUNDED_MEMORY = os.environ.get("PDF_BOUNDED_MEMORY", "1") not in ("0", "false", "False")
+# Stop reading further pages once the process's RSS has grown by more than N MB
+# since this document was opened (0 = off). RSS is process-wide, so growth from
+# other work in the same process (e.g. concurrent jobs) counts towards it too.
+RSS_CEILING_MB = int(os.environ.get("PDF_RSS_CEILING_MB", "0"))
+# Per-page guards against pathological pages (huge vector art, masses of tiny glyphs)
+PAGE_TIMEOUT_S = float(os.environ.get("PDF_PAGE_TIMEOUT_S", "10"))
+PAGE_MAX_OBJECTS = int(os.environ.get("PDF_PAGE_MAX_OBJECTS", "50000"))
+SLOW_PAGE_S = 1.0  # pages slower than this are listed in the diagnostics
+# SIGALRM only reaches the main thread, so reads from other threads (job
+# workers, Streamlit) run in a child process where the page timeout works
+PAGE_ISOLATION = os.environ.get("PDF_PAGE_ISOLATION", "1") not in ("0", "false", "False")
+# Allowance for child start-up on top of the per-page budgets before it is killed
+ISOLATION_GRACE_S = 30.0
+CHILD_POLL_S = 0.25
+
+
+class PageTimeout(Exception):
+    """Raised when a single page exceeds its extraction time budget."""
+
+
+class ExtractionTimeout(TimeoutError):
+    """An isolated read outlived the time budget of every page it may read."""
+
+
+@contextmanager
+def _page_time_limit(seconds: float):
+    """Interrupt the enclosed block after `seconds` using SIGALRM.
+
+    Yields a dict whose "expired" flag is set when the alarm fired; pdfplumber
+    re-wraps exceptions raised mid-parse, so callers check the flag rather
+    than the exception type. Signals can only be delivered to the main
+    thread, so elsewhere this is a no-op; read_pdf_text moves reads off
+    other threads into a child process for that reason.
+    """
+    timer = {"expired": False}
+    if (
+        seconds <= 0
+        or not hasattr(signal, "setitimer")
+        or threading.current_thread() is not threading.main_thread()
+    ):
+        yield timer
+        return
+
+    def _on_alarm(signum, frame):
+        timer["expired"] = True
+        raise PageTimeout()
+
+    previous = signal.signal(signal.SIGALRM, _on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield timer
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _extract_page_text(page: Page, timeout_s: float, max_objects: int) -> Tuple[Optional[str], Dict[str, Any]]:
+    """Extract one page's text under the per-page guards.
+
+    Returns (text, diagnostics); text is None when the page was skipped.
+    """
+    diag: Dict[str, Any] = {"page": page.page_number, "objects": None, "skipped": False, "reason": None}
+    started = time.perf_counter()
+    text = None
+    timer = {"expired": False}
+    try:
+        with _page_time_limit(timeout_s) as timer:
+            # Parsing the layout is the first expensive step (bounded by the time
+            # limit); count what it produced before handing thousands of objects
+            # to the text clustering.
+            diag["objects"] = {kind: len(objs) for kind, objs in page.objects.items()}
+            total_objects = sum(diag["objects"].values())
+            if total_objects > max_objects:
+                diag["skipped"] = True
+                diag["reason"] = f"{total_objects} objects exceeds limit of {max_objects}"
+            else:
+                text = page.extract_text() or ""
+    except Exception as exc:
+        # A PageTimeout raised before the block was entered never reached `timer`
+        if not (timer["expired"] or isinstance(exc, PageTimeout)):
+            raise
+        diag["skipped"] = True
+        diag["reason"] = f"exceeded {timeout_s:g}s time budget"
+    diag["seconds"] = round(time.perf_counter() - started, 3)
+    return text, diag
+
+
+def _current_rss_bytes() -> Optional[int]:
+    """Resident set size of this process, or None where it can't be read cheaply."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        # Peak rather than current RSS off Linux; kB on Linux/BSD, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except (ImportError, OSError):
+        return None
+
+
+def _page_count(pdf: "pdfplumber.PDF") -> Optional[int]:
+    """Read the page count from the page tree without materialising every page."""
+    try:
+        return int(resolve1(pdf.doc.catalog["Pages"]).get("Count"))
+    except Exception:
+        return None
+
+
+def _iter_pages_lazily(pdf: "pdfplumber.PDF"):
+    """Yield pdfplumber pages one at a time without populating `pdf.pages`."""
+    doctop = 0
+    for page_number, page_obj in enumerate(PDFPage.create_pages(pdf.doc), start=1):
+        page = Page(pdf, page_obj, page_number=page_number, initial_doctop=doctop)
+        doctop += page.height
+        yield page
+
+
+def read_pdf_text(
+    pdf_source: PdfSource,
+    max_pages: int = MAX_PAGES,
+    max_chars: int = MAX_CHARS,
+    bounded_memory: bool = BOUNDED_MEMORY,
+    rss_ceiling_mb: int = RSS_CEILING_MB,
+    page_timeout_s: float = PAGE_TIMEOUT_S,
+    page_max_objects: int = PAGE_MAX_OBJECTS,
+    isolate: Optional[bool] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """Read the leading text of a PDF.
+
+    Returns the text (capped at `max_chars`) and extraction stats. In bounded
+    mode each page's cached objects and text map are released as soon as its
+    text has been read, so memory stays flat regardless of page count.
+
+    With `rss_ceiling_mb`, reading stops early (stopped_reason "rss_ceiling")
+    once the process's resident size has grown by that much since the file
+    was opened. It is a process-wide safety valve, not a per-document budget:
+    other threads allocating at the same time count towards it. Isolated
+    reads run in their own process, so there it is per document.
+
+    Pages that blow their time or object budget are skipped; they, and any
+    page slower than SLOW_PAGE_S, are listed in `stats["page_diagnostics"]`.
+
+    `isolate` runs the read in a child process. By default (None) that
+    happens off the main thread when PDF_PAGE_ISOLATION is on, since the
+    page timeout can't fire there otherwise. The parent stops the child when
+    the run is cancelled or its deadline passes, and raises ExtractionTimeout
+    if it outlives the budget of every page it may read.
+    """
+    options = dict(
+        max_pages=max_pages,
+        max_chars=max_chars,
+        bounded_memory=bounded_memory,
+        rss_ceiling_mb=rss_ceiling_mb,
+        page_timeout_s=page_timeout_s,
+        page_max_objects=page_max_objects,
+    )
+    if isolate is None:
+        isolate = (
+            PAGE_ISOLATION
+            and page_timeout_s > 0
+            and hasattr(signal, "setitimer")
+            and threading.current_thread() is not threading.main_thread()
+        )
+    if isolate:
+        text, stats = _read_isolated(pdf_source, options)
+    else:
+        text, stats = _read_pdf_text(pdf_source, **options)
+    stats["isolated"] = isolate
+
+    # Recorded here so isolated reads count in this process's metrics
+    metrics.PDF_PAGES.inc(amount=stats["pages_read"])
+    metrics.PDF_SECONDS.inc(amount=stats["seconds"])
+    if stats["pages_read"] and stats["seconds"] > 0:
+        metrics.PDF_PAGES_PER_SECOND.observe(stats["pages_read"] / stats["seconds"])
+    return text, stats
+
+
+def _read_pdf_text(
+    pdf_source: PdfSource,
+    max_pages: int,
+    max_chars: int,
+    bounded_memory: bool,
+    rss_ceiling_mb: int,
+    page_timeout_s: float,
+    page_max_objects: int,
+) -> Tuple[str, Dict[str, Any]]:
+    """read_pdf_text in the current process."""
+    stats: Dict[str, Any] = {
+        "pages_total": None,
+        "pages_read": 0,
+        "pages_skipped": 0,
+        "bounded_memory": bounded_memory,
+        "stopped_reason": None,
+        "page_diagnostics": [],
+    }
+    rss_start = _current_rss_bytes() if rss_ceiling_mb > 0 else None
+    started = time.perf_counter()
+    parts = []
+    chars = 0
+
+    with pdfplumber.open(_as_pdfplumber_input(pdf_source)) as pdf:
+        stats["pages_total"] = _page_count(pdf)
+        pages = _iter_pages_lazily(pdf) if bounded_memory else pdf.pages
+
+        for page in pages:
+            check_cancelled()
+            check_deadline()
+            if stats["pages_read"] >= max_pages:
+                stats["stopped_reason"] = "max_pages"
+                break
+            if chars >= max_chars:
+                # Everything past this point would be truncated anyway
+                stats["stopped_reason"] = "max_chars"
+                break
+            if rss_start is not None:
+                rss_now = _current_rss_bytes()
+                if rss_now is not None and rss_now - rss_start > rss_ceiling_mb * 1024 * 1024:
+                    stats["stopped_reason"] = "rss_ceiling"
+                    break
+
+            page_text, diag = _extract_page_text(page, page_timeout_s, page_max_objects)
+            stats["pages_read"] += 1
+            if diag["skipped"]:
+                stats["pages_skipped"] += 1
+            if diag["skipped"] or diag["seconds"] >= SLOW_PAGE_S:
+                stats["page_diagnostics"].append(diag)
+
+            if page_text is not None:
+                page_text += "\n"
+                parts.append(page_text)
+                chars += len(page_text)
+
+            # Skipped pages may hold a half-built layout; always drop it
+            if bounded_memory or diag["skipped"]:
+                page.close()
+
+    text = "".join(parts)[:max_chars]
+    stats["chars"] = len(text)
+    stats["seconds"] = time.perf_counter() - started
+    return text, stats
+
+
+# Isolated reads start a fresh interpreter rather than a multiprocessing child,
+# which would re-import __main__ (under Streamlit, the whole app script)
+_CHILD_COMMAND = "from agents.pdf_text import _read_in_child; _read_in_child()"
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _read_in_child() -> None:
+    """Child process entry point: (path, options) pickled on stdin, the outcome pickled to stdout."""
+    output = sys.stdout.buffer
+    # Stray prints from PDF libraries must not corrupt the result
+    sys.stdout = sys.stderr
+    path, options = pickle.load(sys.stdin.buffer)
+    try:
+        outcome = (True, _read_pdf_text(path, **options))
+    except BaseException as exc:
+        outcome = (False, f"{type(exc).__name__}: {exc}")
+    pickle.dump(outcome, output)
+    output.flush()
+
+
+def _file_descriptor(stream: Any) -> Optional[int]:
+    """The OS-level descriptor behind a stream, if it is backed by a real file."""
+    if not getattr(stream, "_rolled", True):
+        return None   # in-memory SpooledTemporaryFile; fileno() would roll it to disk
+    try:
+        return stream.fileno()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+@contextmanager
+def _child_path(pdf_source: PdfSource) -> Iterator[Tuple[str, Tuple[int, ...]]]:
+    """A path the child can open for `pdf_source`, and the descriptors it must inherit.
+
+    Files on disk (paths, or streams like a rolled-over upload spool) are
+    opened in place; only in-memory sources are copied, to a temp file, so
+    the parent never holds a second copy of the document.
+    """
+    if isinstance(pdf_source, str):
+        yield pdf_source, ()
+        return
+    descriptor = _file_descriptor(pdf_source)
+    if descriptor is not None and os.path.isdir("/dev/fd"):
+        # Re-opens the same file, even an unlinked temp file
+        yield f"/dev/fd/{descriptor}", (descriptor,)
+        return
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as copy:
+        if isinstance(pdf_source, (bytes, bytearray, memoryview)):
+            copy.write(pdf_source)
+        else:
+            pdf_source.seek(0)
+            shutil.copyfileobj(pdf_source, copy)
+        copy.flush()
+        yield copy.name, ()
+
+
+def _read_isolated(pdf_source: PdfSource, options: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """Run _read_pdf_text in a child process, polling for cancellation and time-outs."""
+    check_cancelled()
+    check_deadline()
+    with _child_path(pdf_source) as (path, inherited):
+        return _run_child(path, inherited, options)
+
+
+def _run_child(path: str, inherited: Tuple[int, ...], options: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    budget = options["page_timeout_s"] * (options["max_pages"] + 1) + ISOLATION_GRACE_S
+    python_path = os.pathsep.join(filter(None, [_PROJECT_ROOT, os.environ.get("PYTHONPATH")]))
+    child = subprocess.Popen(
+        [sys.executable, "-c", _CHILD_COMMAND],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        env={**os.environ, "PYTHONPATH": python_path},
+        pass_fds=inherited,
+    )
+    request: Optional[bytes] = pickle.dumps((path, options))
+    ends = time.monotonic() + budget
+    try:
+        while True:
+            try:
+                output, _ = child.communicate(request, timeout=CHILD_POLL_S)
+                break
+            except subprocess.TimeoutExpired:
+                # Retrying communicate() carries on sending what is left of the request
+                request = None
+            check_cancelled()
+            check_deadline()
+            if time.monotonic() > ends:
+                raise ExtractionTimeout(f"PDF extraction exceeded its {budget:g}s time budget")
+    finally:
+        if child.poll() is None:
+            child.kill()
+            child.communicate()
+
+    if not output:
+        raise RuntimeError(f"PDF extraction process exited with code {child.returncode}")
+    ok, payload = pickle.loads(output)
+    if not ok:
+        raise RuntimeError(f"PDF extraction failed: {payload}")
+    return payload
+
+
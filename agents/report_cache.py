@@ -0,0 +1,180 @@
+"""On-demand, memoised PDF report rendering.
+
+Reports are rendered only when someone asks for one (download endpoint,
+Streamlit button, CLI flag) rather than inside the graph. Rendered PDFs are
+written straight to files under REPORT_CACHE_DIR, named by a hash of
+everything the report is built from, so repeat downloads are free, a changed
+analysis naturally gets a new entry, and no process holds report bytes in
+memory just to serve them.
+"""
+from collections import OrderedDict
+from typing import BinaryIO, Callable, Dict, Any, Optional, Tuple
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from agents.reporter import build_report
+
+
+# Inputs to build_report, in the order they are hashed
+REPORT_INPUT_KEYS = ("extracted_data", "ico_result", "eu_act_result", "dpa_result", "iso_result", "synthesis")
+
+MAX_ENTRIES = int(os.environ.get("REPORT_CACHE_MAX_ENTRIES", "64"))
+MAX_BYTES = int(os.environ.get("REPORT_CACHE_MAX_MB", "128")) * 1024 * 1024
+CACHE_DIR = os.environ.get("REPORT_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "ai-compliance-reports")
+
+
+def report_key(state: Dict[str, Any]) -> str:
+    """Content hash of the parts of a graph state that appear in the report."""
+    inputs = {key: state.get(key) for key in REPORT_INPUT_KEYS}
+    # The raw document dump isn't rendered; leave it out of the hash
+    extracted = dict(inputs["extracted_data"] or {})
+    extracted.pop("full_text", None)
+    inputs["extracted_data"] = extracted
+    payload = json.dumps(inputs, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ReportCache:
+    """Thread-safe LRU of rendered PDF files bounded by entry count and total bytes.
+
+    Only the key → size index lives in memory. Files are written to a temp
+    name and renamed into place, so concurrent renders of the same report (or
+    several API workers sharing the directory) never see a partial PDF.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def get(self, key: str) -> Optional[str]:
+        """Path of the cached report for `key`, or None."""
+        path = self.path(key)
+        with self._lock:
+            if not os.path.exists(path):
+                # Evicted by another worker sharing the directory
+                size = self._entries.pop(key, None)
+                if size is not None:
+                    self._bytes -= size
+                self.misses += 1
+                return None
+            if key not in self._entries:
+                # Rendered by another worker sharing the directory
+                self._track(key, os.path.getsize(path))
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return path
+
+    def put(self, key: str, render: Callable[[BinaryIO], None]) -> str:
+        """Render into the cache via `render(stream)` and return the file path."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as stream:
+                render(stream)
+                size = stream.tell()
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        with self._lock:
+            self._track(key, size)
+        return self.path(key)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            size = self._entries.pop(key, None)
+            if size is not None:
+                self._bytes -= size
+        self._remove(key)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _track(self, key: str, size: int) -> None:
+        # Caller holds the lock
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)
+        self._entries[key] = size
+        self._bytes += size
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            evicted, evicted_size = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+            # Readers that already opened the file keep their handle on POSIX
+            self._remove(evicted)
+
+    def _remove(self, key: str) -> None:
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+
+report_cache = ReportCache()
+
+
+def _render_into(state: Dict[str, Any]) -> Callable[[BinaryIO], None]:
+    def render(stream: BinaryIO) -> None:
+        build_report(
+            stream,
+            extracted_data=state.get("extracted_data") or {},
+            ico_result=state.get("ico_result"),
+            eu_act_result=state.get("eu_act_result"),
+            dpa_result=state.get("dpa_result"),
+            iso_result=state.get("iso_result"),
+            synthesis=state.get("synthesis") or {},
+        )
+    return render
+
+
+def report_file(state: Dict[str, Any]) -> Tuple[str, str]:
+    """Render (or reuse) the report for a completed analysis: (file path, report key)."""
+    key = report_key(state)
+    path = report_cache.get(key)
+    if path is None:
+        path = report_cache.put(key, _render_into(state))
+    return path, key
+
+
+def open_report(state: Dict[str, Any]) -> Tuple[BinaryIO, str]:
+    """Open the rendered report for streaming: (binary file handle, report key).
+
+    The handle is opened before returning, so the file stays readable even if
+    the entry is evicted while a download is in progress.
+    """
+    for _ in range(2):
+        path, key = report_file(state)
+        try:
+            return open(path, "rb"), key
+        except FileNotFoundError:
+            # Evicted between render and open; render once more
+            continue
+    raise FileNotFoundError(f"Report {key} was evicted before it could be opened")
+
+
+def render_report(state: Dict[str, Any]) -> bytes:
+    """Rendered PDF report as bytes, for callers that need it in memory (Streamlit, CLI)."""
+    stream, _ = open_report(state)
+    with stream:
+        return stream.read()
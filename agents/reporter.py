@@ -5,11 +5,27 @@ from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from io import BytesIO
-from typing import Dict, Any, Optional
+from typing import BinaryIO, Dict, Any, Optional, Union
 from datetime import datetime
+import re
 import unicodedata
 
 
+# ── Text sanitising ───────────────────────────────────────────────────────
+# Glyphs built-in Helvetica doesn't render well, plus control characters
+# (other than newlines and tabs), mapped in a single str.translate pass
+_PDF_TRANSLATION = {
+    0x2011: "-",  # non-breaking hyphen
+    0x2010: "-",  # hyphen
+    0x2013: "-",  # en dash
+    0x2014: "-",  # em dash
+    0x00A0: " ",  # non-breaking space
+    **{code: " " for code in range(32) if chr(code) not in "\n\t"},
+}
+# Anything outside printable ASCII, newlines and tabs; most strings have none
+_NEEDS_CLEANING = re.compile(r"[^\t\n\x20-\x7e]")
+
+
 def _clean_text(text: Any) -> str:
     """Normalise text for PDF so odd Unicode (e.g. non-breaking hyphens) don't render as black boxes."""
     if text is None:
@@ -17,29 +33,115 @@ def _clean_text(text: Any) -> str:
     if not isinstance(text, str):
         text = str(text)
 
-    # Normalise to NFKC to flatten odd characters
-    text = unicodedata.normalize("NFKC", text)
+    if not _NEEDS_CLEANING.search(text):
+        return text
+    # NFKC flattens odd characters; it is a no-op on ASCII
+    if not text.isascii():
+        text = unicodedata.normalize("NFKC", text)
+    return text.translate(_PDF_TRANSLATION)
 
-    # Replace common problematic glyphs that built-in Helvetica doesn't support well
-    replacements = {
-        "\u2011": "-",  # non-breaking hyphen
-        "\u2010": "-",  # hyphen
-        "\u2013": "-",  # en dash
-        "\u2014": "-",  # em dash
-        "\u00a0": " ",  # non-breaking space
-    }
-    for bad, good in replacements.items():
-        text = text.replace(bad, good)
 
-    # Strip control characters except newlines and tabs
-    cleaned_chars = []
-    for ch in text:
-        code = ord(ch)
-        if code < 32 and ch not in "\n\t":
-            cleaned_chars.append(" ")
-        else:
-            cleaned_chars.append(ch)
-    return "".join(cleaned_chars)
+# ── Report template ───────────────────────────────────────────────────────
+# Styles are built once at import and shared by every report
+
+_PAGE_LAYOUT = dict(
+    pagesize=A4,
+    topMargin=0.5*inch,
+    bottomMargin=0.5*inch,
+    leftMargin=0.75*inch,
+    rightMargin=0.75*inch,
+)
+
+_SAMPLE_STYLES = getSampleStyleSheet()
+
+# Custom styles matching design system
+TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=_SAMPLE_STYLES['Heading1'],
+    fontSize=24,
+    textColor=colors.HexColor('#0284c7'),
+    spaceAfter=30,
+    alignment=TA_CENTER
+)
+
+HEADING_STYLE = ParagraphStyle(
+    'CustomHeading',
+    parent=_SAMPLE_STYLES['Heading2'],
+    fontSize=16,
+    textColor=colors.HexColor('#111827'),
+    spaceAfter=12,
+    spaceBefore=20
+)
+
+SUBHEADING_STYLE = ParagraphStyle(
+    'CustomSubheading',
+    parent=_SAMPLE_STYLES['Heading3'],
+    fontSize=12,
+    textColor=colors.HexColor('#374151'),
+    spaceAfter=8,
+    spaceBefore=12
+)
+
+BODY_STYLE = ParagraphStyle(
+    'CustomBody',
+    parent=_SAMPLE_STYLES['BodyText'],
+    fontSize=10,
+    textColor=colors.HexColor('#4b5563'),
+    spaceAfter=12
+)
+
+# Use Paragraph objects in table cells so long text wraps
+TABLE_CELL_STYLE = ParagraphStyle(
+    'TableCell',
+    parent=_SAMPLE_STYLES['BodyText'],
+    fontSize=10,
+    textColor=colors.HexColor('#111827'),
+    leading=14
+)
+
+METADATA_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f0f9ff')),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#111827')),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ('TOPPADDING', (0, 0), (-1, -1), 8),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e5e7eb'))
+])
+
+SCORES_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0ea5e9')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ('TOPPADDING', (0, 0), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e5e7eb')),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9fafb')])
+])
+
+# Suite branding
+SUITE_TEXT = """
+<para align=center>
+<b>Module 2: AI Compliance Tool</b><br/>
+Multi-framework AI governance assessment
+</para>
+"""
+
+FOOTER_TEXT = """
+<para align=center>
+<font size=8 color="#9ca3af">
+Generated by AI Governance Hub<br/>
+This report is for informational purposes only and does not constitute legal advice.<br/>
+Consult qualified legal and compliance professionals for definitive guidance.<br/><br/>
+© 2025 AI Governance Hub
+</font>
+</para>
+"""
 
 
 def generate_report(
@@ -51,108 +153,59 @@ def generate_report(
     synthesis: Dict[str, Any]
 ) -> bytes:
     """Generate PDF compliance report"""
-    
     buffer = BytesIO()
-    doc = SimpleDocTemplate(
-        buffer, 
-        pagesize=A4, 
-        topMargin=0.5*inch, 
-        bottomMargin=0.5*inch,
-        leftMargin=0.75*inch,
-        rightMargin=0.75*inch
-    )
-    story = []
-    styles = getSampleStyleSheet()
-    
-    # Custom styles matching design system
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#0284c7'),
-        spaceAfter=30,
-        alignment=TA_CENTER
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor=colors.HexColor('#111827'),
-        spaceAfter=12,
-        spaceBefore=20
-    )
-    
-    subheading_style = ParagraphStyle(
-        'CustomSubheading',
-        parent=styles['Heading3'],
-        fontSize=12,
-        textColor=colors.HexColor('#374151'),
-        spaceAfter=8,
-        spaceBefore=12
-    )
+    build_report(buffer, extracted_data, ico_result, eu_act_result, dpa_result, iso_result, synthesis)
+    pdf_bytes = buffer.getvalue()
+    buffer.close()
+    return pdf_bytes
+
+
+def build_report(
+    output: Union[str, BinaryIO],
+    extracted_data: Dict[str, Any],
+    ico_result: Optional[Dict[str, Any]],
+    eu_act_result: Optional[Dict[str, Any]],
+    dpa_result: Optional[Dict[str, Any]],
+    iso_result: Optional[Dict[str, Any]],
+    synthesis: Dict[str, Any]
+) -> None:
+    """Write the PDF compliance report to `output` (a file path or binary stream)"""
     
-    body_style = ParagraphStyle(
-        'CustomBody',
-        parent=styles['BodyText'],
-        fontSize=10,
-        textColor=colors.HexColor('#4b5563'),
-        spaceAfter=12
-    )
+    doc = SimpleDocTemplate(output, **_PAGE_LAYOUT)
+    story = []
     
     # Title page
-    story.append(Paragraph("AI Governance Hub", title_style))
-    story.append(Paragraph("AI Compliance Tool Report", title_style))
+    story.append(Paragraph("AI Governance Hub", TITLE_STYLE))
+    story.append(Paragraph("AI Compliance Tool Report", TITLE_STYLE))
     story.append(Spacer(1, 0.3*inch))
     
-    # Suite branding
-    suite_text = """
-    <para align=center>
-    <b>Module 2: AI Compliance Tool</b><br/>
-    Multi-framework AI governance assessment
-    </para>
-    """
-    story.append(Paragraph(suite_text, body_style))
+    story.append(Paragraph(SUITE_TEXT, BODY_STYLE))
     story.append(Spacer(1, 0.5*inch))
     
     # Document metadata
-    story.append(Paragraph("Document Information", heading_style))
-    
-    # Use Paragraph objects in table cells so long text wraps
-    table_cell_style = ParagraphStyle(
-        'TableCell',
-        parent=styles['BodyText'],
-        fontSize=10,
-        textColor=colors.HexColor('#111827'),
-        leading=14
-    )
+    story.append(Paragraph("Document Information", HEADING_STYLE))
     
     metadata_data = [
-        ["Use Case:", Paragraph(_clean_text(extracted_data.get('use_case', 'N/A')), table_cell_style)],
-        ["System Type:", Paragraph(_clean_text(extracted_data.get('system_type', 'N/A')), table_cell_style)],
+        ["Use Case:", Paragraph(_clean_text(extracted_data.get('use_case', 'N/A')), TABLE_CELL_STYLE)],
+        ["System Type:", Paragraph(_clean_text(extracted_data.get('system_type', 'N/A')), TABLE_CELL_STYLE)],
         ["Analysis Date:", datetime.now().strftime("%Y-%m-%d %H:%M")],
-        ["Frameworks:", Paragraph(_clean_text(", ".join(synthesis.get('frameworks_analyzed', []))), table_cell_style)]
+        ["Frameworks:", Paragraph(_clean_text(", ".join(synthesis.get('frameworks_analyzed', []))), TABLE_CELL_STYLE)]
     ]
+    not_evaluated = [f"{code} (timed out)" for code in synthesis.get('frameworks_timed_out') or []]
+    not_evaluated += [f"{code} (could not be assessed)" for code in synthesis.get('frameworks_not_evaluated') or []]
+    if not_evaluated:
+        metadata_data.append(
+            ["Not evaluated:", Paragraph(_clean_text(", ".join(not_evaluated)), TABLE_CELL_STYLE)]
+        )
     
     metadata_table = Table(metadata_data, colWidths=[1.5*inch, 5*inch])
-    metadata_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f0f9ff')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#111827')),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e5e7eb'))
-    ]))
+    metadata_table.setStyle(METADATA_TABLE_STYLE)
     
     story.append(metadata_table)
     story.append(Spacer(1, 0.3*inch))
     
     # Executive Summary
-    story.append(Paragraph("Executive Summary", heading_style))
+    story.append(Paragraph("Executive Summary", HEADING_STYLE))
     
     # UK Alignment Score (big metric)
     score = synthesis.get('uk_alignment_score', 0)
@@ -169,10 +222,10 @@ def generate_report(
     <font size=12 color="#6b7280">UK Alignment Score</font>
     </para>
     """
-    story.append(Paragraph(score_text, body_style))
+    story.append(Paragraph(score_text, BODY_STYLE))
     story.append(Spacer(1, 0.2*inch))
     
-    story.append(Paragraph(_clean_text(synthesis.get('summary', 'No summary available')), body_style))
+    story.append(Paragraph(_clean_text(synthesis.get('summary', 'No summary available')), BODY_STYLE))
     story.append(Spacer(1, 0.2*inch))
     
     # Critical gaps summary
@@ -184,12 +237,12 @@ def generate_report(
         Immediate remediation required across frameworks.
         </para>
         """
-        story.append(Paragraph(gaps_text, body_style))
+        story.append(Paragraph(gaps_text, BODY_STYLE))
     
     story.append(PageBreak())
     
     # Framework Scores
-    story.append(Paragraph("Framework Analysis Summary", heading_style))
+    story.append(Paragraph("Framework Analysis Summary", HEADING_STYLE))
     
     scores_data = [["Framework", "Score", "Status"]]
     for framework, fw_score in synthesis.get('framework_scores', {}).items():
@@ -203,17 +256,7 @@ def generate_report(
     
     if len(scores_data) > 1:
         scores_table = Table(scores_data, colWidths=[3*inch, 1.5*inch, 1.5*inch])
-        scores_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0ea5e9')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e5e7eb')),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9fafb')])
-        ]))
+        scores_table.setStyle(SCORES_TABLE_STYLE)
         story.append(scores_table)
     
     story.append(Spacer(1, 0.3*inch))
@@ -221,7 +264,7 @@ def generate_report(
     # Cross-framework gaps
     cross_gaps = synthesis.get('cross_framework_gaps', [])
     if cross_gaps:
-        story.append(Paragraph("Cross-Framework Critical Issues", heading_style))
+        story.append(Paragraph("Cross-Framework Critical Issues", HEADING_STYLE))
         
         for gap in cross_gaps:
             issue = _clean_text(gap.get('issue', 'Unknown issue'))
@@ -234,21 +277,21 @@ def generate_report(
             <font color="#111827">Recommendation: {recommendation}</font>
             </para>
             """
-            story.append(Paragraph(gap_text, body_style))
+            story.append(Paragraph(gap_text, BODY_STYLE))
         story.append(Spacer(1, 0.1*inch))
     
     story.append(PageBreak())
     
     # Priority Actions
-    story.append(Paragraph("Priority Remediation Actions", heading_style))
+    story.append(Paragraph("Priority Remediation Actions", HEADING_STYLE))
     
     priority_actions = synthesis.get('priority_actions', [])
     if priority_actions:
         for i, action in enumerate(priority_actions, 1):
             action_text = f"<para><b>{i}.</b> {_clean_text(action)}</para>"
-            story.append(Paragraph(action_text, body_style))
+            story.append(Paragraph(action_text, BODY_STYLE))
     else:
-        story.append(Paragraph("No priority actions identified.", body_style))
+        story.append(Paragraph("No priority actions identified.", BODY_STYLE))
     
     story.append(Spacer(1, 0.3*inch))
     
@@ -256,42 +299,28 @@ def generate_report(
     for result in [ico_result, eu_act_result, dpa_result, iso_result]:
         if result and not result.get('error'):
             story.append(PageBreak())
-            story.append(Paragraph(f"Detailed Analysis: {_clean_text(result.get('framework', 'Unknown'))}", heading_style))
-            story.append(Paragraph(_clean_text(result.get('compliance_summary', 'No summary available')), body_style))
+            story.append(Paragraph(f"Detailed Analysis: {_clean_text(result.get('framework', 'Unknown'))}", HEADING_STYLE))
+            story.append(Paragraph(_clean_text(result.get('compliance_summary', 'No summary available')), BODY_STYLE))
             story.append(Spacer(1, 0.2*inch))
             
             # Add critical gaps from this framework
             critical_gaps = result.get('critical_gaps', [])
             if critical_gaps:
-                story.append(Paragraph("Critical Gaps:", subheading_style))
+                story.append(Paragraph("Critical Gaps:", SUBHEADING_STYLE))
                 for gap in critical_gaps:
-                    story.append(Paragraph(f"• {_clean_text(gap)}", body_style))
+                    story.append(Paragraph(f"• {_clean_text(gap)}", BODY_STYLE))
             
             # Add priority actions from this framework
             fw_actions = result.get('priority_actions', [])
             if fw_actions:
                 story.append(Spacer(1, 0.1*inch))
-                story.append(Paragraph("Recommended Actions:", subheading_style))
+                story.append(Paragraph("Recommended Actions:", SUBHEADING_STYLE))
                 for action in fw_actions[:3]:
-                    story.append(Paragraph(f"• {_clean_text(action)}", body_style))
+                    story.append(Paragraph(f"• {_clean_text(action)}", BODY_STYLE))
     
     # Footer
     story.append(PageBreak())
-    footer_text = """
-    <para align=center>
-    <font size=8 color="#9ca3af">
-    Generated by AI Governance Hub<br/>
-    This report is for informational purposes only and does not constitute legal advice.<br/>
-    Consult qualified legal and compliance professionals for definitive guidance.<br/><br/>
-    © 2025 AI Governance Hub
-    </font>
-    </para>
-    """
-    story.append(Paragraph(footer_text, body_style))
+    story.append(Paragraph(FOOTER_TEXT, BODY_STYLE))
     
     # Build PDF
     doc.build(story)
-    pdf_bytes = buffer.getvalue()
-    buffer.close()
-    
-    return pdf_bytes
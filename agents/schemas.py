@@ -0,0 +1,129 @@
+"""Pydantic response schemas for the extractor and framework agents.
+
+These mirror the JSON layouts described in `prompts/*_prompt.py` and are bound
+to the model's native structured-output mode, so well-behaved models return
+validated objects instead of free text that has to be repaired.
+"""
+from typing import Any, Dict, List, Literal
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+ClauseStatus = Literal["MET", "PARTIALLY_MET", "NOT_MET", "EVIDENCE_MISSING"]
+Priority = Literal["CRITICAL", "HIGH", "MEDIUM", "LOW"]
+DocumentType = Literal["GUIDANCE", "SYSTEM_SPEC", "STRATEGY", "ASSESSMENT"]
+
+
+def _strip_defaults(schema: Dict[str, Any]) -> None:
+    # OpenAI's strict mode rejects "default" (the SDK only drops None ones);
+    # every key is required there anyway, and validation still fills defaults
+    for prop in schema.get("properties", {}).values():
+        prop.pop("default", None)
+
+
+class ResponseSchema(BaseModel):
+    """Base for schemas bound to structured output: no defaults in the JSON schema."""
+
+    model_config = ConfigDict(json_schema_extra=_strip_defaults)
+
+
+# ── Extractor ─────────────────────────────────────────────────────────────
+
+class ExtractedDocument(ResponseSchema):
+    """Structured facts pulled from the uploaded document."""
+
+    document_type: DocumentType
+    use_case: str = Field(description="Brief description of what this document covers")
+    system_type: str = Field(description="Type of AI system discussed (or 'N/A - Guidance document')")
+    data_types: List[str] = Field(default_factory=list)
+    has_personal_data: bool = True
+    has_biometric_data: bool = False
+    has_human_oversight: bool = False
+    deployment_context: str = "Unknown"
+    risk_indicators: List[str] = Field(default_factory=list)
+    compliance_topics_covered: List[str] = Field(default_factory=list)
+    keywords: List[str] = Field(default_factory=list)
+    foundation_models: List[str] = Field(default_factory=list)
+    datasets: List[str] = Field(default_factory=list)
+    pii_categories: List[str] = Field(default_factory=list)
+    region_residency: str = "Not specified"
+
+
+# ── Framework agents ──────────────────────────────────────────────────────
+
+class ClauseAssessment(ResponseSchema):
+    """Assessment of a single principle / article / requirement area."""
+
+    status: ClauseStatus
+    evidence_found: List[str] = Field(default_factory=list, description="Quotes from the document")
+    sections_relevant: List[str] = Field(default_factory=list)
+    gap: str = ""
+    priority: Priority = "MEDIUM"
+
+
+class FrameworkAnalysis(ResponseSchema):
+    """Fields shared by every framework agent response."""
+
+    document_type_detected: str = ""
+    overall_score: int = Field(0, ge=0, le=100)
+    critical_gaps: List[str] = Field(default_factory=list)
+    strengths: List[str] = Field(default_factory=list)
+    priority_actions: List[str] = Field(default_factory=list)
+    compliance_summary: str = ""
+
+
+class ICOAnalysis(FrameworkAnalysis):
+    principle_1_safety: ClauseAssessment
+    principle_2_fairness: ClauseAssessment
+    principle_3_accountability: ClauseAssessment
+    principle_4_contestability: ClauseAssessment
+    principle_5_data_minimization: ClauseAssessment
+
+
+class DPAAnalysis(FrameworkAnalysis):
+    article_22_adm: ClauseAssessment
+    article_5_fairness: ClauseAssessment
+    article_13_transparency: ClauseAssessment
+    article_35_dpia: ClauseAssessment
+
+
+class ISOAnalysis(FrameworkAnalysis):
+    governance: ClauseAssessment
+    risk_management: ClauseAssessment
+    data_lifecycle: ClauseAssessment
+    monitoring: ClauseAssessment
+
+
+class EUObligation(ResponseSchema):
+    status: Literal["MET", "PARTIALLY_MET", "NOT_MET", "EVIDENCE_MISSING", "N/A"] = "N/A"
+    evidence_found: List[str] = Field(default_factory=list)
+    gap: str = ""
+
+
+class EUObligations(ResponseSchema):
+    """Provider obligations for high-risk systems (Articles 8-17)."""
+
+    risk_management_system: EUObligation = Field(default_factory=EUObligation)
+    data_governance: EUObligation = Field(default_factory=EUObligation)
+    technical_documentation: EUObligation = Field(default_factory=EUObligation)
+    record_keeping: EUObligation = Field(default_factory=EUObligation)
+    transparency: EUObligation = Field(default_factory=EUObligation)
+    human_oversight: EUObligation = Field(default_factory=EUObligation)
+    accuracy_robustness: EUObligation = Field(default_factory=EUObligation)
+    quality_management: EUObligation = Field(default_factory=EUObligation)
+
+
+class EUActCoverage(ResponseSchema):
+    risk_classification_discussed: bool = False
+    high_risk_obligations_discussed: bool = False
+    transparency_requirements_discussed: bool = False
+    prohibited_practices_discussed: bool = False
+
+
+class EUActAnalysis(FrameworkAnalysis):
+    risk_tier: Literal["PROHIBITED", "HIGH_RISK", "LIMITED_RISK", "MINIMAL_RISK", "N/A_GUIDANCE"]
+    risk_justification: str = ""
+    eu_act_coverage: EUActCoverage = Field(default_factory=EUActCoverage)
+    evidence_found: List[str] = Field(default_factory=list)
+    sections_relevant: List[str] = Field(default_factory=list)
+    obligations_if_high_risk: EUObligations = Field(default_factory=EUObligations)
@@ -1,4 +1,178 @@
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple, FrozenSet
+
+
+# UK Alignment Score weights, renormalised over the frameworks actually run.
+# EU AI Act counts as supplementary (10% if present).
+UK_ALIGNMENT_WEIGHTS: Dict[str, float] = {"ico": 0.4, "dpa": 0.3, "iso": 0.2, "eu_act": 0.1}
+
+
+# ── Cross-framework requirement mapping ───────────────────────────────────
+# Clause statuses that count as a failed requirement
+FAILING_STATUSES = frozenset({"NOT_MET", "EVIDENCE_MISSING"})
+
+# Requirement id → where it lives in an agent result. `result` names the
+# framework result ("ico", "eu_act", "dpa", "iso"), `path` the nested clause
+# keys. `high_risk_only` requirements apply only when the EU AI Act result
+# classifies the system as HIGH_RISK.
+REQUIREMENTS: Dict[str, Dict[str, Any]] = {
+    "ICO-P2": {"result": "ico", "path": ("principle_2_fairness",), "framework": "UK ICO"},
+    "ICO-P4": {"result": "ico", "path": ("principle_4_contestability",), "framework": "UK ICO"},
+    "EU-Art10": {"result": "eu_act", "path": ("obligations_if_high_risk", "data_governance"),
+                 "framework": "EU AI Act", "high_risk_only": True},
+    "EU-Art13": {"result": "eu_act", "path": ("obligations_if_high_risk", "transparency"),
+                 "framework": "EU AI Act", "high_risk_only": True},
+    "EU-Art14": {"result": "eu_act", "path": ("obligations_if_high_risk", "human_oversight"),
+                 "framework": "EU AI Act", "high_risk_only": True},
+    "GDPR-Art13": {"result": "dpa", "path": ("article_13_transparency",), "framework": "UK DPA / GDPR"},
+    "GDPR-Art22": {"result": "dpa", "path": ("article_22_adm",), "framework": "UK DPA / GDPR"},
+    "GDPR-Art35": {"result": "dpa", "path": ("article_35_dpia",), "framework": "UK DPA / GDPR"},
+    "ISO-6.1": {"result": "iso", "path": ("risk_management",), "framework": "ISO/IEC 42001"},
+}
+
+# Each correlation fires when at least `min_failing` of its requirements fail
+# (None = all of them). `requirements` pairs a requirement id with the label
+# shown in `affected_requirements`; frameworks are listed in the same order.
+# `impacts` overrides the legacy impacts list, which otherwise repeats the
+# affected frameworks.
+CORRELATIONS: List[Dict[str, Any]] = [
+    {
+        "title": "Incomplete Bias & Fairness Testing",
+        "description": "No bias testing or representative dataset documentation found. This violates both ICO fairness principles and EU AI Act data governance mandates.",
+        "requirements": [("ICO-P2", "ICO-P2 (Fairness)"), ("EU-Art10", "EU-Art10 (Data Governance)")],
+        "min_failing": None,
+        "impact_score": 9,
+        "suggested_fix": "Implement bias testing with representative datasets across protected characteristics and document results in a bias audit report.",
+        "severity": "critical",
+        "issue": "No bias testing or representative dataset documentation",
+        "impacts": ["ICO Principle 2 (Fairness)", "EU AI Act Article 10 (Data Governance)"],
+        "recommendation": "Implement bias testing with representative datasets and document results",
+    },
+    {
+        "title": "Human Oversight Mechanisms Missing",
+        "description": "Human oversight and contestability mechanisms are absent or undocumented across multiple regulatory regimes.",
+        "requirements": [
+            ("ICO-P4", "ICO-P4 (Contestability)"),
+            ("EU-Art14", "EU-Art14 (Human Oversight)"),
+            ("GDPR-Art22", "GDPR-Art22 (Automated Decisions)"),
+        ],
+        "min_failing": 2,
+        "impact_score": 8,
+        "suggested_fix": "Implement human-in-the-loop review processes with documented override procedures and appeal mechanisms.",
+        "severity": "critical",
+        "issue": "Human oversight mechanisms missing across multiple frameworks",
+        "recommendation": "Implement human-in-the-loop review processes with documented procedures",
+    },
+    {
+        "title": "Transparency & Explainability Deficiencies",
+        "description": "AI decision-making logic is insufficiently documented and users are not adequately informed about AI processing across multiple frameworks.",
+        "requirements": [
+            ("ICO-P2", "ICO-P2 (Transparency)"),
+            ("GDPR-Art13", "GDPR-Art13/14 (Transparency)"),
+            ("EU-Art13", "EU-Art13 (Transparency)"),
+        ],
+        "min_failing": 2,
+        "impact_score": 7,
+        "suggested_fix": "Document AI decision logic in plain language, implement explainability mechanisms, and ensure data subjects are informed per GDPR Art 13/14.",
+        "severity": "high",
+        "issue": "Transparency and explainability gaps across multiple frameworks",
+        "recommendation": "Document AI decision logic and ensure users are informed about AI processing",
+    },
+    {
+        "title": "Outdated or Missing Risk Assessment & DPIA",
+        "description": "Data Protection Impact Assessment is missing or outdated, and ISO 42001 risk assessment obligations are unmet.",
+        "requirements": [("GDPR-Art35", "GDPR-Art35 (DPIA)"), ("ISO-6.1", "ISO-6.1 (Risk Assessment)")],
+        "min_failing": None,
+        "impact_score": 8,
+        "suggested_fix": "Conduct a formal DPIA refresh under UK GDPR Article 35, aligned with ISO 42001 Clause 6.1 risk assessment requirements.",
+        "severity": "high",
+        "issue": "DPIA and risk assessment gaps across GDPR and ISO 42001",
+        "recommendation": "Conduct formal DPIA and risk assessment aligned with both frameworks",
+    },
+]
+
+
+def _build_requirement_index(
+    requirements: Dict[str, Dict[str, Any]],
+    correlations: List[Dict[str, Any]],
+) -> Dict[str, List[Tuple[str, Tuple[str, ...], bool]]]:
+    """Group the requirements used by any correlation by the result they read.
+
+    Maps result name → [(requirement id, clause path, high_risk_only)] so each
+    agent result is visited once per synthesis, however many correlations
+    reference it.
+    """
+    used = {req_id for corr in correlations for req_id, _ in corr["requirements"]}
+    unknown = used - requirements.keys()
+    if unknown:
+        raise ValueError(f"Correlations reference unknown requirements: {sorted(unknown)}")
+
+    index: Dict[str, List[Tuple[str, Tuple[str, ...], bool]]] = {}
+    for req_id in sorted(used):
+        spec = requirements[req_id]
+        index.setdefault(spec["result"], []).append(
+            (req_id, tuple(spec["path"]), bool(spec.get("high_risk_only")))
+        )
+    return index
+
+
+_REQUIREMENT_INDEX = _build_requirement_index(REQUIREMENTS, CORRELATIONS)
+
+
+def _failing_requirements(results: Dict[str, Optional[Dict[str, Any]]]) -> FrozenSet[str]:
+    """Ids of every mapped requirement whose clause is NOT_MET / EVIDENCE_MISSING."""
+    failing = set()
+    for result_name, clauses in _REQUIREMENT_INDEX.items():
+        result = results.get(result_name)
+        if not result:
+            continue
+        high_risk = result.get("risk_tier") == "HIGH_RISK"
+        for req_id, path, high_risk_only in clauses:
+            if high_risk_only and not high_risk:
+                continue
+            node: Any = result
+            for key in path:
+                node = node.get(key) if isinstance(node, dict) else None
+            if isinstance(node, dict) and node.get("status") in FAILING_STATUSES:
+                failing.add(req_id)
+    return frozenset(failing)
+
+
+def detect_cross_framework_gaps(results: Dict[str, Optional[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Evaluate every entry in CORRELATIONS against the agent results in one pass."""
+    failing = _failing_requirements(results)
+    gaps = []
+
+    for corr in CORRELATIONS:
+        hits = [(req_id, label) for req_id, label in corr["requirements"] if req_id in failing]
+        needed = corr["min_failing"] or len(corr["requirements"])
+        if len(hits) < needed:
+            continue
+
+        frameworks = [REQUIREMENTS[req_id]["framework"] for req_id, _ in hits]
+        gaps.append({
+            "id": f"gap-{len(gaps) + 1}",
+            "title": corr["title"],
+            "description": corr["description"],
+            "affected_frameworks": frameworks,
+            "affected_requirements": [label for _, label in hits],
+            "impact_score": corr["impact_score"],
+            "suggested_fix": corr["suggested_fix"],
+            "severity": corr["severity"],
+            # Legacy fields for backward compat
+            "issue": corr["issue"],
+            "impacts": list(corr.get("impacts") or frameworks),
+            "recommendation": corr["recommendation"],
+        })
+    return gaps
+
+
+def is_scored(result: Optional[Dict[str, Any]]) -> bool:
+    """Whether a framework result counts towards the UK Alignment Score.
+
+    Timed-out and NOT_EVALUATED results carry a placeholder score of 0 rather
+    than an assessment, so they are treated like frameworks that were not run.
+    """
+    return bool(result) and not result.get("timed_out") and result.get("status") != "NOT_EVALUATED"
 
 
 def synthesize_gaps(
@@ -6,35 +180,40 @@ def synthesize_gaps(
     eu_act_result: Optional[Dict[str, Any]],
     dpa_result: Optional[Dict[str, Any]],
     iso_result: Optional[Dict[str, Any]],
-    selected_frameworks: List[str]
+    selected_frameworks: List[str],
+    weights: Optional[Dict[str, float]] = None
 ) -> Dict[str, Any]:
     """
     Synthesize results across all frameworks.
-    Calculate UK Alignment Score and identify cross-framework gaps.
-    Produces enriched output for the compliance matrix, cross-framework
+    Calculate UK Alignment Score (UK_ALIGNMENT_WEIGHTS unless `weights` is
+    given) and identify cross-framework gaps. Results that were not scored
+    (see is_scored) are left out, as if the framework had not been run;
+    NOT_EVALUATED ones that did not time out are listed under
+    frameworks_not_evaluated rather than frameworks_analyzed. Produces enriched output for the compliance matrix, cross-framework
     gap correlations, and prioritized action plan components.
     """
     
+    not_evaluated = [
+        code for code, result in (
+            ("ICO", ico_result), ("EU_AI_ACT", eu_act_result),
+            ("DPA", dpa_result), ("ISO_42001", iso_result),
+        )
+        if result and not result.get("timed_out") and not is_scored(result)
+    ]
+    ico_result, eu_act_result, dpa_result, iso_result = (
+        result if is_scored(result) else None
+        for result in (ico_result, eu_act_result, dpa_result, iso_result)
+    )
+
     # Calculate UK Alignment Score (weighted)
+    weights = weights or UK_ALIGNMENT_WEIGHTS
     uk_score = 0
     weights_applied = 0
     
-    if ico_result:
-        uk_score += ico_result.get("score", 0) * 0.4
-        weights_applied += 0.4
-    
-    if dpa_result:
-        uk_score += dpa_result.get("score", 0) * 0.3
-        weights_applied += 0.3
-    
-    if iso_result:
-        uk_score += iso_result.get("score", 0) * 0.2
-        weights_applied += 0.2
-    
-    # EU AI Act counts as supplementary (10% if present)
-    if eu_act_result:
-        uk_score += eu_act_result.get("score", 0) * 0.1
-        weights_applied += 0.1
+    for key, result in (("ico", ico_result), ("dpa", dpa_result), ("iso", iso_result), ("eu_act", eu_act_result)):
+        if result:
+            uk_score += result.get("score", 0) * weights[key]
+            weights_applied += weights[key]
     
     # Normalize if not all frameworks were run
     if weights_applied > 0:
@@ -43,149 +222,12 @@ def synthesize_gaps(
         uk_alignment_score = 0
     
     # ── Cross-framework gap detection ─────────────────────────────────────
-    cross_framework_gaps = []
-    gap_counter = 0
-    
-    # Bias / Fairness gap (ICO + EU Act)
-    if ico_result and eu_act_result:
-        ico_fairness_bad = False
-        eu_data_gov_bad = False
-        
-        if "principle_2_fairness" in ico_result:
-            ico_fairness_bad = ico_result["principle_2_fairness"].get("status") in ["NOT_MET", "EVIDENCE_MISSING"]
-        
-        if eu_act_result.get("risk_tier") == "HIGH_RISK":
-            obligations = eu_act_result.get("obligations_if_high_risk", {})
-            if "data_governance" in obligations:
-                eu_data_gov_bad = obligations["data_governance"].get("status") in ["NOT_MET", "EVIDENCE_MISSING"]
-        
-        if ico_fairness_bad and eu_data_gov_bad:
-            gap_counter += 1
-            cross_framework_gaps.append({
-                "id": f"gap-{gap_counter}",
-                "title": "Incomplete Bias & Fairness Testing",
-                "description": "No bias testing or representative dataset documentation found. This violates both ICO fairness principles and EU AI Act data governance mandates.",
-                "affected_frameworks": ["UK ICO", "EU AI Act"],
-                "affected_requirements": ["ICO-P2 (Fairness)", "EU-Art10 (Data Governance)"],
-                "impact_score": 9,
-                "suggested_fix": "Implement bias testing with representative datasets across protected characteristics and document results in a bias audit report.",
-                "severity": "critical",
-                # Legacy fields for backward compat
-                "issue": "No bias testing or representative dataset documentation",
-                "impacts": ["ICO Principle 2 (Fairness)", "EU AI Act Article 10 (Data Governance)"],
-                "recommendation": "Implement bias testing with representative datasets and document results"
-            })
-    
-    # Human oversight gap
-    human_oversight_gaps = []
-    human_oversight_reqs = []
-    
-    if ico_result:
-        if "principle_4_contestability" in ico_result:
-            if ico_result["principle_4_contestability"].get("status") in ["NOT_MET", "EVIDENCE_MISSING"]:
-                human_oversight_gaps.append("UK ICO")
-                human_oversight_reqs.append("ICO-P4 (Contestability)")
-    
-    if eu_act_result and eu_act_result.get("risk_tier") == "HIGH_RISK":
-        obligations = eu_act_result.get("obligations_if_high_risk", {})
-        if "human_oversight" in obligations:
-            if obligations["human_oversight"].get("status") in ["NOT_MET", "EVIDENCE_MISSING"]:
-                human_oversight_gaps.append("EU AI Act")
-                human_oversight_reqs.append("EU-Art14 (Human Oversight)")
-    
-    if dpa_result:
-        if "article_22_adm" in dpa_result:
-            if dpa_result["article_22_adm"].get("status") in ["NOT_MET", "EVIDENCE_MISSING"]:
-                human_oversight_gaps.append("UK DPA / GDPR")
-                human_oversight_reqs.append("GDPR-Art22 (Automated Decisions)")
-    
-    if len(human_oversight_gaps) >= 2:
-        gap_counter += 1
-        cross_framework_gaps.append({
-            "id": f"gap-{gap_counter}",
-            "title": "Human Oversight Mechanisms Missing",
-            "description": "Human oversight and contestability mechanisms are absent or undocumented across multiple regulatory regimes.",
-            "affected_frameworks": human_oversight_gaps,
-            "affected_requirements": human_oversight_reqs,
-            "impact_score": 8,
-            "suggested_fix": "Implement human-in-the-loop review processes with documented override procedures and appeal mechanisms.",
-            "severity": "critical",
-            # Legacy
-            "issue": "Human oversight mechanisms missing across multiple frameworks",
-            "impacts": human_oversight_gaps,
-            "recommendation": "Implement human-in-the-loop review processes with documented procedures"
-        })
-    
-    # Transparency gap
-    transparency_gaps = []
-    transparency_reqs = []
-    
-    if ico_result:
-        if "principle_2_fairness" in ico_result:
-            if ico_result["principle_2_fairness"].get("status") in ["NOT_MET", "EVIDENCE_MISSING"]:
-                transparency_gaps.append("UK ICO")
-                transparency_reqs.append("ICO-P2 (Transparency)")
-    
-    if dpa_result:
-        if "article_13_transparency" in dpa_result:
-            if dpa_result["article_13_transparency"].get("status") in ["NOT_MET", "EVIDENCE_MISSING"]:
-                transparency_gaps.append("UK DPA / GDPR")
-                transparency_reqs.append("GDPR-Art13/14 (Transparency)")
-    
-    if eu_act_result and eu_act_result.get("risk_tier") == "HIGH_RISK":
-        obligations = eu_act_result.get("obligations_if_high_risk", {})
-        if "transparency" in obligations:
-            if obligations["transparency"].get("status") in ["NOT_MET", "EVIDENCE_MISSING"]:
-                transparency_gaps.append("EU AI Act")
-                transparency_reqs.append("EU-Art13 (Transparency)")
-    
-    if len(transparency_gaps) >= 2:
-        gap_counter += 1
-        cross_framework_gaps.append({
-            "id": f"gap-{gap_counter}",
-            "title": "Transparency & Explainability Deficiencies",
-            "description": "AI decision-making logic is insufficiently documented and users are not adequately informed about AI processing across multiple frameworks.",
-            "affected_frameworks": transparency_gaps,
-            "affected_requirements": transparency_reqs,
-            "impact_score": 7,
-            "suggested_fix": "Document AI decision logic in plain language, implement explainability mechanisms, and ensure data subjects are informed per GDPR Art 13/14.",
-            "severity": "high",
-            # Legacy
-            "issue": "Transparency and explainability gaps across multiple frameworks",
-            "impacts": transparency_gaps,
-            "recommendation": "Document AI decision logic and ensure users are informed about AI processing"
-        })
-
-    # DPIA gap (GDPR + ISO)
-    if dpa_result and iso_result:
-        dpia_bad = False
-        iso_risk_bad = False
-
-        if "article_35_dpia" in dpa_result:
-            dpia_bad = dpa_result["article_35_dpia"].get("status") in ["NOT_MET", "EVIDENCE_MISSING"]
-
-        # Check ISO risk assessment (clause 6.1)
-        for key in iso_result:
-            if isinstance(iso_result[key], dict) and "risk" in key.lower():
-                if iso_result[key].get("status") in ["NOT_MET", "EVIDENCE_MISSING"]:
-                    iso_risk_bad = True
-                    break
-
-        if dpia_bad and iso_risk_bad:
-            gap_counter += 1
-            cross_framework_gaps.append({
-                "id": f"gap-{gap_counter}",
-                "title": "Outdated or Missing Risk Assessment & DPIA",
-                "description": "Data Protection Impact Assessment is missing or outdated, and ISO 42001 risk assessment obligations are unmet.",
-                "affected_frameworks": ["UK DPA / GDPR", "ISO/IEC 42001"],
-                "affected_requirements": ["GDPR-Art35 (DPIA)", "ISO-6.1 (Risk Assessment)"],
-                "impact_score": 8,
-                "suggested_fix": "Conduct a formal DPIA refresh under UK GDPR Article 35, aligned with ISO 42001 Clause 6.1 risk assessment requirements.",
-                "severity": "high",
-                "issue": "DPIA and risk assessment gaps across GDPR and ISO 42001",
-                "impacts": ["UK DPA / GDPR", "ISO/IEC 42001"],
-                "recommendation": "Conduct formal DPIA and risk assessment aligned with both frameworks"
-            })
+    cross_framework_gaps = detect_cross_framework_gaps({
+        "ico": ico_result,
+        "eu_act": eu_act_result,
+        "dpa": dpa_result,
+        "iso": iso_result,
+    })
 
     # ── Aggregate priority actions ─────────────────────────────────────────
     all_priority_actions = []
@@ -234,7 +276,8 @@ def synthesize_gaps(
         "action_plan": action_plan,
         "overall_status": overall_status,
         "executive_summary": generate_summary(uk_alignment_score, total_critical_gaps),
-        "frameworks_analyzed": selected_frameworks,
+        "frameworks_analyzed": [code for code in selected_frameworks if code not in not_evaluated],
+        "frameworks_not_evaluated": not_evaluated,
         "summary": generate_summary(uk_alignment_score, total_critical_gaps)
     }
 
@@ -0,0 +1,56 @@
+"""Chunked handling of uploaded PDFs.
+
+Uploads are read in fixed-size chunks, hashed as they stream past and
+written to a SpooledTemporaryFile that stays in memory for small files and
+rolls over to disk for large ones. Reading stops as soon as a file exceeds
+the configured maximum, so an oversized upload costs at most one chunk of
+extra memory, however large it is.
+"""
+from tempfile import SpooledTemporaryFile
+from typing import Any, NamedTuple
+import hashlib
+import os
+
+
+MAX_UPLOAD_BYTES = int(os.environ.get("UPLOAD_MAX_MB", "50")) * 1024 * 1024
+# Whole multipart request (several files in a batch), checked from Content-Length
+MAX_REQUEST_BYTES = int(os.environ.get("UPLOAD_MAX_REQUEST_MB", "200")) * 1024 * 1024
+# Uploads up to this size stay in memory; larger ones are spooled to disk
+SPOOL_MAX_BYTES = int(os.environ.get("UPLOAD_SPOOL_KB", "1024")) * 1024
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadTooLarge(ValueError):
+    """An upload exceeded MAX_UPLOAD_BYTES."""
+
+
+class SpooledUpload(NamedTuple):
+    file: SpooledTemporaryFile   # positioned at 0
+    filename: str
+    size: int
+    sha256: str
+
+
+async def spool_upload(upload: Any, max_bytes: int = MAX_UPLOAD_BYTES) -> SpooledUpload:
+    """Copy an UploadFile (anything with async read(size)) into a spooled temp file.
+
+    Raises UploadTooLarge as soon as more than `max_bytes` have been read.
+    The caller owns the returned file and should close it when done.
+    """
+    digest = hashlib.sha256()
+    spooled = SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    size = 0
+    try:
+        while chunk := await upload.read(CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(
+                    f"{getattr(upload, 'filename', 'upload')} exceeds the {max_bytes // (1024 * 1024)} MB upload limit"
+                )
+            digest.update(chunk)
+            spooled.write(chunk)
+    except BaseException:
+        spooled.close()
+        raise
+    spooled.seek(0)
+    return SpooledUpload(spooled, getattr(upload, "filename", None) or "upload.pdf", size, digest.hexdigest())
@@ -1,19 +1,77 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from typing import List, Dict, Any
-from uuid import uuid4
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.datastructures import Headers
+from typing import AsyncIterator, BinaryIO, Callable, Iterator, List, Dict, Any, Optional
 from datetime import datetime
-from io import BytesIO
-import tempfile
-import os
+import asyncio
 import base64
+import hashlib
+import json
+import os
+
+from graph import (  # type: ignore
+    FRAMEWORK_AGENTS, compliance_graph, ComplianceState, extract_document, resynthesize, run_framework,
+    synthesizer_node,
+)
+from agents.report_cache import open_report, render_report, report_cache, report_key
+from agents.bulk_export import stream_reports
+from agents.jobs import JOB_STATUSES, Job, JobRejected, job_manager
+from agents.cancellation import Cancelled
+from agents.deadlines import ANALYSIS_DEADLINE_S, deadline
+from agents.uploads import MAX_REQUEST_BYTES, SpooledUpload, UploadTooLarge, spool_upload
+from agents.evidence import EVIDENCE_MODE
+from agents.parsing import output_token_stats
+from agents.metrics import CONTENT_TYPE, registry as metrics_registry
+from prompts import PROMPT_VERSION
+# Completed analyses, bounded by entries/bytes/TTL (reports are rendered on demand),
+# and documents extracted ahead of analysis (POST /documents)
+from agents.analysis_store import analysis_store, document_store
 
-from graph import compliance_graph, ComplianceState  # type: ignore
+REPORT_CHUNK_SIZE = 64 * 1024
+# Idle seconds between SSE keepalive comments (keeps proxies from closing streams)
+SSE_HEARTBEAT_S = 15.0
+# How often a waiting request checks whether its client has gone away
+DISCONNECT_POLL_S = 1.0
 
 app = FastAPI(title="AI Compliance Tool API")
 
+# With the SQLite store, any worker can answer for jobs queued on another
+job_manager.on_update = analysis_store.put_job
+
+
+class RejectOversizedUploads:
+    """413 multipart requests whose declared size is over the limit, before the body is read.
+
+    Plain ASGI rather than @app.middleware("http"): that wrapper hides client
+    disconnects from handlers, which cancellation relies on.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            headers = Headers(scope=scope)
+            length = headers.get("content-length", "")
+            if (
+                headers.get("content-type", "").startswith("multipart/form-data")
+                and length.isdigit()
+                and int(length) > MAX_REQUEST_BYTES
+            ):
+                response = JSONResponse(
+                    status_code=413,
+                    content={"detail": f"Request exceeds the {MAX_REQUEST_BYTES // (1024 * 1024)} MB upload limit"},
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+app.add_middleware(RejectOversizedUploads)
+
 # Allow cross-origin requests so Next.js frontend can call this API
+# (added last so it wraps everything, including the 413 above)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -22,9 +80,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Simple in-memory store for analysis results and reports
-analysis_store: Dict[str, Dict[str, Any]] = {}
-
 
 @app.get("/health")
 def health() -> Dict[str, str]:
@@ -32,95 +87,821 @@ def health() -> Dict[str, str]:
     return {"status": "ok"}
 
 
+@app.get("/stats")
+def stats() -> Dict[str, Any]:
+    """Occupancy and eviction counters for the result store, report cache and job queue,
+    and mean output tokens per model call by caller and evidence mode."""
+    return {
+        "analysis_store": analysis_store.stats(),
+        "document_store": document_store.stats(),
+        "report_cache": report_cache.stats(),
+        "jobs": job_manager.stats(),
+        "output_tokens": output_token_stats(),
+    }
+
+
+# ── Metrics ───────────────────────────────────────────────────────────────
+# Pipeline metrics (node/model latency, tokens, parse outcomes, PDF pages) are
+# recorded where the work happens; these read the counters the store, cache
+# and queue already keep, only when /metrics is scraped.
+
+def _cache_metrics(prefix: str, stats: Callable[[], Dict[str, Any]]) -> None:
+    def lookups() -> Dict[tuple, float]:
+        current = stats()
+        return {("hit",): current["hits"], ("miss",): current["misses"]}
+
+    def hit_ratio() -> Dict[tuple, float]:
+        current = stats()
+        total = current["hits"] + current["misses"]
+        return {(): current["hits"] / total if total else 0.0}
+
+    metrics_registry.collected(
+        f"compliance_{prefix}_lookups_total", f"{prefix} lookups by result.", "counter", lookups, ["result"],
+    )
+    metrics_registry.collected(
+        f"compliance_{prefix}_hit_ratio", f"{prefix} hits / lookups since start.", "gauge", hit_ratio,
+    )
+    metrics_registry.collected(
+        f"compliance_{prefix}_entries", f"Entries currently held by the {prefix}.", "gauge",
+        lambda: {(): stats()["entries"]},
+    )
+    metrics_registry.collected(
+        f"compliance_{prefix}_bytes", f"Bytes currently held by the {prefix}.", "gauge",
+        lambda: {(): stats()["bytes"]},
+    )
+
+
+_cache_metrics("report_cache", report_cache.stats)
+_cache_metrics("analysis_store", analysis_store.stats)
+_cache_metrics("document_store", document_store.stats)
+metrics_registry.collected(
+    "compliance_report_cache_evictions_total", "Rendered reports evicted from the cache.", "counter",
+    lambda: {(): report_cache.stats()["evictions"]},
+)
+metrics_registry.collected(
+    "compliance_analysis_store_evictions_total", "Analyses evicted from the store, by reason.", "counter",
+    lambda: {(reason,): count for reason, count in analysis_store.stats()["evictions"].items()}, ["reason"],
+)
+
+
+def _jobs_by_status() -> Dict[tuple, float]:
+    # One snapshot, so the statuses add up to the jobs known at that moment
+    current = job_manager.stats()
+    return {(status,): current[status] for status in JOB_STATUSES}
+
+
+metrics_registry.collected(
+    "compliance_jobs", "Jobs known to this worker by status (queued = queue depth, running = in flight).",
+    "gauge", _jobs_by_status, ["status"],
+)
+metrics_registry.collected(
+    "compliance_jobs_queued", "Jobs waiting to run, by priority lane.", "gauge",
+    lambda: {(lane,): count for lane, count in job_manager.stats()["queued_by_priority"].items()}, ["priority"],
+)
+metrics_registry.collected(
+    "compliance_jobs_rejected_total", "Submissions refused by admission control, by reason.", "counter",
+    lambda: {(reason,): count for reason, count in job_manager.stats()["rejected"].items()}, ["reason"],
+)
+metrics_registry.collected(
+    "compliance_job_workers", "Worker threads available to run jobs.", "gauge",
+    lambda: {(): job_manager.workers},
+)
+metrics_registry.collected(
+    "compliance_jobs_coalesced_total", "Requests attached to an identical in-flight analysis.", "counter",
+    lambda: {(): job_manager.coalesced},
+)
+
+
+@app.get("/metrics")
+def metrics() -> Response:
+    """Prometheus text-format metrics for this worker process."""
+    return Response(metrics_registry.render(), media_type=CONTENT_TYPE)
+
+
+# Graph nodes in execution order, for job progress reporting
+PIPELINE_NODES = [name for name in compliance_graph.nodes if not name.startswith("__")]
+
+
+def _node_event(node: str, update: Dict[str, Any] | None) -> Dict[str, Any]:
+    """SSE payload for one node's state delta (new messages plus changed keys)."""
+    update = dict(update or {})
+    update.pop("pdf_source", None)
+    messages = update.pop("status_messages", [])
+    if isinstance(update.get("extracted_data"), dict):
+        # The raw document dump is neither progress nor a result
+        update["extracted_data"] = {k: v for k, v in update["extracted_data"].items() if k != "full_text"}
+    return {"node": node, "status_messages": messages, "updates": update}
+
+
+def _publish_node(job: Job, event: Dict[str, Any]) -> None:
+    """Publish a node event; once the job is over only its messages stay in the log."""
+    job.publish("update", event, retained={"node": event["node"], "status_messages": event["status_messages"]})
+
+
+def _run_analysis(job: Job, initial_state: ComplianceState, document_sha256: Optional[str] = None) -> None:
+    """Job body: stream the graph, publishing per-node deltas, and store the result.
+
+    The result lives only in analysis_store (not on the Job), so the store's
+    bounds govern how much analysis state the process keeps. The run gets
+    ANALYSIS_DEADLINE_S in total; frameworks still running when it expires
+    come back NOT_EVALUATED with timed_out set (see synthesis.frameworks_timed_out).
+    """
+    final_state: Dict[str, Any] | None = None
+
+    # "updates" yields each node's delta for subscribers; "values" the full
+    # state after each step, the last of which is the result
+    try:
+        with deadline(ANALYSIS_DEADLINE_S):
+            for mode, chunk in compliance_graph.stream(initial_state, stream_mode=["updates", "values"]):
+                if mode == "values":
+                    final_state = chunk
+                    continue
+                for node, update in chunk.items():
+                    event = _node_event(node, update)
+                    job.update_progress(
+                        node=node,
+                        nodes_completed=PIPELINE_NODES.index(node) + 1 if node in PIPELINE_NODES else None,
+                        nodes_total=len(PIPELINE_NODES),
+                        status_messages=job.progress.get("status_messages", []) + event["status_messages"],
+                    )
+                    _publish_node(job, event)
+    except Cancelled:
+        if job.keep_partial and final_state is not None:
+            _store_analysis(job.id, final_state, document_sha256, partial=True)
+        raise
+
+    if final_state is None:
+        raise RuntimeError("Analysis did not produce a result.")
+    _store_analysis(job.id, final_state, document_sha256)
+
+
+def _store_analysis(
+    job_id: str, state: Dict[str, Any], document_sha256: Optional[str], partial: bool = False
+) -> None:
+    state_copy = dict(state)
+    # Do not ship the upload in the JSON analysis object
+    state_copy.pop("pdf_source", None)
+
+    if partial and not state_copy.get("synthesis"):
+        # Synthesize over the frameworks that finished so the partial result
+        # (and its report) has scores for them
+        finished = [code for code, (key, _) in FRAMEWORK_AGENTS.items() if state_copy.get(key)]
+        if finished:
+            state_copy["synthesis"] = synthesizer_node({**state_copy, "selected_frameworks": finished})["synthesis"]
+
+    analysis_store[job_id] = {
+        "state": state_copy,
+        "created_at": datetime.utcnow().isoformat(),
+        "document_sha256": document_sha256,
+        "partial": partial,
+    }
+
+
+def analysis_key(document_sha256: str, frameworks: List[str]) -> str:
+    """Single-flight key: everything that determines an analysis' result."""
+    parts = [document_sha256, ",".join(sorted(set(frameworks))), PROMPT_VERSION, EVIDENCE_MODE]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def _job_owner(request: Request) -> str:
+    """Quota identity: a hash of the caller's API key, or its address when it sends none."""
+    key = request.headers.get("x-api-key") or ""
+    authorization = request.headers.get("authorization", "")
+    if not key and authorization.lower().startswith("bearer "):
+        key = authorization[7:].strip()
+    if key:
+        return "key:" + hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+    return "ip:" + (request.client.host if request.client else "unknown")
+
+
+def _job_priority(source: Optional[str]) -> str:
+    """Queue lane for a submission; CI gates (source=ci, as tagged by the CLI) go first."""
+    return "ci" if source == "ci" else "normal"
+
+
+def _rejected(exc: JobRejected) -> HTTPException:
+    return HTTPException(status_code=429, detail=str(exc), headers={"Retry-After": str(exc.retry_after)})
+
+
+async def _spool(file: UploadFile, priority: str, owner: Optional[str]) -> SpooledUpload:
+    # Refuse before reading the upload when there is no room for it anyway
+    try:
+        job_manager.check_admission(priority, owner)
+    except JobRejected as exc:
+        raise _rejected(exc)
+
+    # The upload is closed when the request ends, so the job gets its own
+    # spooled copy (in memory when small, on disk when large)
+    try:
+        return await spool_upload(file)
+    except UploadTooLarge as exc:
+        raise HTTPException(status_code=413, detail=str(exc))
+
+
+def _extraction_key(document_id: str) -> str:
+    """Single-flight key for extracting a document; only the file and prompts affect it."""
+    return f"extract:{document_id}:{PROMPT_VERSION}"
+
+
+def _stored_document(document_id: str) -> Optional[Dict[str, Any]]:
+    """A pre-extracted document, unless missing or extracted under other prompts."""
+    item = document_store.get(document_id)
+    if item and item.get("prompt_version") == PROMPT_VERSION:
+        return item
+    return None
+
+
+def _extract_upload(job: Job, upload: SpooledUpload) -> None:
+    """Job body: extract an uploaded document into document_store."""
+    with upload.file:
+        extracted = extract_document(upload.file)
+    document_store[upload.sha256] = {
+        "state": {"pdf_path": upload.filename, "extracted_data": extracted},
+        "created_at": datetime.utcnow().isoformat(),
+        "prompt_version": PROMPT_VERSION,
+    }
+
+
+async def _submit_analysis(
+    file: Optional[UploadFile],
+    frameworks: List[str],
+    priority: str = "normal",
+    owner: Optional[str] = None,
+    document_id: Optional[str] = None,
+) -> Job:
+    if not frameworks:
+        raise HTTPException(status_code=400, detail="At least one framework must be selected.")
+    if file is None and not document_id:
+        raise HTTPException(status_code=400, detail="Upload a file or pass a document_id from POST /documents.")
+
+    upload: Optional[SpooledUpload] = None
+    if file is not None:
+        upload = await _spool(file, priority, owner)
+        document_id = upload.sha256
+    else:
+        try:
+            job_manager.check_admission(priority, owner)
+        except JobRejected as exc:
+            raise _rejected(exc)
+
+    # Reuse the document's pre-extraction (POST /documents) if it has one
+    # instead of extracting again. If it is still running, the analysis is
+    # queued only once it finishes, so it never holds a worker waiting; a
+    # queued extraction is moved up to this lane so it isn't left behind.
+    # The store is checked again when nothing is in flight, as the extraction
+    # may have stored the document and finished between the two lookups.
+    extraction: Optional[Job] = None
+    stored = _stored_document(document_id)
+    if stored is None:
+        extraction = job_manager.inflight(_extraction_key(document_id), priority)
+        if extraction is None:
+            stored = _stored_document(document_id)
+        if stored is None and extraction is None and upload is None:
+            raise HTTPException(
+                status_code=404, detail="Document not found (expired, or its extraction failed); upload it again."
+            )
+    if stored is not None and upload is not None:
+        upload.file.close()
+        upload = None
+
+    initial_state: ComplianceState = {
+        "pdf_path": upload.filename if upload else document_id,
+        "pdf_source": None,
+        "extracted_data": {},
+        "selected_frameworks": frameworks,
+        "ico_result": None,
+        "eu_act_result": None,
+        "dpa_result": None,
+        "iso_result": None,
+        "synthesis": {},
+        "status_messages": [],
+    }
+
+    def run(job: Job) -> None:
+        state = dict(initial_state)
+        document = _stored_document(document_id)
+        if document is not None:
+            state["pdf_path"] = document["state"]["pdf_path"]
+            state["extracted_data"] = document["state"]["extracted_data"]
+        elif upload is None:
+            reason = (extraction.error if extraction else None) or "it has expired"
+            raise LookupError(f"Document {document_id} is not available: {reason}")
+        if upload is None:
+            _run_analysis(job, state, document_sha256=document_id)
+            return
+        with upload.file:
+            if document is None:
+                state["pdf_source"] = upload.file
+            _run_analysis(job, state, document_sha256=document_id)
+
+    # Identical concurrent requests (same document, frameworks, prompts and
+    # evidence mode) share one pipeline run and one job id
+    try:
+        job, created = job_manager.submit_once(
+            run, analysis_key(document_id, frameworks), kind="analysis", priority=priority, owner=owner,
+            after=extraction,
+        )
+    except JobRejected as exc:
+        if upload is not None:
+            upload.file.close()
+        raise _rejected(exc)
+    if not created and upload is not None:
+        upload.file.close()
+    return job
+
+
+async def _wait_for(job: Job) -> Job:
+    """Await a job from the event loop without tying up a thread."""
+    loop = asyncio.get_running_loop()
+    finished: asyncio.Future = loop.create_future()
+
+    def _resolve(done: Job) -> None:
+        if not finished.done():
+            finished.set_result(done)
+
+    job.add_done_callback(lambda done: loop.call_soon_threadsafe(_resolve, done))
+    return await finished
+
+
+async def _wait_while_connected(job: Job, request: Request, keep_partial: bool = False) -> Job:
+    """Await a job, cancelling it if the client disconnects first.
+
+    The job is only cancelled if no other request still waits on it (it may
+    be shared through coalescing) and nobody queued it via POST /jobs.
+    """
+    job.watch()
+    finished = asyncio.ensure_future(_wait_for(job))
+    try:
+        while True:
+            done, _ = await asyncio.wait({finished}, timeout=DISCONNECT_POLL_S)
+            if done:
+                return finished.result()
+            if await request.is_disconnected():
+                raise HTTPException(status_code=499, detail="Client disconnected")
+    finally:
+        finished.cancel()
+        if job.unwatch():
+            job_manager.cancel(job, keep_partial=keep_partial)
+
+
+@app.post("/documents", status_code=202)
+async def create_document(
+    request: Request,
+    response: Response,
+    file: UploadFile = File(...),
+    source: Optional[str] = Form(None),
+) -> Dict[str, Any]:
+    """Start extracting an uploaded PDF and return its document_id immediately.
+
+    Extraction does not depend on which frameworks are chosen, so clients can
+    upload as soon as a file is picked and pass document_id (instead of the
+    file) to /analyze or /jobs later; the analysis then skips the extractor.
+    The id is the file's SHA-256, so uploading the same file again reuses the
+    stored (or still running) extraction. Poll GET /documents/{document_id}
+    for progress; analyses submitted before it is ready wait for it.
+    """
+    priority, owner = _job_priority(source), _job_owner(request)
+    upload = await _spool(file, priority, owner)
+    body = {"document_id": upload.sha256, "document_url": f"/documents/{upload.sha256}"}
+    if _stored_document(upload.sha256):
+        upload.file.close()
+        response.status_code = 200
+        return {**body, "status": "ready"}
+
+    try:
+        job, created = job_manager.submit_once(
+            lambda job: _extract_upload(job, upload),
+            _extraction_key(upload.sha256),
+            kind="extraction",
+            priority=priority,
+            owner=owner,
+        )
+    except JobRejected as exc:
+        upload.file.close()
+        raise _rejected(exc)
+    if not created:
+        upload.file.close()
+    # Nobody holds a connection open for it; don't cancel it when /analyze callers waiting on it disconnect
+    job.pinned = True
+    return {**body, "status": job.status, "job_id": job.id}
+
+
+@app.get("/documents/{document_id}")
+def get_document(document_id: str) -> Dict[str, Any]:
+    """Extraction status of an uploaded document, and its extracted data once ready."""
+    document = _stored_document(document_id)
+    if document:
+        extracted = document["state"]["extracted_data"]
+        return {
+            "document_id": document_id,
+            "status": "ready",
+            "filename": document["state"]["pdf_path"],
+            "created_at": document["created_at"],
+            # The raw document dump is not useful to clients
+            "extracted_data": {k: v for k, v in extracted.items() if k != "full_text"},
+        }
+    job = job_manager.inflight(_extraction_key(document_id))
+    if job is None:
+        raise HTTPException(
+            status_code=404, detail="Document not found (expired, or its extraction failed; see /jobs/{job_id})"
+        )
+    return {"document_id": document_id, "status": job.status, "job_id": job.id}
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(
+    request: Request,
+    file: Optional[UploadFile] = File(None),
+    frameworks: List[str] = Form(...),
+    source: Optional[str] = Form(None),
+    document_id: Optional[str] = Form(None),
+) -> Dict[str, Any]:
+    """Queue a compliance analysis and return its job_id immediately.
+
+    Poll GET /jobs/{job_id} for status and progress, or follow
+    /jobs/{job_id}/events for a live trace; once it is "done" the analysis is
+    included in the job and the PDF is available from /report/{job_id}.
+
+    source=ci queues the job ahead of interactive and bulk work. When the
+    queue or the caller's quota is full the response is 429 with Retry-After.
+    Pass document_id from POST /documents instead of file to reuse its extraction.
+    """
+    job = await _submit_analysis(file, frameworks, _job_priority(source), _job_owner(request), document_id)
+    # Someone will poll for this result; don't cancel it if /analyze callers sharing it disconnect
+    job.pinned = True
+    return {**job.to_dict(), "status_url": f"/jobs/{job.id}", "events_url": f"/jobs/{job.id}/events"}
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str) -> Dict[str, Any]:
+    """Status, progress and (once done) the result of a queued analysis."""
+    job = job_manager.get(job_id)
+    # Queued on another worker (shared store), or aged out of this one's history
+    body = job.to_dict() if job else analysis_store.get_job(job_id)
+    if body is None:
+        item = analysis_store.get(job_id)
+        if not item:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return {"job_id": job_id, "status": "done", "analysis": item["state"]}
+
+    if body["status"] == "done":
+        item = analysis_store.get(job_id)
+        if item:
+            body["analysis"] = item["state"]
+        else:
+            body["result_expired"] = True
+    elif body["status"] == "cancelled":
+        # Present only if the job was cancelled with keep_partial
+        item = analysis_store.get(job_id)
+        if item:
+            body["analysis"] = item["state"]
+            body["partial"] = True
+    return body
+
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str, keep_partial: bool = Query(False)) -> Dict[str, Any]:
+    """Cancel a queued or running analysis.
+
+    A queued job is dropped immediately. A running one stops before its next
+    graph node or model call (a call already in flight is allowed to finish).
+    With keep_partial=true, the results of the nodes that completed are
+    stored and returned by GET /jobs/{job_id}. Returns 409 if the job had
+    already finished.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found (or queued on another worker)")
+    if not job_manager.cancel(job, keep_partial=keep_partial):
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request) -> StreamingResponse:
+    """Live agent trace for a job as Server-Sent Events.
+
+    Emits an `update` event per graph node with its new status messages and
+    partial results, and `status` events for queued → running → done/failed.
+    The stream closes when the job finishes. Reconnecting clients send
+    Last-Event-ID and resume after it; late subscribers replay from the start,
+    though once a finished job has no subscribers left its `update` events
+    keep only node and status messages (the result is at /jobs/{job_id}).
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    last_id = request.headers.get("last-event-id", "")
+    start = int(last_id) + 1 if last_id.isdigit() else 0
+
+    async def stream() -> AsyncIterator[str]:
+        async for event in job.subscribe(start, heartbeat=SSE_HEARTBEAT_S):
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            payload = json.dumps(event["data"], default=str)
+            yield f"id: {event['id']}\nevent: {event['event']}\ndata: {payload}\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _rerun_framework(job: Job, job_id: str, code: str) -> None:
+    """Job body: re-run one framework on a stored analysis and re-synthesize it."""
+    item = analysis_store.get(job_id)
+    if not item:
+        raise LookupError(f"Analysis {job_id} has expired")
+
+    delta = run_framework(item["state"], code)
+    _publish_node(job, _node_event(code, delta))
+    result_key, _ = FRAMEWORK_AGENTS[code]
+    merged: Dict[str, Any] = {}
+
+    def merge(current: Dict[str, Any]) -> Dict[str, Any]:
+        # Runs inside the store's update, so re-runs of other frameworks on
+        # this job (in any worker process) are merged rather than overwritten
+        previous = current["state"]
+        selected = list(previous.get("selected_frameworks") or [])
+        if code not in selected:
+            selected.append(code)
+        state = {**previous, result_key: delta[result_key], "selected_frameworks": selected}
+        synthesis = resynthesize(state)
+        state["synthesis"] = synthesis["synthesis"]
+        state["status_messages"] = (
+            list(previous.get("status_messages") or []) + delta["status_messages"] + synthesis["status_messages"]
+        )
+        merged.update(previous=previous, synthesis=synthesis)
+        return {**current, "state": state, "updated_at": datetime.utcnow().isoformat()}
+
+    if analysis_store.update(job_id, merge) is None:
+        raise LookupError(f"Analysis {job_id} has expired")
+    _publish_node(job, _node_event("synthesizer", merged["synthesis"]))
+
+    # The report's content hash changed; drop the stale PDF rather than wait for LRU
+    report_cache.discard(report_key(merged["previous"]))
+
+
+@app.post("/jobs/{job_id}/frameworks/{code}")
+async def rerun_framework_endpoint(job_id: str, code: str, request: Request) -> Dict[str, Any]:
+    """Re-run a single framework agent against a completed analysis.
+
+    Reuses the stored extracted_data, so it costs one analysis-model call
+    instead of a full /analyze (no re-upload, no re-extraction). The
+    framework's result and the synthesis are replaced in the stored
+    analysis, and /report/{job_id} renders the updated report. Use it when
+    an agent came back NOT_EVALUATED or after a prompt change.
+    """
+    code = code.upper()
+    if code not in FRAMEWORK_AGENTS:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown framework {code}; expected one of {', '.join(FRAMEWORK_AGENTS)}"
+        )
+    if job_id not in analysis_store:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+
+    try:
+        job, _ = job_manager.submit_once(
+            lambda rerun: _rerun_framework(rerun, job_id, code),
+            f"rerun:{job_id}:{code}",
+            kind="rerun",
+            owner=_job_owner(request),
+        )
+    except JobRejected as exc:
+        raise _rejected(exc)
+
+    job = await _wait_while_connected(job, request)
+    item = analysis_store.get(job_id)
+    if job.status != "done" or not item:
+        raise HTTPException(status_code=500, detail=f"Re-run failed: {job.error or 'analysis result was evicted'}")
+    return {"job_id": job_id, "framework": code, "rerun_job_id": job.id, "analysis": item["state"]}
+
+
 @app.post("/analyze")
 async def analyze(
-    file: UploadFile = File(...),
+    request: Request,
+    file: Optional[UploadFile] = File(None),
     frameworks: List[str] = Form(...),
+    include_report: bool = Form(False),
+    source: Optional[str] = Form(None),
+    keep_partial: bool = Form(False),
+    document_id: Optional[str] = Form(None),
 ) -> Dict[str, Any]:
     """Run the full compliance analysis pipeline on an uploaded PDF.
 
     This wraps the existing LangGraph `compliance_graph` and returns the
-    same state structure that the Streamlit app uses, plus a job_id.
+    same state structure that the Streamlit app uses, plus a job_id. The PDF
+    report is downloaded from /report/{job_id}; pass include_report=true to
+    also get it inline as base64.
+
+    The analysis runs on the job queue like POST /jobs (same source=ci lane
+    and 429 admission rules); this endpoint simply holds the connection until
+    it finishes. Prefer /jobs for long documents.
+
+    If the client disconnects first, the analysis is cancelled (unless other
+    requests share it), and with keep_partial=true what was completed is
+    stored under the job id.
+
+    Instead of file, pass the document_id returned by POST /documents to
+    skip extraction (the file was already extracted on upload).
     """
+    job = await _submit_analysis(file, frameworks, _job_priority(source), _job_owner(request), document_id)
+    job = await _wait_while_connected(job, request, keep_partial)
+    if job.status == "cancelled":
+        raise HTTPException(status_code=409, detail="Analysis was cancelled.")
+    if job.status != "done":
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {job.error}")
 
-    if not frameworks:
-        raise HTTPException(status_code=400, detail="At least one framework must be selected.")
+    item = analysis_store.get(job.id)
+    if not item:
+        raise HTTPException(status_code=500, detail="Analysis result was evicted before it could be returned.")
+    state_copy = item["state"]
 
-    # Persist uploaded PDF to a temp file for the extractor
-    suffix = os.path.splitext(file.filename or "")[1] or ".pdf"
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        tmp_path = tmp.name
-        content = await file.read()
-        tmp.write(content)
+    # Inline base64 is opt-in: it is a third larger than the PDF and holds
+    # the whole report in memory, whereas /report streams it from disk
+    report_b64 = None
+    if include_report:
+        report_b64 = base64.b64encode(await asyncio.to_thread(render_report, state_copy)).decode("ascii")
 
-    try:
-        # Initial graph state mirrors the Streamlit app's `initial_state`
-        initial_state: ComplianceState = {
-            "pdf_path": tmp_path,
-            "extracted_data": {},
-            "selected_frameworks": frameworks,
-            "ico_result": None,
-            "eu_act_result": None,
-            "dpa_result": None,
-            "iso_result": None,
-            "synthesis": {},
-            "report_bytes": b"",
-            "status_messages": [],
-        }
+    return {
+        "job_id": job.id,
+        "analysis": state_copy,
+        "report_base64": report_b64,
+    }
 
-        final_state: Dict[str, Any] | None = None
 
-        # Stream through the LangGraph workflow and capture the last state
-        for event in compliance_graph.stream(initial_state):
-            for _, node_state in event.items():
-                if isinstance(node_state, dict):
-                    final_state = node_state
+def _file_frameworks(files: List[UploadFile], default: List[str], per_file: Optional[str]) -> List[List[str]]:
+    """Framework list for each uploaded file.
 
-        if final_state is None:
-            raise HTTPException(status_code=500, detail="Analysis did not produce a result.")
+    `per_file` is optional JSON: a list aligned with the files, or an object
+    keyed by filename. Files without an entry use the shared `default`.
+    """
+    overrides: Any = {}
+    if per_file:
+        try:
+            overrides = json.loads(per_file)
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="file_frameworks must be JSON.")
+    if not isinstance(overrides, (list, dict)):
+        raise HTTPException(status_code=400, detail="file_frameworks must be a list or an object.")
 
-        # Create a job id and store the result + PDF report bytes
-        job_id = str(uuid4())
-        report_bytes = final_state.get("report_bytes") or b""
+    resolved = []
+    for index, file in enumerate(files):
+        if isinstance(overrides, list):
+            chosen = overrides[index] if index < len(overrides) else None
+        else:
+            chosen = overrides.get(file.filename or "")
+        chosen = chosen or default
+        if not chosen:
+            raise HTTPException(
+                status_code=400, detail=f"No frameworks selected for {file.filename or f'file {index}'}."
+            )
+        resolved.append(list(chosen))
+    return resolved
 
-        state_copy = dict(final_state)
-        # Do not ship raw bytes in the JSON analysis object
-        state_copy["report_bytes"] = None
 
-        analysis_store[job_id] = {
-            "state": state_copy,
-            "report_bytes": report_bytes,
-            "created_at": datetime.utcnow().isoformat(),
-        }
+@app.post("/analyze/batch")
+async def analyze_batch(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    frameworks: Optional[List[str]] = Form(None),
+    file_frameworks: Optional[str] = Form(None),
+    keep_partial: bool = Form(False),
+) -> StreamingResponse:
+    """Analyze several PDFs in one request, streaming results as NDJSON.
 
-        # Optional: include base64-encoded report in the response
-        report_b64 = base64.b64encode(report_bytes).decode("ascii") if report_bytes else None
+    Every file becomes a job in the bulk lane of the shared worker pool, so
+    single analyses and CI gates run ahead of it (identical files are
+    coalesced as usual); files refused by admission control fail with the
+    429 reason. The first line lists the queued jobs; then one line
+    per file is written as soon as it finishes, in completion order, with its
+    analysis or error, and a final `complete` line closes the stream.
+    Closing the stream early cancels the files' unfinished jobs (unless other
+    requests share them).
+    """
+    selections = _file_frameworks(files, frameworks or [], file_frameworks)
+    owner = _job_owner(request)
 
-        return {
-            "job_id": job_id,
-            "analysis": state_copy,
-            "report_base64": report_b64,
-        }
-    finally:
+    # Spool every upload before responding; the request's files close after that
+    entries: List[Dict[str, Any]] = []
+    for index, (file, selected) in enumerate(zip(files, selections)):
+        entry: Dict[str, Any] = {"index": index, "filename": file.filename, "frameworks": selected}
+        try:
+            entry["job"] = await _submit_analysis(file, selected, "bulk", owner)
+            entry["job"].watch()
+        except HTTPException as exc:
+            entry["error"] = exc.detail
+        entries.append(entry)
+
+    def line(event: Dict[str, Any]) -> bytes:
+        return (json.dumps(event, default=str) + "\n").encode("utf-8")
+
+    async def finished(entry: Dict[str, Any]) -> Dict[str, Any]:
+        job = await _wait_for(entry["job"])
+        result = {"index": entry["index"], "filename": entry["filename"], "job_id": job.id}
+        item = analysis_store.get(job.id) if job.status == "done" else None
+        if item:
+            return {"event": "done", **result, "analysis": item["state"]}
+        return {"event": "failed", **result, "error": job.error or "Analysis result was evicted."}
+
+    async def stream() -> AsyncIterator[bytes]:
+        waiting = [asyncio.ensure_future(finished(e)) for e in entries if "job" in e]
+        counts = {"done": 0, "failed": 0}
         try:
-            os.remove(tmp_path)
-        except OSError:
-            pass
+            yield line({
+                "event": "queued",
+                "jobs": [
+                    {
+                        "index": e["index"],
+                        "filename": e["filename"],
+                        "frameworks": e["frameworks"],
+                        "job_id": e["job"].id if "job" in e else None,
+                        "error": e.get("error"),
+                    }
+                    for e in entries
+                ],
+            })
+
+            for entry in entries:
+                if "error" in entry:
+                    counts["failed"] += 1
+                    yield line({"event": "failed", "index": entry["index"], "filename": entry["filename"],
+                                "job_id": None, "error": entry["error"]})
+
+            for next_done in asyncio.as_completed(waiting):
+                event = await next_done
+                counts[event["event"]] += 1
+                yield line(event)
+        finally:
+            # Runs when the client disconnects mid-stream, too: stop waiting
+            # on the jobs, then cancel those nobody else wants
+            for task in waiting:
+                task.cancel()
+            for entry in entries:
+                if "job" in entry and entry["job"].unwatch():
+                    job_manager.cancel(entry["job"], keep_partial=keep_partial)
+
+        yield line({"event": "complete", **counts})
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+def _iter_file(stream: BinaryIO) -> Iterator[bytes]:
+    with stream:
+        while chunk := stream.read(REPORT_CHUNK_SIZE):
+            yield chunk
 
 
 @app.get("/report/{job_id}")
-def get_report(job_id: str):
-    """Download the generated PDF report for a completed analysis."""
+def get_report(job_id: str, request: Request):
+    """Download the generated PDF report for a completed analysis.
+
+    The report is streamed from the on-disk report cache. Its ETag is the
+    content hash of the analysis, so clients revalidating with If-None-Match
+    get a 304 without the PDF being rendered or read.
+    """
     item = analysis_store.get(job_id)
-    if not item or not item.get("report_bytes"):
+    if not item:
         raise HTTPException(status_code=404, detail="Report not found")
 
-    pdf_bytes: bytes = item["report_bytes"]
+    etag = f'"{report_key(item["state"])}"'
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    stream, _ = open_report(item["state"])
 
     return StreamingResponse(
-        BytesIO(pdf_bytes),
+        _iter_file(stream),
         media_type="application/pdf",
         headers={
             "Content-Disposition": f'attachment; filename="compliance_report_{job_id}.pdf"',
+            "Content-Length": str(os.fstat(stream.fileno()).st_size),
+            "ETag": etag,
         },
     )
+
+
+@app.get("/reports/export")
+def export_report_bundle(job_id: Optional[List[str]] = Query(None)) -> StreamingResponse:
+    """Download a zip of PDF reports for the given job ids (all stored jobs if none).
+
+    Reports are taken from the report cache, rendered only on a miss, and
+    the archive is streamed as it is built. manifest.json, the last member,
+    lists the reports written and any that failed to render.
+    """
+    ids = job_id or list(analysis_store)
+    unknown = [i for i in ids if i not in analysis_store]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Unknown job id(s): {', '.join(unknown)}")
+    if not ids:
+        raise HTTPException(status_code=404, detail="No analyses to export")
+
+    # Entries evicted since the check above are skipped
+    return StreamingResponse(
+        stream_reports((i, rec) for i in ids if (rec := analysis_store.get(i))),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="compliance_reports.zip"'},
+    )
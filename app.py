@@ -1,7 +1,6 @@
 import streamlit as st
 import os
 from pathlib import Path
-import tempfile
 from datetime import datetime
 from dotenv import load_dotenv
 
@@ -382,13 +381,29 @@ with col3:
 
 st.markdown("<br>", unsafe_allow_html=True)
 
+@st.cache_resource
+def _extraction_pool():
+    """Threads that extract uploads in the background while frameworks are picked."""
+    from concurrent.futures import ThreadPoolExecutor
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="pre-extract")
+
+
 # Main content area
 if uploaded_file:
-    # Save uploaded file temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-        tmp_file.write(uploaded_file.getvalue())
-        tmp_path = tmp_file.name
-    
+    # Extraction doesn't depend on the frameworks, so start it as soon as the
+    # file lands; Run Analysis then only waits for whatever is left of it
+    import hashlib
+
+    upload_sha = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+    pre_extraction = st.session_state.get('pre_extraction')
+    if not pre_extraction or pre_extraction['sha256'] != upload_sha:
+        from graph import extract_document
+
+        pre_extraction = st.session_state.pre_extraction = {
+            'sha256': upload_sha,
+            'future': _extraction_pool().submit(extract_document, uploaded_file.getvalue()),
+        }
+
     # Action buttons
     btn_col1, btn_col2, btn_col3 = st.columns([1, 1, 4])
     
@@ -396,14 +411,27 @@ if uploaded_file:
         analyze_btn = st.button("🚀 Run Analysis", type="primary", use_container_width=True)
     
     with btn_col2:
-        if 'last_analysis' in st.session_state and st.session_state.last_analysis.get('report_bytes'):
-            st.download_button(
-                "📥 Download PDF",
-                data=st.session_state.last_analysis['report_bytes'],
-                file_name=f"compliance_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
-                mime="application/pdf",
-                use_container_width=True
-            )
+        if 'last_analysis' in st.session_state:
+            # Render the PDF only once asked; later reruns hit the report cache
+            if st.session_state.get('report_requested'):
+                from agents.report_cache import render_report
+
+                st.download_button(
+                    "📥 Download PDF",
+                    data=render_report(st.session_state.last_analysis),
+                    file_name=f"compliance_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
+                    mime="application/pdf",
+                    use_container_width=True
+                )
+            elif st.button("📄 Prepare PDF", use_container_width=True):
+                st.session_state.report_requested = True
+                st.rerun()
+    
+    with btn_col3:
+        if pre_extraction['future'].done():
+            st.caption("📄 Document read — choose frameworks and run the analysis")
+        else:
+            st.caption("⏳ Reading document in the background...")
     
     if analyze_btn:
         if not frameworks:
@@ -412,35 +440,45 @@ if uploaded_file:
         
         from graph import compliance_graph, ComplianceState
         
+        try:
+            with st.spinner("📄 Finishing document extraction..."):
+                extracted_data = pre_extraction['future'].result()
+        except Exception:
+            # The graph's extractor tries again and reports the error in the trace
+            extracted_data = {}
+        
         initial_state: ComplianceState = {
-            "pdf_path": tmp_path,
-            "extracted_data": {},
+            "pdf_path": uploaded_file.name,
+            # Streamlit already holds the upload in memory; parse it from there
+            # if the background extraction did not succeed
+            "pdf_source": uploaded_file.getvalue(),
+            "extracted_data": extracted_data,
             "selected_frameworks": frameworks,
             "ico_result": None,
             "eu_act_result": None,
             "dpa_result": None,
             "iso_result": None,
             "synthesis": {},
-            "report_bytes": b"",
             "status_messages": []
         }
         
         try:
             with st.spinner("🤖 Analyzing document..."):
-                displayed_messages = set()
                 final_state = None
 
-                for event in compliance_graph.stream(initial_state):
-                    for node_name, node_state in event.items():
-                        if node_state and isinstance(node_state, dict):
-                            final_state = node_state
-                            for msg in node_state.get('status_messages', []):
-                                if msg not in displayed_messages:
-                                    st.write(msg)
-                                    displayed_messages.add(msg)
+                # "updates" carries each node's new messages; "values" the full state
+                for mode, chunk in compliance_graph.stream(initial_state, stream_mode=["updates", "values"]):
+                    if mode == "values":
+                        final_state = chunk
+                        continue
+                    for node_name, update in chunk.items():
+                        for msg in (update or {}).get('status_messages', []):
+                            st.write(msg)
 
                 if final_state:
+                    final_state.pop("pdf_source", None)
                     st.session_state.last_analysis = final_state
+                    st.session_state.report_requested = False
 
                 st.success("✅ Analysis complete!")
                 st.rerun()
@@ -467,6 +505,19 @@ if 'last_analysis' in st.session_state:
     </div>
     """, unsafe_allow_html=True)
     
+    timed_out = synthesis.get('frameworks_timed_out') or []
+    if timed_out:
+        st.warning(
+            f"⏱️ Timed out and not evaluated: {', '.join(timed_out)}. "
+            "The UK Alignment Score covers the remaining frameworks only."
+        )
+    not_evaluated = synthesis.get('frameworks_not_evaluated') or []
+    if not_evaluated:
+        st.warning(
+            f"⚠️ Could not be assessed: {', '.join(not_evaluated)}. "
+            "The UK Alignment Score covers the remaining frameworks only."
+        )
+    
     # Two column layout for results
     left_col, right_col = st.columns([1, 1])
     
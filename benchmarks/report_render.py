@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for PDF report rendering.
+
+Renders a synthetic analysis with many gaps and actions repeatedly and
+prints per-report wall time, plus the share spent in `_clean_text`.
+
+Usage:
+    python benchmarks/report_render.py [--reports 50] [--gaps 40] [--actions 40]
+"""
+import argparse
+import cProfile
+import os
+import pstats
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from agents.reporter import generate_report  # noqa: E402
+
+FRAMEWORKS = ("UK ICO AI Principles", "EU AI Act", "UK Data Protection Act 2018", "ISO/IEC 42001")
+SAMPLE = "The provider shall document training data provenance – including third‑party sources — and review it quarterly."
+
+
+def synthetic_analysis(gaps: int, actions: int):
+    """Report inputs shaped like a real run, scaled up."""
+
+    def framework_result(name: str):
+        return {
+            "framework": name,
+            "score": 48,
+            "compliance_summary": f"{name}: " + SAMPLE * 4,
+            "critical_gaps": [f"Gap {i}: {SAMPLE}" for i in range(gaps)],
+            "priority_actions": [f"Action {i}: {SAMPLE}" for i in range(actions)],
+        }
+
+    results = [framework_result(name) for name in FRAMEWORKS]
+    synthesis = {
+        "uk_alignment_score": 48,
+        "summary": SAMPLE * 6,
+        "total_critical_gaps": gaps,
+        "frameworks_analyzed": list(FRAMEWORKS),
+        "framework_scores": {name: 48 for name in FRAMEWORKS},
+        "cross_framework_gaps": [
+            {"issue": f"Issue {i}: {SAMPLE}", "impacts": list(FRAMEWORKS), "recommendation": SAMPLE}
+            for i in range(gaps)
+        ],
+        "priority_actions": [f"{SAMPLE} ({i})" for i in range(actions)],
+    }
+    extracted = {"use_case": "Automated triage of benefit claims", "system_type": "Classifier"}
+    return extracted, results, synthesis
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark PDF report rendering")
+    parser.add_argument("--reports", type=int, default=50, help="Reports to render (default 50)")
+    parser.add_argument("--gaps", type=int, default=40, help="Gaps per framework and cross-framework (default 40)")
+    parser.add_argument("--actions", type=int, default=40, help="Actions per framework and overall (default 40)")
+    args = parser.parse_args()
+
+    extracted, (ico, eu, dpa, iso), synthesis = synthetic_analysis(args.gaps, args.actions)
+
+    def render():
+        return generate_report(extracted, ico, eu, dpa, iso, synthesis)
+
+    size = len(render())  # warm-up: font and module caches
+    timings = []
+    for _ in range(args.reports):
+        start = time.perf_counter()
+        render()
+        timings.append(time.perf_counter() - start)
+
+    profiler = cProfile.Profile()
+    profiler.runcall(render)
+    stats = pstats.Stats(profiler)
+    total = stats.total_tt
+    clean = sum(row[3] for func, row in stats.stats.items() if func[2] == "_clean_text")
+
+    print(f"reports:      {args.reports} ({size / 1024:.0f} KiB each)")
+    print(f"per report:   mean {statistics.mean(timings) * 1000:.1f} ms, "
+          f"median {statistics.median(timings) * 1000:.1f} ms, min {min(timings) * 1000:.1f} ms")
+    print(f"_clean_text:  {clean / total:.1%} of profiled render time")
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,7 @@ Local preview (no transmission, no scoring call):
 import argparse
 import json
 import os
+import shutil
 import sys
 
 # Make the repo root importable so `graph` / `agents` resolve when run from anywhere.
@@ -76,6 +77,7 @@ def run_pipeline(pdf_path: str, frameworks: list) -> dict:
 
     initial_state = {
         "pdf_path": pdf_path,
+        "pdf_source": None,
         "extracted_data": {},
         "selected_frameworks": frameworks,
         "ico_result": None,
@@ -83,7 +85,6 @@ def run_pipeline(pdf_path: str, frameworks: list) -> dict:
         "dpa_result": None,
         "iso_result": None,
         "synthesis": {},
-        "report_bytes": b"",
         "status_messages": [],
     }
     return compliance_graph.invoke(initial_state)
@@ -117,6 +118,8 @@ def main():
                         help="Strict mode: remove all quoted document excerpts before transmission")
     parser.add_argument("--source", choices=["ingest", "ci"], default="ingest",
                         help="Source tag for the audit log entry (default: ingest)")
+    parser.add_argument("--report", metavar="PDF_PATH",
+                        help="Also render the PDF compliance report locally to this path")
     args = parser.parse_args()
 
     if not os.path.isfile(args.pdf):
@@ -131,6 +134,12 @@ def main():
     state = run_pipeline(args.pdf, frameworks)
     payload = build_payload(state, frameworks, args.strip_evidence, args.source)
 
+    if args.report:
+        from agents.report_cache import report_file  # reportlab only needed on request
+
+        shutil.copyfile(report_file(state)[0], args.report)
+        print(f"Report written to {args.report}", file=sys.stderr)
+
     if args.dry_run:
         out = json.dumps(payload, indent=2, default=str)
         if args.output:
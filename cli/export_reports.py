@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+AI Compliance — Bulk Report Export
+
+Renders the PDF compliance report for many saved analyses in parallel and
+bundles them into a single zip archive for auditors.
+
+Each input is a JSON file holding a final analysis state, a stored record
+({"state": ...}) or an /analyze API response ({"analysis": ..., "job_id": ...}).
+Directories are searched for *.json files.
+
+    python cli/export_reports.py analyses/ --output reports.zip
+    python cli/export_reports.py a.json b.json --output reports.zip --workers 4
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+
+# Make the repo root importable so `agents` resolves when run from anywhere.
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+
+def iter_analyses(paths: list):
+    """Yield (analysis id, record) per JSON file, loading one file at a time."""
+    for path in paths:
+        files = sorted(glob.glob(os.path.join(path, "*.json"))) if os.path.isdir(path) else [path]
+        for file in files:
+            with open(file, encoding="utf-8") as fh:
+                record = json.load(fh)
+            analysis_id = record.get("job_id") or os.path.splitext(os.path.basename(file))[0]
+            yield analysis_id, record
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render many saved analyses into one zip of PDF reports.")
+    parser.add_argument("inputs", nargs="+", help="Analysis JSON files or directories of them")
+    parser.add_argument("--output", required=True, help="Path of the zip archive to write")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Render processes (default: BULK_EXPORT_WORKERS or CPU count)")
+    args = parser.parse_args()
+
+    missing = [p for p in args.inputs if not os.path.exists(p)]
+    if missing:
+        parser.error(f"Not found: {', '.join(missing)}")
+
+    from agents.bulk_export import export_reports  # imported lazily so --help works without deps
+
+    summary = export_reports(iter_analyses(args.inputs), args.output, workers=args.workers or None)
+    print(f"Wrote {summary['reports']} report(s) ({summary['bytes'] / 1024:.0f} KiB) to {args.output}",
+          file=sys.stderr)
+    for failure in summary["failed"]:
+        print(f"  failed: {failure['id']}: {failure['error']}", file=sys.stderr)
+    sys.exit(1 if summary["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
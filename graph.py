@@ -1,5 +1,9 @@
 from langgraph.graph import StateGraph, END
-from typing import TypedDict, List, Dict, Any, Optional
+from typing import Annotated, Callable, TypedDict, List, Dict, Any, Optional, Tuple
+import functools
+import operator
+import time
+import openai
 from langchain_openai import ChatOpenAI
 import os
 from dotenv import load_dotenv
@@ -8,19 +12,24 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Import agents
-from agents.extractor import extract_pdf_data
+from agents.extractor import extract_pdf_data, PdfSource
 from agents.router import route_frameworks
 from agents.ico_agent import analyze_ico_compliance
 from agents.eu_act_agent import analyze_eu_act_compliance
 from agents.dpa_agent import analyze_dpa_compliance
 from agents.iso_agent import analyze_iso_compliance
 from agents.synthesizer import synthesize_gaps
-from agents.reporter import generate_report
+from agents.metrics import NODE_SECONDS
+from agents.cancellation import check_cancelled
+from agents.deadlines import NODE_TIMEOUT_S, DeadlineExceeded, client_limits, deadline
+from agents.parsing import not_evaluated_result
 
 
 # State definition
 class ComplianceState(TypedDict):
     pdf_path: str
+    # In-memory upload (bytes or binary stream); takes precedence over pdf_path
+    pdf_source: Optional[PdfSource]
     extracted_data: Dict[str, Any]
     selected_frameworks: List[str]
     ico_result: Optional[Dict[str, Any]]
@@ -28,8 +37,17 @@ class ComplianceState(TypedDict):
     dpa_result: Optional[Dict[str, Any]]
     iso_result: Optional[Dict[str, Any]]
     synthesis: Dict[str, Any]
-    report_bytes: bytes
-    status_messages: List[str]
+    # Nodes return only their new messages; LangGraph appends them
+    status_messages: Annotated[List[str], operator.add]
+
+
+# Framework code → state key of its result
+FRAMEWORK_RESULT_KEYS = {
+    "ICO": "ico_result",
+    "EU_AI_ACT": "eu_act_result",
+    "DPA": "dpa_result",
+    "ISO_42001": "iso_result",
+}
 
 
 # Initialize OpenAI models
@@ -39,7 +57,7 @@ def get_extractor_model():
     GPT-4o has a 128k context window and excels at reading long, dense
     documents (DPIAs, specs) and extracting structured data reliably.
     """
-    return ChatOpenAI(model="gpt-4o", temperature=0)
+    return ChatOpenAI(model="gpt-4o", temperature=0, **client_limits())
 
 
 def get_analysis_model():
@@ -48,156 +66,251 @@ def get_analysis_model():
     GPT-4o-mini is fast and cost-effective for structured scoring against
     known regulatory frameworks. It receives already-extracted data.
     """
-    return ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    return ChatOpenAI(model="gpt-4o-mini", temperature=0, **client_limits())
+
+
+# Our own deadline check, or the client's request timeout (derived from the deadline)
+TIMEOUT_ERRORS = (DeadlineExceeded, openai.APITimeoutError)
 
 
-def supervisor_node(state: ComplianceState) -> ComplianceState:
+def _not_evaluated_on_timeout(result_key: str, framework: str, agent: str, **extra: Any):
+    """Turn a framework node that runs out of time into a NOT_EVALUATED result flagged timed_out.
+
+    The synthesizer leaves timed-out frameworks out of the score, so the rest
+    of the analysis still completes within its deadline.
+    """
+    def decorate(node: Callable[[ComplianceState], Dict[str, Any]]):
+        @functools.wraps(node)
+        def run(state: ComplianceState) -> Dict[str, Any]:
+            try:
+                return node(state)
+            except TIMEOUT_ERRORS:
+                result = not_evaluated_result(
+                    framework,
+                    "",
+                    f"{framework} analysis timed out and was not evaluated. Re-run this framework to assess it.",
+                    timed_out=True,
+                    **extra,
+                )
+                return {result_key: result, "status_messages": [f"⏱️ {agent}: Timed out, not evaluated"]}
+        return run
+    return decorate
+
+
+# Nodes return only the keys they change. status_messages is reduced by
+# concatenation, so each node returns just its own new messages and
+# stream_mode="updates" yields per-node deltas.
+
+def supervisor_node(state: ComplianceState) -> Dict[str, Any]:
     """Orchestrates the workflow"""
-    state["status_messages"].append("🎯 Supervisor: Starting compliance analysis...")
-    return state
+    return {"status_messages": ["🎯 Supervisor: Starting compliance analysis..."]}
 
 
-def extractor_node(state: ComplianceState) -> ComplianceState:
-    """Extract structured data from PDF"""
-    state["status_messages"].append("📄 Extractor: Parsing PDF...")
-    
-    extractor_model = get_extractor_model()
-    extracted = extract_pdf_data(state["pdf_path"], extractor_model)
-    state["extracted_data"] = extracted
+def extract_document(pdf_source: PdfSource) -> Dict[str, Any]:
+    """Text and structured extraction for a PDF (path, bytes or file object).
+
+    Extraction does not depend on which frameworks are chosen, so callers can
+    start it as soon as a file is uploaded and pass the result to the graph
+    as `extracted_data`.
+    """
+    with deadline(NODE_TIMEOUT_S):
+        return extract_pdf_data(pdf_source, get_extractor_model())
+
+
+def extractor_node(state: ComplianceState) -> Dict[str, Any]:
+    """Extract structured data from PDF (skipped if already extracted)"""
+    if state.get("extracted_data"):
+        extracted = state["extracted_data"]
+        messages = ["♻️ Extractor: Using pre-extracted document"]
+    else:
+        messages = ["📄 Extractor: Parsing PDF..."]
+        extracted = extract_document(state.get("pdf_source") or state["pdf_path"])
     
     use_case = extracted.get('use_case', 'Unknown')[:50]
     data_types_count = len(extracted.get('data_types', []))
     
-    state["status_messages"].append(
+    stats = extracted.get("extraction_stats", {})
+    if stats.get("pages_skipped"):
+        skipped = [d["page"] for d in stats.get("page_diagnostics", []) if d.get("skipped")]
+        messages.append(
+            f"⚠️ Extractor: Skipped {len(skipped)} pathological page(s): {', '.join(map(str, skipped))}"
+        )
+    
+    messages.append(
         f"✅ Extractor: Found use case '{use_case}...', {data_types_count} data types"
     )
-    return state
+    return {"extracted_data": extracted, "status_messages": messages}
 
 
-def router_node(state: ComplianceState) -> ComplianceState:
+def router_node(state: ComplianceState) -> Dict[str, Any]:
     """Route to appropriate framework agents"""
-    state["status_messages"].append("🧭 Router: Selecting frameworks...")
-    
     # Route based on user selection + content analysis
     frameworks = route_frameworks(
         state["extracted_data"],
         state["selected_frameworks"]
     )
     
-    state["selected_frameworks"] = frameworks
-    state["status_messages"].append(
-        f"✅ Router: Invoking {', '.join(frameworks)}"
-    )
-    return state
+    return {
+        "selected_frameworks": frameworks,
+        "status_messages": [
+            "🧭 Router: Selecting frameworks...",
+            f"✅ Router: Invoking {', '.join(frameworks)}",
+        ],
+    }
 
 
-def ico_agent_node(state: ComplianceState) -> ComplianceState:
+@_not_evaluated_on_timeout("ico_result", "UK ICO", "ICO Agent")
+def ico_agent_node(state: ComplianceState) -> Dict[str, Any]:
     """UK ICO compliance analysis"""
     if "ICO" not in state["selected_frameworks"]:
-        return state
-    
-    state["status_messages"].append("🔍 ICO Agent: Analyzing UK compliance...")
+        return {}
     
     analysis_model = get_analysis_model()
     result = analyze_ico_compliance(state["extracted_data"], analysis_model)
-    state["ico_result"] = result
     
-    state["status_messages"].append(
-        f"✅ ICO Agent: Score {result.get('score', 0)}% "
-        f"({result.get('critical_gaps_count', 0)} critical gaps)"
-    )
-    return state
-
-
-def eu_act_agent_node(state: ComplianceState) -> ComplianceState:
+    return {
+        "ico_result": result,
+        "status_messages": [
+            "🔍 ICO Agent: Analyzing UK compliance...",
+            f"✅ ICO Agent: Score {result.get('score', 0)}% "
+            f"({result.get('critical_gaps_count', 0)} critical gaps)",
+        ],
+    }
+
+
+@_not_evaluated_on_timeout("eu_act_result", "EU AI Act", "EU AI Act Agent", risk_tier="UNKNOWN")
+def eu_act_agent_node(state: ComplianceState) -> Dict[str, Any]:
     """EU AI Act compliance analysis"""
     if "EU_AI_ACT" not in state["selected_frameworks"]:
-        return state
-    
-    state["status_messages"].append("🔍 EU AI Act Agent: Analyzing risk tier...")
+        return {}
     
     analysis_model = get_analysis_model()
     result = analyze_eu_act_compliance(state["extracted_data"], analysis_model)
-    state["eu_act_result"] = result
     
-    state["status_messages"].append(
-        f"✅ EU AI Act Agent: {result.get('risk_tier', 'Unknown')} risk, "
-        f"{result.get('critical_gaps_count', 0)} gaps"
-    )
-    return state
-
-
-def dpa_agent_node(state: ComplianceState) -> ComplianceState:
+    return {
+        "eu_act_result": result,
+        "status_messages": [
+            "🔍 EU AI Act Agent: Analyzing risk tier...",
+            f"✅ EU AI Act Agent: {result.get('risk_tier', 'Unknown')} risk, "
+            f"{result.get('critical_gaps_count', 0)} gaps",
+        ],
+    }
+
+
+@_not_evaluated_on_timeout("dpa_result", "UK DPA / GDPR", "DPA Agent")
+def dpa_agent_node(state: ComplianceState) -> Dict[str, Any]:
     """GDPR/DPA compliance analysis"""
     if "DPA" not in state["selected_frameworks"]:
-        return state
-    
-    state["status_messages"].append("🔍 DPA Agent: Analyzing data protection...")
+        return {}
     
     analysis_model = get_analysis_model()
     result = analyze_dpa_compliance(state["extracted_data"], analysis_model)
-    state["dpa_result"] = result
     
-    state["status_messages"].append(
-        f"✅ DPA Agent: Score {result.get('score', 0)}% "
-        f"({result.get('critical_gaps_count', 0)} critical gaps)"
-    )
-    return state
-
-
-def iso_agent_node(state: ComplianceState) -> ComplianceState:
+    return {
+        "dpa_result": result,
+        "status_messages": [
+            "🔍 DPA Agent: Analyzing data protection...",
+            f"✅ DPA Agent: Score {result.get('score', 0)}% "
+            f"({result.get('critical_gaps_count', 0)} critical gaps)",
+        ],
+    }
+
+
+@_not_evaluated_on_timeout("iso_result", "ISO/IEC 42001", "ISO Agent")
+def iso_agent_node(state: ComplianceState) -> Dict[str, Any]:
     """ISO 42001 compliance analysis"""
     if "ISO_42001" not in state["selected_frameworks"]:
-        return state
-    
-    state["status_messages"].append("🔍 ISO 42001 Agent: Analyzing governance...")
+        return {}
     
     analysis_model = get_analysis_model()
     result = analyze_iso_compliance(state["extracted_data"], analysis_model)
-    state["iso_result"] = result
     
-    state["status_messages"].append(
-        f"✅ ISO Agent: Score {result.get('score', 0)}% "
-        f"({result.get('critical_gaps_count', 0)} critical gaps)"
-    )
-    return state
+    return {
+        "iso_result": result,
+        "status_messages": [
+            "🔍 ISO 42001 Agent: Analyzing governance...",
+            f"✅ ISO Agent: Score {result.get('score', 0)}% "
+            f"({result.get('critical_gaps_count', 0)} critical gaps)",
+        ],
+    }
 
 
-def synthesizer_node(state: ComplianceState) -> ComplianceState:
+def synthesizer_node(state: ComplianceState) -> Dict[str, Any]:
     """Synthesize results across frameworks"""
-    state["status_messages"].append("📊 Synthesizer: Cross-checking frameworks...")
-    
+    # Timed-out frameworks count as missing, so weights renormalise over the rest
+    timed_out = [
+        code for code, key in FRAMEWORK_RESULT_KEYS.items()
+        if (state.get(key) or {}).get("timed_out")
+    ]
+    results = {
+        key: None if code in timed_out else state.get(key)
+        for code, key in FRAMEWORK_RESULT_KEYS.items()
+    }
     synthesis = synthesize_gaps(
-        ico_result=state.get("ico_result"),
-        eu_act_result=state.get("eu_act_result"),
-        dpa_result=state.get("dpa_result"),
-        iso_result=state.get("iso_result"),
-        selected_frameworks=state["selected_frameworks"]
+        ico_result=results["ico_result"],
+        eu_act_result=results["eu_act_result"],
+        dpa_result=results["dpa_result"],
+        iso_result=results["iso_result"],
+        selected_frameworks=[code for code in state["selected_frameworks"] if code not in timed_out]
     )
+    synthesis["frameworks_timed_out"] = timed_out
     
-    state["synthesis"] = synthesis
-    state["status_messages"].append(
-        f"✅ Synthesizer: UK Alignment Score {synthesis.get('uk_alignment_score', 0)}%"
-    )
-    return state
+    messages = ["📊 Synthesizer: Cross-checking frameworks..."]
+    if timed_out:
+        messages.append(f"⏱️ Synthesizer: Scored without {', '.join(timed_out)} (timed out)")
+    if synthesis["frameworks_not_evaluated"]:
+        messages.append(
+            f"⚠️ Synthesizer: Scored without {', '.join(synthesis['frameworks_not_evaluated'])} (not evaluated)"
+        )
+    messages.append(f"✅ Synthesizer: UK Alignment Score {synthesis.get('uk_alignment_score', 0)}%")
+    return {"synthesis": synthesis, "status_messages": messages}
+
+
+def _wrap_node(name: str, node: Callable[[ComplianceState], Dict[str, Any]]):
+    """Wrap a node to record its wall time, give it NODE_TIMEOUT_S, and stop before
+    it starts if the run was cancelled."""
+    @functools.wraps(node)
+    def run(state: ComplianceState) -> Dict[str, Any]:
+        check_cancelled()
+        started = time.perf_counter()
+        try:
+            with deadline(NODE_TIMEOUT_S):
+                return node(state)
+        finally:
+            NODE_SECONDS.observe(time.perf_counter() - started, name)
+    return run
+
+
+# Framework code → (state key of its result, agent node). Lets one framework
+# be re-run against a stored analysis without repeating extraction.
+FRAMEWORK_AGENTS: Dict[str, Tuple[str, Callable[[ComplianceState], Dict[str, Any]]]] = {
+    "ICO": (FRAMEWORK_RESULT_KEYS["ICO"], _wrap_node("ico_agent", ico_agent_node)),
+    "EU_AI_ACT": (FRAMEWORK_RESULT_KEYS["EU_AI_ACT"], _wrap_node("eu_act_agent", eu_act_agent_node)),
+    "DPA": (FRAMEWORK_RESULT_KEYS["DPA"], _wrap_node("dpa_agent", dpa_agent_node)),
+    "ISO_42001": (FRAMEWORK_RESULT_KEYS["ISO_42001"], _wrap_node("iso_agent", iso_agent_node)),
+}
+
+
+def run_framework(state: ComplianceState, code: str) -> Dict[str, Any]:
+    """Run one framework agent on a completed state's extracted_data.
+
+    Returns the agent's delta (its result key and status messages). The
+    framework is analysed even if it was not selected originally.
+    """
+    if code not in FRAMEWORK_AGENTS:
+        raise ValueError(f"Unknown framework {code!r}; expected one of {', '.join(FRAMEWORK_AGENTS)}")
+    if not state.get("extracted_data"):
+        raise ValueError("State has no extracted_data to analyse")
+    _, node = FRAMEWORK_AGENTS[code]
+    selected = list(state.get("selected_frameworks") or [])
+    if code not in selected:
+        selected.append(code)
+    return {**node({**state, "selected_frameworks": selected}), "selected_frameworks": selected}
 
 
-def reporter_node(state: ComplianceState) -> ComplianceState:
-    """Generate final report"""
-    state["status_messages"].append("📝 Reporter: Generating compliance report...")
-    
-    report_bytes = generate_report(
-        extracted_data=state["extracted_data"],
-        ico_result=state.get("ico_result"),
-        eu_act_result=state.get("eu_act_result"),
-        dpa_result=state.get("dpa_result"),
-        iso_result=state.get("iso_result"),
-        synthesis=state["synthesis"]
-    )
-    
-    state["report_bytes"] = report_bytes
-    state["status_messages"].append("✅ Reporter: Report ready for download")
-    return state
+def resynthesize(state: ComplianceState) -> Dict[str, Any]:
+    """Re-run the synthesizer over a state's current framework results."""
+    return _wrap_node("synthesizer", synthesizer_node)(state)
 
 
 def build_compliance_graph():
@@ -205,15 +318,14 @@ def build_compliance_graph():
     workflow = StateGraph(ComplianceState)
     
     # Add nodes
-    workflow.add_node("supervisor", supervisor_node)
-    workflow.add_node("extractor", extractor_node)
-    workflow.add_node("router", router_node)
-    workflow.add_node("ico_agent", ico_agent_node)
-    workflow.add_node("eu_act_agent", eu_act_agent_node)
-    workflow.add_node("dpa_agent", dpa_agent_node)
-    workflow.add_node("iso_agent", iso_agent_node)
-    workflow.add_node("synthesizer", synthesizer_node)
-    workflow.add_node("reporter", reporter_node)
+    workflow.add_node("supervisor", _wrap_node("supervisor", supervisor_node))
+    workflow.add_node("extractor", _wrap_node("extractor", extractor_node))
+    workflow.add_node("router", _wrap_node("router", router_node))
+    workflow.add_node("ico_agent", _wrap_node("ico_agent", ico_agent_node))
+    workflow.add_node("eu_act_agent", _wrap_node("eu_act_agent", eu_act_agent_node))
+    workflow.add_node("dpa_agent", _wrap_node("dpa_agent", dpa_agent_node))
+    workflow.add_node("iso_agent", _wrap_node("iso_agent", iso_agent_node))
+    workflow.add_node("synthesizer", _wrap_node("synthesizer", synthesizer_node))
     
     # Define edges (linear flow)
     workflow.set_entry_point("supervisor")
@@ -224,8 +336,8 @@ def build_compliance_graph():
     workflow.add_edge("eu_act_agent", "dpa_agent")
     workflow.add_edge("dpa_agent", "iso_agent")
     workflow.add_edge("iso_agent", "synthesizer")
-    workflow.add_edge("synthesizer", "reporter")
-    workflow.add_edge("reporter", END)
+    # The PDF report is rendered on demand (agents/report_cache.py), not here
+    workflow.add_edge("synthesizer", END)
     
     return workflow.compile()
 
@@ -1 +1,5 @@
 # Compliance Agent Prompts Package
+
+# Bump whenever a prompt or response schema changes in a way that can change
+# results; analyses are only shared between requests with the same version.
+PROMPT_VERSION = "1"
@@ -1,3 +1,6 @@
+from prompts.evidence import document_text, evidence_instruction, evidence_field
+
+
 def get_dpa_prompt(extracted_data: dict) -> str:
     """Generate DPA/GDPR compliance analysis prompt (document-type aware)."""
 
@@ -21,7 +24,7 @@ CRITICAL SCORING GUIDANCE:
 - Personal data: {extracted_data.get('has_personal_data', 'Unknown')}
 
 **DOCUMENT TEXT:**
-{extracted_data.get('full_text', '')[:25000]}
+{document_text(extracted_data)}
 
 ---
 
@@ -32,35 +35,35 @@ Analyze these AI-relevant GDPR/DPA requirements:
 3. Article 13/14 - Transparency
 4. Article 35 - DPIA
 
-For each article, find SPECIFIC QUOTES or SECTIONS that address it.
+{evidence_instruction('article')}
 
 Return ONLY valid JSON (no markdown):
 {{
   "document_type_detected": "{doc_type}",
   "article_22_adm": {{
     "status": "MET" | "PARTIALLY_MET" | "NOT_MET" | "EVIDENCE_MISSING",
-    "evidence_found": ["Quote 1", "Quote 2"],
+    {evidence_field('["Quote 1", "Quote 2"]')},
     "sections_relevant": ["Section names"],
     "gap": "What's missing",
     "priority": "CRITICAL" | "HIGH" | "MEDIUM" | "LOW"
   }},
   "article_5_fairness": {{
     "status": "...",
-    "evidence_found": ["..."],
+    {evidence_field('["..."]')},
     "sections_relevant": ["..."],
     "gap": "...",
     "priority": "..."
   }},
   "article_13_transparency": {{
     "status": "...",
-    "evidence_found": ["..."],
+    {evidence_field('["..."]')},
     "sections_relevant": ["..."],
     "gap": "...",
     "priority": "..."
   }},
   "article_35_dpia": {{
     "status": "...",
-    "evidence_found": ["..."],
+    {evidence_field('["..."]')},
     "sections_relevant": ["..."],
     "gap": "...",
     "priority": "..."
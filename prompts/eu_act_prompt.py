@@ -1,3 +1,6 @@
+from prompts.evidence import document_text, evidence_instruction, evidence_field
+
+
 def get_eu_act_prompt(extracted_data: dict) -> str:
     """Generate EU AI Act compliance analysis prompt (document-type aware)."""
 
@@ -22,7 +25,7 @@ CRITICAL SCORING GUIDANCE:
 - Deployment: {extracted_data.get('deployment_context', 'Unknown')}
 
 **DOCUMENT TEXT:**
-{extracted_data.get('full_text', '')[:25000]}
+{document_text(extracted_data)}
 
 ---
 
@@ -44,6 +47,7 @@ CRITICAL SCORING GUIDANCE:
 
 For GUIDANCE documents: Assess coverage of EU AI Act concepts.
 For SYSTEM_SPEC: Classify risk and check obligations.
+{evidence_instruction('obligation')}
 
 Return ONLY valid JSON (no markdown):
 {{
@@ -56,17 +60,17 @@ Return ONLY valid JSON (no markdown):
     "transparency_requirements_discussed": true/false,
     "prohibited_practices_discussed": true/false
   }},
-  "evidence_found": ["Key quotes about EU AI Act compliance"],
+  {evidence_field('["Key quotes about EU AI Act compliance"]')},
   "sections_relevant": ["Relevant section names"],
   "obligations_if_high_risk": {{
-    "risk_management_system": {{"status": "MET"|"PARTIALLY_MET"|"NOT_MET"|"EVIDENCE_MISSING"|"N/A", "evidence_found": [], "gap": "..."}},
-    "data_governance": {{"status": "...", "evidence_found": [], "gap": "..."}},
-    "technical_documentation": {{"status": "...", "evidence_found": [], "gap": "..."}},
-    "record_keeping": {{"status": "...", "evidence_found": [], "gap": "..."}},
-    "transparency": {{"status": "...", "evidence_found": [], "gap": "..."}},
-    "human_oversight": {{"status": "...", "evidence_found": [], "gap": "..."}},
-    "accuracy_robustness": {{"status": "...", "evidence_found": [], "gap": "..."}},
-    "quality_management": {{"status": "...", "evidence_found": [], "gap": "..."}}
+    "risk_management_system": {{"status": "MET"|"PARTIALLY_MET"|"NOT_MET"|"EVIDENCE_MISSING"|"N/A", {evidence_field('[]')}, "gap": "..."}},
+    "data_governance": {{"status": "...", {evidence_field('[]')}, "gap": "..."}},
+    "technical_documentation": {{"status": "...", {evidence_field('[]')}, "gap": "..."}},
+    "record_keeping": {{"status": "...", {evidence_field('[]')}, "gap": "..."}},
+    "transparency": {{"status": "...", {evidence_field('[]')}, "gap": "..."}},
+    "human_oversight": {{"status": "...", {evidence_field('[]')}, "gap": "..."}},
+    "accuracy_robustness": {{"status": "...", {evidence_field('[]')}, "gap": "..."}},
+    "quality_management": {{"status": "...", {evidence_field('[]')}, "gap": "..."}}
   }},
   "overall_score": 0-100,
   "critical_gaps": [],
@@ -0,0 +1,29 @@
+from agents.evidence import EVIDENCE_MODE, number_lines
+
+# Characters of the document shown to each framework agent
+DOCUMENT_CHARS = 25000
+
+
+def document_text(extracted_data: dict) -> str:
+    """Document excerpt for a prompt; line-anchored when evidence is returned as anchors."""
+    text = extracted_data.get('full_text', '')[:DOCUMENT_CHARS]
+    return number_lines(text) if EVIDENCE_MODE == "anchors" else text
+
+
+def evidence_instruction(unit: str) -> str:
+    """How the model should cite evidence for each principle/article/area."""
+    if EVIDENCE_MODE == "anchors":
+        return (
+            f"For each {unit}, cite the SPECIFIC LINES that address it by their [L<n>] anchors. "
+            "Do NOT quote the text - list anchors such as \"L12\" or ranges such as \"L12-L14\" in evidence_refs."
+        )
+    return f"For each {unit}, find SPECIFIC QUOTES or SECTIONS from the document that address it."
+
+
+def evidence_field(example: str) -> str:
+    """JSON template line for a clause's evidence, e.g. evidence_field('["Quote 1"]')."""
+    if EVIDENCE_MODE == "anchors":
+        if example not in ('["..."]', '[]'):
+            example = '["L12-L14", "L40"]'
+        return f'"evidence_refs": {example}'
+    return f'"evidence_found": {example}'
@@ -1,3 +1,6 @@
+from prompts.evidence import document_text, evidence_instruction, evidence_field
+
+
 def get_ico_prompt(extracted_data: dict) -> str:
     """Generate ICO compliance analysis prompt with document-type-aware scoring."""
 
@@ -27,7 +30,7 @@ For SYSTEM_SPEC documents: Look for specific implementations, concrete evidence,
 - Human oversight: {extracted_data.get('has_human_oversight', 'Unknown')}
 
 **DOCUMENT TEXT:**
-{extracted_data.get('full_text', '')[:25000]}
+{document_text(extracted_data)}
 
 ---
 
@@ -39,42 +42,42 @@ Analyze against the 5 ICO AI principles:
 4. Contestability & Redress
 5. Data Minimization & Privacy
 
-For each principle, find SPECIFIC QUOTES or SECTIONS from the document that address it.
+{evidence_instruction('principle')}
 
 Return ONLY valid JSON (no markdown):
 {{
   "document_type_detected": "{doc_type}",
   "principle_1_safety": {{
     "status": "MET" | "PARTIALLY_MET" | "NOT_MET" | "EVIDENCE_MISSING",
-    "evidence_found": ["Quote 1 from document", "Quote 2 from document"],
+    {evidence_field('["Quote 1 from document", "Quote 2 from document"]')},
     "sections_relevant": ["Section names or page references"],
     "gap": "What's missing (or 'None - adequately covered')",
     "priority": "CRITICAL" | "HIGH" | "MEDIUM" | "LOW"
   }},
   "principle_2_fairness": {{
     "status": "...",
-    "evidence_found": ["..."],
+    {evidence_field('["..."]')},
     "sections_relevant": ["..."],
     "gap": "...",
     "priority": "..."
   }},
   "principle_3_accountability": {{
     "status": "...",
-    "evidence_found": ["..."],
+    {evidence_field('["..."]')},
     "sections_relevant": ["..."],
     "gap": "...",
     "priority": "..."
   }},
   "principle_4_contestability": {{
     "status": "...",
-    "evidence_found": ["..."],
+    {evidence_field('["..."]')},
     "sections_relevant": ["..."],
     "gap": "...",
     "priority": "..."
   }},
   "principle_5_data_minimization": {{
     "status": "...",
-    "evidence_found": ["..."],
+    {evidence_field('["..."]')},
     "sections_relevant": ["..."],
     "gap": "...",
     "priority": "..."
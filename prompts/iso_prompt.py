@@ -1,3 +1,6 @@
+from prompts.evidence import document_text, evidence_instruction, evidence_field
+
+
 def get_iso_prompt(extracted_data: dict) -> str:
     """Generate ISO/IEC 42001:2023 compliance analysis prompt (document-type aware)."""
 
@@ -20,7 +23,7 @@ CRITICAL SCORING GUIDANCE:
 - Human oversight: {extracted_data.get('has_human_oversight', 'Unknown')}
 
 **DOCUMENT TEXT:**
-{extracted_data.get('full_text', '')[:25000]}
+{document_text(extracted_data)}
 
 ---
 
@@ -31,35 +34,35 @@ Analyze these ISO 42001 requirement areas:
 3. Data Quality & Lifecycle
 4. Monitoring & Incident Response
 
-For each area, find SPECIFIC QUOTES or SECTIONS that address it.
+{evidence_instruction('area')}
 
 Return ONLY valid JSON (no markdown):
 {{
   "document_type_detected": "{doc_type}",
   "governance": {{
     "status": "MET" | "PARTIALLY_MET" | "NOT_MET" | "EVIDENCE_MISSING",
-    "evidence_found": ["Quote 1", "Quote 2"],
+    {evidence_field('["Quote 1", "Quote 2"]')},
     "sections_relevant": ["Section names"],
     "gap": "What's missing",
     "priority": "CRITICAL" | "HIGH" | "MEDIUM" | "LOW"
   }},
   "risk_management": {{
     "status": "...",
-    "evidence_found": ["..."],
+    {evidence_field('["..."]')},
     "sections_relevant": ["..."],
     "gap": "...",
     "priority": "..."
   }},
   "data_lifecycle": {{
     "status": "...",
-    "evidence_found": ["..."],
+    {evidence_field('["..."]')},
     "sections_relevant": ["..."],
     "gap": "...",
     "priority": "..."
   }},
   "monitoring": {{
     "status": "...",
-    "evidence_found": ["..."],
+    {evidence_field('["..."]')},
     "sections_relevant": ["..."],
     "gap": "...",
     "priority": "..."
@@ -0,0 +1,28 @@
+"""Shared fixtures. PDFs are generated with reportlab, so no binaries are checked in."""
+from io import BytesIO
+from typing import Callable
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+def build_pdf(pages: int, lines_per_page: int = 40, text: str = "The system processes personal data with human oversight.") -> bytes:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    for number in range(1, pages + 1):
+        for line in range(lines_per_page):
+            pdf.drawString(40, 800 - line * 18, f"Page {number} line {line}: {text}")
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def make_pdf() -> Callable[..., bytes]:
+    return build_pdf
@@ -0,0 +1,160 @@
+import threading
+import time
+
+import pytest
+
+from agents.analysis_store import AnalysisStore, SqliteAnalysisStore, record_size
+
+
+def record(text="", raw=""):
+    return {"state": {"extracted_data": {"use_case": "LFR", "full_text": text},
+                      "ico_result": {"score": 70, "raw_response": raw}}}
+
+
+def test_lru_eviction_by_entry_count():
+    store = AnalysisStore(max_entries=2, spill_dir=None)
+    store["a"], store["b"] = record(), record()
+    assert store["a"]                 # a is now most recently used
+    store["c"] = record()
+
+    assert list(store) == ["a", "c"]
+    assert store.stats()["evictions"]["lru"] == 1
+
+
+def test_byte_budget_evicts_oldest_but_keeps_the_newest():
+    size = record_size(record("x" * 100))
+    store = AnalysisStore(max_bytes=size * 2, spill_dir=None)
+    store["a"], store["b"] = record("x" * 100), record("x" * 100)
+    store["c"] = record("x" * 100)
+
+    assert list(store) == ["b", "c"]
+    assert store.stats()["evictions"]["bytes"] == 1
+
+    store["huge"] = record("x" * size * 3)
+    assert list(store) == ["huge"]
+
+
+def test_entries_expire_after_the_ttl():
+    store = AnalysisStore(ttl_s=0.05, spill_dir=None)
+    store["a"] = record()
+    time.sleep(0.1)
+
+    assert "a" not in store
+    assert store.stats()["evictions"]["ttl"] == 1
+
+
+def test_large_fields_spill_to_files_and_read_back(tmp_path):
+    store = AnalysisStore(spill_dir=str(tmp_path), spill_min_bytes=10)
+    store["a"] = record(text="t" * 100, raw="short")
+
+    assert store["a"] == record(text="t" * 100, raw="short")
+    assert [path.name for path in tmp_path.iterdir()] == ["a.extracted_data.full_text.txt"]
+    assert store.stats()["spilled_bytes"] == 100
+    assert store.stats()["bytes"] < record_size(record(text="t" * 100))
+
+    del store["a"]
+    assert list(tmp_path.iterdir()) == []
+    assert store.stats()["spilled_bytes"] == 0
+
+
+def test_overwriting_a_spilled_entry_keeps_the_accounting(tmp_path):
+    store = AnalysisStore(spill_dir=str(tmp_path), spill_min_bytes=10)
+    store["a"] = record(text="t" * 100)
+    store["a"] = record(text="t" * 300, raw="r" * 50)
+
+    assert store.stats()["spilled_bytes"] == 350
+    assert store["a"]["state"]["extracted_data"]["full_text"] == "t" * 300
+
+    # Shrinking below the spill threshold removes the old file
+    store["a"] = record(text="tiny")
+    assert store.stats()["spilled_bytes"] == 0
+    assert list(tmp_path.iterdir()) == []
+
+
+# ── SQLite ────────────────────────────────────────────────────────────────
+
+def backdate(store, job_id, seconds):
+    store._connection().execute(
+        "UPDATE analyses SET stored_at = stored_at - ? WHERE job_id = ?", (seconds, job_id)
+    )
+
+
+def test_sqlite_store_round_trips_records_and_job_status(tmp_path):
+    store = SqliteAnalysisStore(str(tmp_path / "analyses.db"))
+    store["a"] = record(text="full text")
+    store.put_job({"job_id": "a", "status": "running"})
+
+    assert store["a"] == record(text="full text")
+    assert "a" in store and "b" not in store
+    assert list(store) == ["a"] and len(store) == 1
+    assert store.get_job("a") == {"job_id": "a", "status": "running"}
+    assert store.get_job("b") is None
+
+    # Visible to a second process opening the same file
+    assert SqliteAnalysisStore(str(tmp_path / "analyses.db"))["a"] == record(text="full text")
+
+    del store["a"]
+    with pytest.raises(KeyError):
+        store["a"]
+
+
+def test_sqlite_store_prunes_oldest_beyond_max_entries(tmp_path):
+    store = SqliteAnalysisStore(str(tmp_path / "analyses.db"), max_entries=2)
+    for job_id in "abc":
+        store[job_id] = record()
+        time.sleep(0.01)
+
+    assert list(store) == ["b", "c"]
+    assert store.stats()["evictions"]["lru"] == 1
+
+
+def test_sqlite_store_hides_and_prunes_expired_rows(tmp_path):
+    store = SqliteAnalysisStore(str(tmp_path / "analyses.db"), ttl_s=60)
+    store["old"], store["new"] = record(), record()
+    backdate(store, "old", 120)
+
+    assert "old" not in store
+    assert list(store) == ["new"]
+    # Still on disk until the next write, but not counted
+    assert store.stats()["entries"] == 1
+    assert store.stats()["bytes"] == record_size(record())
+
+    store["newer"] = record()
+    assert store.stats()["evictions"]["ttl"] == 1
+    assert store._connection().execute("SELECT COUNT(*) FROM analyses").fetchone()[0] == 2
+
+
+def append_to(key):
+    def change(current):
+        time.sleep(0.02)   # widen the read-to-write window
+        state = current["state"]
+        return {**current, "state": {**state, "seen": state.get("seen", []) + [key]}}
+    return change
+
+
+def test_sqlite_updates_from_separate_connections_do_not_overwrite_each_other(tmp_path):
+    path = str(tmp_path / "analyses.db")
+    SqliteAnalysisStore(path)["a"] = record()
+    # One store per thread stands in for one per worker process
+    stores = [SqliteAnalysisStore(path) for _ in range(4)]
+
+    threads = [threading.Thread(target=store.update, args=("a", append_to(n))) for n, store in enumerate(stores)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(stores[0]["a"]["state"]["seen"]) == [0, 1, 2, 3]
+
+
+def test_update_skips_missing_entries_and_rolls_back_failures(tmp_path):
+    for store in (AnalysisStore(), SqliteAnalysisStore(str(tmp_path / "analyses.db"))):
+        assert store.update("missing", append_to("x")) is None
+
+        store["a"] = record()
+        with pytest.raises(ZeroDivisionError):
+            store.update("a", lambda current: 1 / 0)
+        assert store["a"] == record()
+
+        assert store.update("a", append_to("x"))["state"]["seen"] == ["x"]
+        assert store["a"]["state"]["seen"] == ["x"]
@@ -0,0 +1,278 @@
+from io import BytesIO
+import asyncio
+import json
+import threading
+import time
+import zipfile
+
+from fastapi import Request, UploadFile
+from fastapi.testclient import TestClient
+import pytest
+
+import api
+from agents import report_cache as report_cache_module
+from agents.cancellation import check_cancelled
+from agents.analysis_store import AnalysisStore
+from agents.jobs import JobManager
+from agents.report_cache import ReportCache
+
+STATE = {
+    "pdf_path": "lfr.pdf",
+    "extracted_data": {"use_case": "Live facial recognition", "full_text": "..."},
+    "selected_frameworks": ["ICO"],
+    "ico_result": {"framework": "UK ICO", "score": 72, "critical_gaps_count": 1},
+    "eu_act_result": None,
+    "dpa_result": None,
+    "iso_result": None,
+    "synthesis": {"uk_alignment_score": 72, "framework_scores": {"UK ICO": 72}},
+    "status_messages": [],
+}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """TestClient over fresh, private stores, report cache and job queue."""
+    monkeypatch.setattr(report_cache_module, "report_cache", ReportCache(str(tmp_path / "reports")))
+    monkeypatch.setattr(api, "report_cache", report_cache_module.report_cache)
+    monkeypatch.setattr(api, "analysis_store", AnalysisStore())
+    monkeypatch.setattr(api, "document_store", AnalysisStore())
+    monkeypatch.setattr(api, "job_manager", JobManager(workers=2))
+    with TestClient(api.app) as test_client:
+        yield test_client
+
+
+def test_report_streams_with_etag_and_revalidates(client):
+    api.analysis_store["job-1"] = {"state": STATE, "created_at": "2026-01-01T00:00:00"}
+
+    response = client.get("/report/job-1")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/pdf"
+    assert response.content.startswith(b"%PDF")
+    assert int(response.headers["content-length"]) == len(response.content)
+    etag = response.headers["etag"]
+
+    revalidated = client.get("/report/job-1", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    # One render; the second request never touched the cache
+    assert report_cache_module.report_cache.stats()["misses"] == 1
+
+
+def test_report_for_unknown_job_is_404(client):
+    assert client.get("/report/missing").status_code == 404
+
+
+def test_job_events_stream_as_sse_and_resume_from_last_event_id(client):
+    job = api.job_manager.submit(lambda job: job.publish("update", {"node": "extractor"}))
+    assert job.wait(5)
+
+    body = client.get(f"/jobs/{job.id}/events").text
+    assert body.startswith("id: 0\nevent: status\ndata: {\"status\": \"running\"}\n\n")
+    assert "id: 1\nevent: update\n" in body
+    assert body.count("\n\n") == 3
+
+    resumed = client.get(f"/jobs/{job.id}/events", headers={"Last-Event-ID": "1"}).text
+    assert resumed.startswith("id: 2\nevent: status\n")
+
+
+def test_oversized_multipart_requests_are_refused_before_reading(client, monkeypatch):
+    monkeypatch.setattr(api, "MAX_REQUEST_BYTES", 10)
+
+    response = client.post("/jobs", files={"file": ("lfr.pdf", b"%PDF" + b"x" * 100, "application/pdf")})
+
+    assert response.status_code == 413
+    assert "upload limit" in response.json()["detail"]
+
+
+def test_closing_a_batch_stream_cancels_its_waits_and_jobs(client, monkeypatch):
+    release = threading.Event()
+    submitted = []
+
+    async def submit(file, selected, priority, owner):
+        job = api.job_manager.submit(lambda job: release.wait(5), priority=priority)
+        submitted.append(job)
+        return job
+    monkeypatch.setattr(api, "_submit_analysis", submit)
+
+    async def disconnect():
+        request = Request({"type": "http", "headers": [], "client": ("127.0.0.1", 1)})
+        files = [UploadFile(BytesIO(b"%PDF"), filename=f"{n}.pdf") for n in range(3)]
+        response = await api.analyze_batch(request, files, ["ICO"], None, False)
+        stream = response.body_iterator
+        queued = json.loads(await stream.__anext__())
+        await stream.aclose()
+        await asyncio.sleep(0)
+        pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        return queued, pending
+
+    queued, pending = asyncio.run(disconnect())
+    release.set()
+
+    assert [job["error"] for job in queued["jobs"]] == [None, None, None]
+    assert pending == []
+    # Workers blocked on the first two; the third was still queued
+    for job in submitted:
+        assert job.wait(5)
+    assert submitted[2].status == "cancelled"
+    assert all(job.cancel_requested for job in submitted)
+
+
+def test_metrics_endpoint_serves_the_text_format(client):
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE compliance_jobs_coalesced_total counter" in response.text
+    assert response.text.endswith("\n")
+
+
+def test_job_status_gauge_reads_one_stats_snapshot(client, monkeypatch):
+    snapshots = []
+    stats = api.job_manager.stats
+    monkeypatch.setattr(api.job_manager, "stats", lambda: snapshots.append(1) or stats())
+
+    by_status = api._jobs_by_status()
+
+    assert len(snapshots) == 1
+    assert set(by_status) == {(status,) for status in api.JOB_STATUSES}
+
+
+def test_full_queue_is_refused_with_429_and_retry_after(client, monkeypatch):
+    monkeypatch.setattr(api, "job_manager", JobManager(workers=1, max_queued=1))
+    release = threading.Event()
+    blocking = api.job_manager.submit(lambda job: release.wait(5))
+    while blocking.status == "queued":
+        time.sleep(0.001)
+    api.job_manager.submit(lambda job: None)
+
+    response = client.post(
+        "/jobs", files={"file": ("lfr.pdf", b"%PDF", "application/pdf")}, data={"frameworks": ["ICO"]}
+    )
+    release.set()
+
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
+
+
+def test_rerunning_one_framework_updates_only_its_result(client, monkeypatch):
+    api.analysis_store["job-1"] = {"state": STATE, "created_at": "2026-01-01T00:00:00"}
+    monkeypatch.setattr(api, "run_framework", lambda state, code: {
+        "dpa_result": {"framework": "UK DPA", "score": 60}, "status_messages": ["DPA re-run"],
+    })
+    monkeypatch.setattr(api, "resynthesize", lambda state: {
+        "synthesis": {"uk_alignment_score": 66, "framework_scores": {"UK ICO": 72, "UK DPA": 60}},
+        "status_messages": ["Re-synthesized"],
+    })
+
+    response = client.post("/jobs/job-1/frameworks/dpa")
+
+    assert response.status_code == 200
+    analysis = response.json()["analysis"]
+    assert analysis["dpa_result"]["score"] == 60
+    assert analysis["ico_result"] == STATE["ico_result"]
+    assert analysis["selected_frameworks"] == ["ICO", "DPA"]
+    assert analysis["synthesis"]["uk_alignment_score"] == 66
+    assert analysis["status_messages"] == ["DPA re-run", "Re-synthesized"]
+    assert api.analysis_store["job-1"]["state"] == analysis
+
+
+def test_rerun_rejects_unknown_frameworks_and_analyses(client):
+    api.analysis_store["job-1"] = {"state": STATE, "created_at": "2026-01-01T00:00:00"}
+
+    assert client.post("/jobs/job-1/frameworks/gdpr").status_code == 400
+    assert client.post("/jobs/missing/frameworks/ICO").status_code == 404
+
+
+class CancellableGraph:
+    """compliance_graph stand-in: one node completes, then it waits to be cancelled."""
+
+    def __init__(self):
+        self.reached = threading.Event()
+
+    def stream(self, initial_state, stream_mode):
+        yield "updates", {"ico_agent": {"ico_result": STATE["ico_result"], "status_messages": ["ICO done"]}}
+        yield "values", {**initial_state, "ico_result": STATE["ico_result"]}
+        self.reached.set()
+        while True:
+            check_cancelled()
+            time.sleep(0.01)
+
+
+def test_delete_cancels_a_running_analysis_and_keeps_its_partial_result(client, monkeypatch):
+    graph = CancellableGraph()
+    monkeypatch.setattr(api, "compliance_graph", graph)
+    initial = {"selected_frameworks": ["ICO", "DPA"], "extracted_data": {"use_case": "LFR"}}
+    job = api.job_manager.submit(lambda job: api._run_analysis(job, initial))
+    assert graph.reached.wait(5)
+
+    assert client.delete(f"/jobs/{job.id}", params={"keep_partial": True}).status_code == 200
+    assert job.wait(5)
+
+    body = client.get(f"/jobs/{job.id}").json()
+    assert body["status"] == "cancelled"
+    assert body["partial"] is True
+    assert body["analysis"]["ico_result"] == STATE["ico_result"]
+    assert body["analysis"]["synthesis"]["framework_scores"] == {"UK ICO": 72}
+
+    assert client.delete(f"/jobs/{job.id}").status_code == 409
+    assert client.delete("/jobs/missing").status_code == 404
+
+
+def test_analyses_of_a_document_still_extracting_queue_after_it(client, monkeypatch):
+    extracting, release = threading.Event(), threading.Event()
+    analysed = []
+
+    def extract(stream):
+        extracting.set()
+        assert release.wait(5)
+        return {"use_case": "LFR"}
+    monkeypatch.setattr(api, "extract_document", extract)
+    monkeypatch.setattr(api, "_run_analysis", lambda job, state, document_sha256: analysed.append(state))
+
+    document = client.post("/documents", files={"file": ("lfr.pdf", b"%PDF-doc", "application/pdf")}).json()
+    assert extracting.wait(5)
+    queued = client.post("/jobs", data={"frameworks": ["ICO"], "document_id": document["document_id"]}).json()
+
+    # One worker extracts; the analysis doesn't take the other one to wait
+    assert api.job_manager.submit(lambda job: None).wait(5)
+    assert client.get(f"/jobs/{queued['job_id']}").json()["status"] == "queued"
+
+    release.set()
+    assert api.job_manager.get(queued["job_id"]).wait(5)
+    assert analysed[0]["extracted_data"] == {"use_case": "LFR"}
+    assert analysed[0]["pdf_path"] == "lfr.pdf"
+
+
+def test_analysis_finds_a_document_whose_extraction_just_finished(client, monkeypatch):
+    analysed = []
+    monkeypatch.setattr(api, "_run_analysis", lambda job, state, document_sha256: analysed.append(state))
+
+    def finish_extraction(key, priority):
+        # The extraction stores its document and finishes between the two lookups
+        api.document_store["doc-1"] = {
+            "state": {"pdf_path": "lfr.pdf", "extracted_data": {"use_case": "LFR"}},
+            "prompt_version": api.PROMPT_VERSION,
+        }
+        return None
+    monkeypatch.setattr(api.job_manager, "inflight", finish_extraction)
+
+    response = client.post("/jobs", data={"frameworks": ["ICO"], "document_id": "doc-1"})
+
+    assert response.status_code == 202
+    assert api.job_manager.get(response.json()["job_id"]).wait(5)
+    assert analysed[0]["extracted_data"] == {"use_case": "LFR"}
+
+
+def test_export_streams_reports_from_the_report_cache(client):
+    api.analysis_store["job-1"] = {"state": STATE, "created_at": "2026-01-01T00:00:00"}
+    downloaded = client.get("/report/job-1").content
+
+    response = client.get("/reports/export", params={"job_id": ["job-1"]})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    with zipfile.ZipFile(BytesIO(response.content)) as archive:
+        assert archive.read("compliance_report_job-1.pdf") == downloaded
+        assert json.loads(archive.read("manifest.json"))["failed"] == []
+    assert api.report_cache.stats()["hits"] == 1
+    assert client.get("/reports/export", params={"job_id": ["missing"]}).status_code == 404
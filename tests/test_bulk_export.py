@@ -0,0 +1,60 @@
+from io import BytesIO
+import json
+import zipfile
+
+from agents import report_cache as report_cache_module
+from agents.bulk_export import export_reports, report_filename, report_inputs, stream_reports
+from agents.report_cache import ReportCache
+
+STATE = {
+    "extracted_data": {"use_case": "Chatbot", "full_text": "..."},
+    "ico_result": {"framework": "UK ICO", "score": 65, "critical_gaps_count": 0},
+    "eu_act_result": None,
+    "dpa_result": None,
+    "iso_result": None,
+    "selected_frameworks": ["ICO"],
+}
+
+
+def test_report_filename_deduplicates_sanitised_collisions():
+    taken = set()
+    assert report_filename("a/b", taken) == "compliance_report_a_b.pdf"
+    assert report_filename("a_b", taken) == "compliance_report_a_b_2.pdf"
+    assert report_filename("a b", taken) == "compliance_report_a_b_3.pdf"
+    assert report_filename("a/b") == "compliance_report_a_b.pdf"
+
+
+def test_export_writes_every_report_and_a_manifest(tmp_path):
+    path = tmp_path / "reports.zip"
+    analyses = {"job/1": {"state": STATE}, "job_1": {"state": STATE}, "broken": {"state": {"extracted_data": 5}}}
+
+    summary = export_reports(analyses, str(path), workers=1)
+
+    with zipfile.ZipFile(path) as archive:
+        names = archive.namelist()
+        manifest = json.loads(archive.read("manifest.json"))
+        assert len(names) == len(set(names))
+        assert sorted(names) == ["compliance_report_job_1.pdf", "compliance_report_job_1_2.pdf", "manifest.json"]
+        for item in manifest["reports"]:
+            assert archive.read(item["file"]).startswith(b"%PDF")
+
+    assert summary["reports"] == 2
+    assert {item["id"] for item in manifest["reports"]} == {"job/1", "job_1"}
+    assert [item["id"] for item in summary["failed"]] == ["broken"]
+
+
+def test_streamed_export_reuses_cached_reports(tmp_path, monkeypatch):
+    cache = ReportCache(str(tmp_path / "reports"))
+    monkeypatch.setattr(report_cache_module, "report_cache", cache)
+    analyses = {"job/1": {"state": STATE}, "broken": {"state": {"extracted_data": 5}}}
+    cached = report_cache_module.render_report(report_inputs(analyses["job/1"]))
+
+    chunks = list(stream_reports(analyses, chunk_size=4096))
+
+    assert len(chunks) > 2
+    with zipfile.ZipFile(BytesIO(b"".join(chunks))) as archive:
+        manifest = json.loads(archive.read("manifest.json"))
+        assert archive.read("compliance_report_job_1.pdf") == cached
+    assert manifest["reports"] == [{"id": "job/1", "file": "compliance_report_job_1.pdf", "bytes": len(cached)}]
+    assert [item["id"] for item in manifest["failed"]] == ["broken"]
+    assert cache.stats()["hits"] == 1
@@ -0,0 +1,42 @@
+import time
+
+import pytest
+
+from agents import deadlines
+from agents.deadlines import DeadlineExceeded, check_deadline, client_limits, deadline, remaining
+
+
+def test_no_deadline_means_no_limit():
+    assert remaining() is None
+    check_deadline()
+    assert client_limits() == {"max_retries": deadlines.LLM_MAX_RETRIES}
+    with deadline(0):
+        assert remaining() is None
+
+
+def test_inner_deadlines_can_only_shorten_the_outer_one():
+    with deadline(10):
+        with deadline(60):
+            assert remaining() <= 10
+        with deadline(1):
+            assert remaining() <= 1
+        assert 1 < remaining() <= 10
+    assert remaining() is None
+
+
+def test_expired_deadlines_stop_work_and_client_construction():
+    with deadline(0.01):
+        time.sleep(0.02)
+        with pytest.raises(DeadlineExceeded):
+            check_deadline()
+        with pytest.raises(DeadlineExceeded):
+            client_limits()
+
+
+def test_client_timeout_splits_the_remaining_budget_across_attempts(monkeypatch):
+    monkeypatch.setattr(deadlines, "LLM_MAX_RETRIES", 2)
+    with deadline(30):
+        limits = client_limits()
+
+    assert limits["max_retries"] == 2
+    assert 9 < limits["timeout"] <= 10
@@ -0,0 +1,45 @@
+from agents.evidence import anchored_schema, number_lines, rehydrate_evidence, resolve_refs
+from agents.schemas import EUActAnalysis, ICOAnalysis
+
+TEXT = "Purpose\n\nThe system matches faces.\nA human reviews every match.\n  \nAppeals go to the DPO."
+
+
+def test_number_lines_skips_blank_lines():
+    assert number_lines(TEXT).splitlines() == [
+        "[L1] Purpose",
+        "[L2] The system matches faces.",
+        "[L3] A human reviews every match.",
+        "[L4] Appeals go to the DPO.",
+    ]
+
+
+def test_resolve_refs_accepts_ranges_and_drops_bad_refs():
+    lines = ["one", "two", "three", "four"]
+    assert resolve_refs(["L2", "L3-L4", "l1 – l2", "L4-L3", "L9", "see above"], lines) == [
+        "two",
+        "three four",
+        "one two",
+        "three four",
+    ]
+
+
+def test_rehydrate_fills_nested_clauses():
+    result = {
+        "principle_1_safety": {"status": "MET", "evidence_refs": ["L3"]},
+        "obligations_if_high_risk": {"human_oversight": {"status": "MET", "evidence_refs": ["L3-L4"]}},
+    }
+
+    rehydrate_evidence(result, TEXT)
+
+    assert result["principle_1_safety"]["evidence_found"] == ["A human reviews every match."]
+    assert result["obligations_if_high_risk"]["human_oversight"]["evidence_found"] == [
+        "A human reviews every match. Appeals go to the DPO."
+    ]
+
+
+def test_anchored_schema_swaps_quotes_for_refs_throughout():
+    for schema in (ICOAnalysis, EUActAnalysis):
+        anchored = anchored_schema(schema).model_json_schema()
+        text = str(anchored)
+        assert "evidence_refs" in text
+        assert "evidence_found" not in text
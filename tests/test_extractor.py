@@ -0,0 +1,103 @@
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import threading
+
+import pytest
+
+from agents.cancellation import Cancelled, cancellable
+from agents.extractor import read_pdf_text
+
+
+def test_reads_bytes_stream_and_path_alike(make_pdf, tmp_path):
+    pdf = make_pdf(3, lines_per_page=5)
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(pdf)
+
+    from_bytes, stats = read_pdf_text(pdf)
+    assert stats["pages_read"] == 3
+    assert "Page 3 line 4" in from_bytes
+    assert read_pdf_text(memoryview(pdf))[0] == from_bytes
+    assert read_pdf_text(str(path))[0] == from_bytes
+
+
+def test_stream_is_rewound_before_parsing(make_pdf):
+    stream = BytesIO(make_pdf(2, lines_per_page=5))
+    # e.g. a size check or hash already consumed it
+    stream.read()
+
+    text, stats = read_pdf_text(stream)
+    assert stats["pages_read"] == 2
+    assert "Page 1 line 0" in text
+
+
+def test_stops_at_page_and_char_limits(make_pdf):
+    pdf = make_pdf(6, lines_per_page=5)
+
+    text, stats = read_pdf_text(pdf, max_pages=2)
+    assert stats["pages_read"] == 2
+    assert stats["pages_total"] == 6
+    assert stats["stopped_reason"] == "max_pages"
+
+    text, stats = read_pdf_text(pdf, max_chars=100)
+    assert len(text) == stats["chars"] == 100
+    assert stats["stopped_reason"] == "max_chars"
+
+
+def test_page_timeout_applies_off_the_main_thread(make_pdf):
+    pdf = make_pdf(3)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        text, stats = pool.submit(read_pdf_text, pdf, page_timeout_s=0.001).result()
+
+    # Read in a child process, whose main thread can take the alarm
+    assert stats["isolated"] is True
+    assert stats["pages_skipped"] == 3
+    assert text == ""
+    assert all("time budget" in diag["reason"] for diag in stats["page_diagnostics"])
+
+
+def test_isolated_read_matches_inline_read(make_pdf):
+    pdf = make_pdf(4, lines_per_page=5)
+    inline, inline_stats = read_pdf_text(pdf, isolate=False)
+    isolated, isolated_stats = read_pdf_text(BytesIO(pdf), isolate=True)
+
+    assert isolated == inline
+    assert isolated_stats["pages_read"] == inline_stats["pages_read"] == 4
+    assert isolated_stats["isolated"] and not inline_stats["isolated"]
+
+
+def test_isolated_read_reports_child_errors():
+    with pytest.raises(RuntimeError, match="PDF extraction failed"):
+        read_pdf_text(b"not a pdf", isolate=True)
+
+
+def test_cancelling_stops_an_isolated_read(make_pdf):
+    event = threading.Event()
+    event.set()
+    with cancellable(event), pytest.raises(Cancelled):
+        read_pdf_text(make_pdf(2), isolate=True)
+
+
+def test_isolated_reads_open_spooled_files_in_place(make_pdf, monkeypatch):
+    from tempfile import SpooledTemporaryFile
+    from agents import pdf_text
+
+    spooled = SpooledTemporaryFile(max_size=10)
+    spooled.write(make_pdf(2, lines_per_page=5))
+    assert spooled._rolled
+    copies = []
+    monkeypatch.setattr(pdf_text.shutil, "copyfileobj", lambda *args: copies.append(args))
+
+    text, stats = read_pdf_text(spooled, isolate=True)
+
+    assert stats["pages_read"] == 2 and "Page 2 line 4" in text
+    assert copies == []
+
+
+def test_isolated_reader_imports_no_model_libraries():
+    import subprocess
+    import sys
+
+    probe = "import sys, agents.pdf_text; print(sorted({'langchain_core', 'openai'} & set(sys.modules)))"
+    output = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True).stdout
+
+    assert output.strip() == "[]"
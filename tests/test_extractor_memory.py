@@ -0,0 +1,39 @@
+import tracemalloc
+
+import pytest
+
+from agents.extractor import read_pdf_text
+
+
+def _peak_traced_bytes(pdf: bytes, pages: int, bounded: bool) -> int:
+    tracemalloc.start()
+    try:
+        _, stats = read_pdf_text(pdf, max_pages=pages, max_chars=10**8, bounded_memory=bounded)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert stats["pages_read"] == pages
+    return peak
+
+
+@pytest.fixture(scope="module")
+def large_pdf():
+    from conftest import build_pdf
+
+    # One line per page keeps the 500-page parse quick under tracemalloc
+    return build_pdf(500, lines_per_page=1)
+
+
+def test_bounded_mode_peak_memory_is_flat_in_page_count(large_pdf):
+    peak_50 = _peak_traced_bytes(large_pdf, 50, bounded=True)
+    peak_500 = _peak_traced_bytes(large_pdf, 500, bounded=True)
+
+    # Ten times the pages; only the (small) accumulated text may add to the peak
+    assert peak_500 < peak_50 * 1.5
+
+
+def test_unbounded_mode_keeps_every_page(large_pdf):
+    bounded = _peak_traced_bytes(large_pdf, 50, bounded=True)
+    unbounded = _peak_traced_bytes(large_pdf, 50, bounded=False)
+
+    assert unbounded > bounded * 2
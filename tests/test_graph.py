@@ -0,0 +1,64 @@
+import time
+
+import pytest
+
+import graph
+from agents.deadlines import check_deadline, deadline
+from graph import run_framework
+
+
+def test_run_framework_rejects_unknown_codes_and_unextracted_states():
+    with pytest.raises(ValueError, match="Unknown framework"):
+        run_framework({"extracted_data": {"use_case": "LFR"}}, "GDPR")
+    with pytest.raises(ValueError, match="extracted_data"):
+        run_framework({"selected_frameworks": ["ICO"]}, "ICO")
+
+
+def test_framework_nodes_that_run_out_of_time_are_not_evaluated(monkeypatch):
+    monkeypatch.setattr(graph, "NODE_TIMEOUT_S", 0.01)
+    monkeypatch.setattr(graph, "get_analysis_model", lambda: object())
+
+    def slow_analysis(extracted_data, model):
+        time.sleep(0.02)
+        check_deadline()
+        pytest.fail("ran past the node deadline")
+    monkeypatch.setattr(graph, "analyze_ico_compliance", slow_analysis)
+
+    _, node = graph.FRAMEWORK_AGENTS["ICO"]
+    delta = node({"selected_frameworks": ["ICO"], "extracted_data": {"use_case": "LFR"}})
+
+    result = delta["ico_result"]
+    assert result["status"] == "NOT_EVALUATED"
+    assert result["timed_out"] is True
+    assert delta["status_messages"] == ["⏱️ ICO Agent: Timed out, not evaluated"]
+
+
+def test_an_expired_run_deadline_applies_inside_every_node(monkeypatch):
+    monkeypatch.setattr(graph, "get_analysis_model", lambda: object())
+    monkeypatch.setattr(graph, "analyze_eu_act_compliance", lambda data, model: check_deadline())
+
+    with deadline(0.01):
+        time.sleep(0.02)
+        _, node = graph.FRAMEWORK_AGENTS["EU_AI_ACT"]
+        delta = node({"selected_frameworks": ["EU_AI_ACT"], "extracted_data": {"use_case": "LFR"}})
+
+    assert delta["eu_act_result"]["timed_out"] is True
+    assert delta["eu_act_result"]["risk_tier"] == "UNKNOWN"
+
+
+def test_synthesizer_reports_timed_out_and_not_evaluated_frameworks_apart():
+    state = {
+        "selected_frameworks": ["ICO", "EU_AI_ACT", "DPA"],
+        "ico_result": {"score": 80, "critical_gaps_count": 0},
+        "eu_act_result": {"score": 0, "status": "NOT_EVALUATED"},
+        "dpa_result": {"score": 0, "status": "NOT_EVALUATED", "timed_out": True},
+    }
+
+    update = graph.synthesizer_node(state)
+
+    synthesis = update["synthesis"]
+    assert synthesis["uk_alignment_score"] == 80
+    assert synthesis["frameworks_analyzed"] == ["ICO"]
+    assert synthesis["frameworks_timed_out"] == ["DPA"]
+    assert synthesis["frameworks_not_evaluated"] == ["EU_AI_ACT"]
+    assert any("EU_AI_ACT (not evaluated)" in message for message in update["status_messages"])
@@ -0,0 +1,362 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from agents.cancellation import check_cancelled
+from agents.jobs import JobManager, JobRejected
+
+WAIT_S = 5
+
+
+def blocker():
+    """Work function that holds its worker until the returned event is set."""
+    release = threading.Event()
+
+    def work(job):
+        assert release.wait(WAIT_S)
+        return "released"
+    return work, release
+
+
+def running(job):
+    """Wait until a worker has claimed `job`, so it no longer counts as queued."""
+    deadline = time.monotonic() + WAIT_S
+    while job.status == "queued":
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+    return job
+
+
+def test_submit_runs_the_job_and_reports_status():
+    updates = []
+    manager = JobManager(workers=1, on_update=updates.append)
+
+    job = manager.submit(lambda job: job.update_progress(step=1) or 42, kind="test")
+
+    assert job.wait(WAIT_S)
+    assert job.status == "done"
+    assert job.result == 42
+    assert job.progress == {"step": 1}
+    assert [update["status"] for update in updates][0] == "queued"
+    assert updates[-1]["status"] == "done"
+    assert job.to_dict()["kind"] == "test"
+
+
+def test_failures_are_recorded_not_raised():
+    manager = JobManager(workers=1)
+
+    job = manager.submit(lambda job: 1 / 0)
+
+    assert job.wait(WAIT_S)
+    assert job.status == "failed"
+    assert job.error.startswith("ZeroDivisionError")
+
+
+def test_done_callbacks_run_once_including_late_ones():
+    manager = JobManager(workers=1)
+    seen = []
+    work, release = blocker()
+    job = manager.submit(work)
+    job.add_done_callback(lambda done: seen.append(("early", done.status)))
+
+    release.set()
+    assert job.wait(WAIT_S)
+    job.add_done_callback(lambda done: seen.append(("late", done.status)))
+
+    assert seen == [("early", "done"), ("late", "done")]
+
+
+def test_finished_jobs_beyond_history_are_forgotten():
+    manager = JobManager(workers=1, history=2)
+    jobs = [manager.submit(lambda job: None) for _ in range(3)]
+    for job in jobs:
+        assert job.wait(WAIT_S)
+
+    assert manager.get(jobs[0].id) is None
+    assert manager.get(jobs[2].id) is jobs[2]
+
+
+def test_identical_submissions_coalesce_while_in_flight():
+    manager = JobManager(workers=1)
+    work, release = blocker()
+
+    first, created = manager.submit_once(work, key="doc")
+    second, attached = manager.submit_once(lambda job: "never runs", key="doc")
+    release.set()
+
+    assert created and not attached
+    assert second is first
+    assert first.wait(WAIT_S) and first.result == "released"
+    assert first.requests == 2
+    assert manager.stats()["coalesced"] == 1
+
+
+def test_finished_jobs_are_never_coalesced_onto():
+    manager = JobManager(workers=1)
+    work, release = blocker()
+    resubmitted = threading.Event()
+    outcome = []
+    job, _ = manager.submit_once(work, key="doc")
+
+    def resubmit(done):
+        # Runs on the worker the moment completion is published
+        outcome.append(manager.submit_once(lambda job: None, key="doc"))
+        resubmitted.set()
+    job.add_done_callback(resubmit)
+    release.set()
+
+    assert resubmitted.wait(WAIT_S)
+    again, created = outcome[0]
+    assert created
+    assert again is not job
+
+
+def test_unknown_priority_is_rejected():
+    with pytest.raises(ValueError):
+        JobManager(workers=1).submit(lambda job: None, priority="urgent")
+
+
+def test_jobs_submitted_after_another_wait_without_holding_a_worker():
+    manager = JobManager(workers=2)
+    work, release = blocker()
+    first = manager.submit(work)
+    ran = threading.Event()
+    later, _ = manager.submit_once(lambda job: ran.set(), key="analysis", after=first)
+    manager.inflight("analysis", priority="ci")          # promotion must not queue it early
+
+    # The other worker is free, and it takes unrelated work instead
+    assert manager.submit(lambda job: None).wait(WAIT_S)
+    assert later.status == "queued" and not ran.is_set()
+
+    release.set()
+    assert later.wait(WAIT_S) and ran.is_set()
+    assert later.priority == "ci"
+
+
+def test_a_deferred_job_cancelled_while_waiting_never_runs():
+    manager = JobManager(workers=1)
+    work, release = blocker()
+    first = manager.submit(work)
+    later, _ = manager.submit_once(lambda job: pytest.fail("cancelled job ran"), key="analysis", after=first)
+
+    assert manager.cancel(later)
+    release.set()
+    assert first.wait(WAIT_S)
+    # The worker dequeues and skips it; a follow-up job still runs
+    assert manager.submit(lambda job: None).wait(WAIT_S)
+    assert later.status == "cancelled"
+
+
+# ── Admission and priority lanes ──────────────────────────────────────────
+
+def test_full_lanes_reject_with_a_retry_estimate_but_faster_lanes_still_admit():
+    manager = JobManager(workers=1, max_queued=1)
+    work, release = blocker()
+    running(manager.submit(work))
+    manager.submit(lambda job: None)           # fills the normal lane
+
+    with pytest.raises(JobRejected) as rejected:
+        manager.submit(lambda job: None, priority="bulk")
+    ci = manager.submit(lambda job: None, priority="ci")
+    release.set()
+
+    assert rejected.value.reason == "queue_full"
+    assert rejected.value.retry_after >= 1
+    assert manager.stats()["rejected"]["queue_full"] == 1
+    assert ci.wait(WAIT_S)
+
+
+def test_owner_quota_counts_queued_and_running_jobs():
+    manager = JobManager(workers=1, max_active_per_owner=2)
+    work, release = blocker()
+    first = manager.submit(work, owner="key:a")
+    manager.submit(lambda job: None, owner="key:a")
+
+    with pytest.raises(JobRejected) as rejected:
+        manager.check_admission(owner="key:a")
+    manager.check_admission(owner="key:b")
+    release.set()
+    assert first.wait(WAIT_S)
+
+    assert rejected.value.reason == "quota"
+    # The slot is free as soon as the job is seen to finish
+    manager.check_admission(owner="key:a")
+
+
+def test_lanes_drain_most_urgent_first_and_in_order_within_a_lane():
+    manager = JobManager(workers=1)
+    work, release = blocker()
+    order = []
+    manager.submit(work)
+    jobs = [
+        manager.submit(lambda job, name=name: order.append(name), priority=priority)
+        for name, priority in [("bulk", "bulk"), ("normal-1", "normal"), ("ci", "ci"), ("normal-2", "normal")]
+    ]
+    release.set()
+
+    for job in jobs:
+        assert job.wait(WAIT_S)
+    assert order == ["ci", "normal-1", "normal-2", "bulk"]
+
+
+def test_coalescing_a_more_urgent_request_promotes_the_queued_job():
+    manager = JobManager(workers=1)
+    work, release = blocker()
+    order = []
+    manager.submit(work)
+    bulk, _ = manager.submit_once(lambda job: order.append("shared"), key="doc", priority="bulk")
+    normal = manager.submit(lambda job: order.append("normal"))
+    manager.submit_once(lambda job: None, key="doc", priority="ci")
+    release.set()
+
+    assert bulk.wait(WAIT_S) and normal.wait(WAIT_S)
+    assert bulk.priority == "ci"
+    assert order == ["shared", "normal"]
+    assert manager.stats()["queued_by_priority"] == {"ci": 0, "normal": 0, "bulk": 0}
+
+
+# ── Cancellation ──────────────────────────────────────────────────────────
+
+def test_cancelling_a_queued_job_drops_it_and_frees_its_slot():
+    manager = JobManager(workers=1, max_active_per_owner=2)
+    work, release = blocker()
+    running(manager.submit(work, owner="key:a"))
+    queued = manager.submit(lambda job: pytest.fail("cancelled job ran"), owner="key:a")
+
+    assert manager.cancel(queued)
+    assert queued.finished and queued.status == "cancelled"
+    manager.check_admission(owner="key:a")
+    release.set()
+
+
+def test_cancelling_a_running_job_stops_it_at_the_next_check():
+    manager = JobManager(workers=1)
+    started, stop = threading.Event(), threading.Event()
+
+    def work(job):
+        started.set()
+        assert stop.wait(WAIT_S)
+        check_cancelled()
+        pytest.fail("ran past a cancellation check")
+
+    job = manager.submit(work)
+    assert started.wait(WAIT_S)
+    assert manager.cancel(job, keep_partial=True)
+    assert job.status == "running"             # cooperative: it is still running
+    stop.set()
+
+    assert job.wait(WAIT_S)
+    assert job.status == "cancelled"
+    assert job.keep_partial
+    assert not manager.cancel(job)
+
+
+def test_unwatch_wants_cancelling_only_when_nobody_else_needs_the_result():
+    manager = JobManager(workers=1)
+    work, release = blocker()
+    job = manager.submit(work)
+    job.watch()
+    job.watch()
+
+    assert not job.unwatch()                   # another request still waits
+    job.pinned = True                          # queued through POST /jobs
+    assert not job.unwatch()
+    job.pinned = False
+    job.watch()
+    assert job.unwatch()
+    release.set()
+
+
+# ── Event log (SSE) ───────────────────────────────────────────────────────
+
+async def collect(job, start=0, heartbeat=None):
+    return [event async for event in job.subscribe(start, heartbeat=heartbeat)]
+
+
+def test_subscribers_follow_live_events_until_the_job_finishes():
+    manager = JobManager(workers=1)
+    work, release = blocker()
+
+    def publishing(job):
+        job.publish("update", {"node": "extractor"})
+        work(job)
+        job.publish("update", {"node": "synthesizer"})
+
+    async def follow():
+        job = manager.submit(publishing)
+        subscriber = asyncio.ensure_future(collect(job))
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.wait_for(subscriber, WAIT_S)
+
+    events = asyncio.run(follow())
+
+    assert [(e["event"], e["data"].get("node") or e["data"]["status"]) for e in events] == [
+        ("status", "running"), ("update", "extractor"), ("update", "synthesizer"), ("status", "done"),
+    ]
+    assert [e["id"] for e in events] == [0, 1, 2, 3]
+
+
+def test_late_subscribers_replay_and_resume_after_an_id():
+    manager = JobManager(workers=1)
+    job = manager.submit(lambda job: job.publish("update", {"node": "router"}))
+    assert job.wait(WAIT_S)
+
+    assert len(asyncio.run(collect(job))) == 3
+    assert [e["id"] for e in asyncio.run(collect(job, start=2))] == [2]
+
+
+def test_idle_subscribers_get_heartbeats():
+    manager = JobManager(workers=1)
+    work, release = blocker()
+
+    async def follow():
+        job = manager.submit(work)
+        stream = job.subscribe(heartbeat=0.01).__aiter__()
+        first = await stream.__anext__()        # running
+        beat = await stream.__anext__()
+        release.set()
+        rest = [event async for event in stream]
+        return first, beat, rest
+
+    first, beat, rest = asyncio.run(follow())
+    assert first["data"]["status"] == "running"
+    assert beat is None
+    assert [e for e in rest if e is not None][-1]["data"]["status"] == "done"
+
+
+def test_finished_jobs_keep_only_retained_payloads_once_unobserved():
+    manager = JobManager(workers=1)
+    work, release = blocker()
+
+    def publishing(job):
+        job.publish("update", {"node": "ico", "updates": "x" * 1000}, retained={"node": "ico"})
+        work(job)
+
+    async def follow():
+        job = manager.submit(publishing)
+        stream = job.subscribe().__aiter__()
+        await stream.__anext__()                   # running
+        live = await stream.__anext__()
+        release.set()
+        assert job.wait(WAIT_S)
+        # Still subscribed: the log is intact for the reader that's mid-stream
+        assert job.events[1]["data"] == live["data"]
+        await stream.aclose()
+        return job
+
+    job = asyncio.run(follow())
+
+    assert job.events[1] == {"id": 1, "event": "update", "data": {"node": "ico"}}
+    assert [e["data"] for e in asyncio.run(collect(job))][1] == {"node": "ico"}
+
+
+def test_events_without_subscribers_are_compacted_on_finish():
+    manager = JobManager(workers=1)
+    job = manager.submit(lambda job: job.publish("update", {"updates": [1, 2, 3]}, retained={}))
+    assert job.wait(WAIT_S)
+
+    assert job.events[1]["data"] == {}
+    assert job.events[2]["data"]["status"] == "done"
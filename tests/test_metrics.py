@@ -0,0 +1,69 @@
+import pytest
+
+from agents.metrics import Registry
+
+
+def test_counters_and_gauges_render_one_sample_per_label_set():
+    registry = Registry()
+    calls = registry.counter("calls_total", "Model calls.", ["caller", "outcome"])
+    depth = registry.gauge("queue_depth", "Jobs waiting.")
+    calls.inc("ico", "ok")
+    calls.inc("ico", "ok", amount=2)
+    calls.inc("dpa", "error")
+    depth.set(3)
+    depth.dec()
+
+    assert registry.render() == (
+        "# HELP calls_total Model calls.\n"
+        "# TYPE calls_total counter\n"
+        'calls_total{caller="dpa",outcome="error"} 1\n'
+        'calls_total{caller="ico",outcome="ok"} 3\n'
+        "# HELP queue_depth Jobs waiting.\n"
+        "# TYPE queue_depth gauge\n"
+        "queue_depth 2\n"
+    )
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive():
+    registry = Registry()
+    latency = registry.histogram("node_seconds", "Node latency.", ["node"], buckets=[0.1, 1.0])
+    for value in (0.05, 0.1, 0.5, 7.5):
+        latency.observe(value, "router")
+
+    lines = registry.render().splitlines()[2:]
+
+    assert lines == [
+        'node_seconds_bucket{node="router",le="0.1"} 2',
+        'node_seconds_bucket{node="router",le="1"} 3',
+        'node_seconds_bucket{node="router",le="+Inf"} 4',
+        'node_seconds_sum{node="router"} 8.15',
+        'node_seconds_count{node="router"} 4',
+    ]
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    registry.counter("errors_total", "Errors.", ["message"]).inc('bad "quote"\\path\nnext')
+
+    assert 'errors_total{message="bad \\"quote\\"\\\\path\\nnext"} 1' in registry.render()
+
+
+def test_wrong_label_count_and_duplicate_names_are_rejected():
+    registry = Registry()
+    calls = registry.counter("calls_total", "Model calls.", ["caller"])
+
+    with pytest.raises(ValueError, match="expects labels"):
+        calls.inc()
+    with pytest.raises(ValueError, match="already registered"):
+        registry.counter("calls_total", "Again.")
+
+
+def test_collectors_are_read_at_scrape_time_and_can_be_rebound():
+    registry = Registry()
+    entries = {"count": 1}
+    registry.collected("store_entries", "Stored analyses.", "gauge", lambda: {(): entries["count"]})
+    entries["count"] = 5
+    assert "store_entries 5\n" in registry.render()
+
+    registry.collected("store_entries", "Stored analyses.", "gauge", lambda: {(): 9})
+    assert "store_entries 9\n" in registry.render()
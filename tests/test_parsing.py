@@ -0,0 +1,258 @@
+from typing import Any, Callable, List
+import json
+
+from langchain_core.messages import AIMessage
+import httpx
+from openai import BadRequestError, ContentFilterFinishReasonError, LengthFinishReasonError
+from openai.types.chat import ChatCompletion, ChatCompletionMessage
+from openai.types.chat.chat_completion import Choice
+from openai.types.completion_usage import CompletionUsage
+import pytest
+
+from agents import parsing
+from agents.ico_agent import analyze_ico_compliance
+from agents.parsing import invoke_for_json
+from agents.schemas import ExtractedDocument
+
+
+def cut_off_completion(content: str, finish_reason: str = "length") -> ChatCompletion:
+    return ChatCompletion(
+        id="chatcmpl-test",
+        created=0,
+        model="fake-model",
+        object="chat.completion",
+        choices=[Choice(index=0, finish_reason=finish_reason,
+                        message=ChatCompletionMessage(role="assistant", content=content))],
+        usage=CompletionUsage(prompt_tokens=100, completion_tokens=4096, total_tokens=4196),
+    )
+
+
+class ScriptedModel:
+    """Stands in for a chat model; each call runs the next scripted step.
+
+    A step is called with (prompt, schema) and returns the structured-output
+    dict ({"raw": ..., "parsed": ...}) or raises, as the OpenAI SDK does.
+    Plain invoke() calls get schema None and return the step's message.
+    """
+
+    model_name = "fake-model"
+
+    def __init__(self, *steps: Callable[[str, Any], dict]):
+        self.steps = list(steps)
+        self.prompts: List[str] = []
+        self.schemas: List[Any] = []
+
+    def with_structured_output(self, schema, method=None, include_raw=False):
+        model = self
+
+        class Bound:
+            def invoke(self, prompt):
+                model.prompts.append(prompt)
+                model.schemas.append(schema)
+                return model.steps.pop(0)(prompt, schema)
+
+        return Bound()
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        self.schemas.append(None)
+        return self.steps.pop(0)(prompt, None)
+
+
+def raises(exc: Exception) -> Callable[[str, Any], dict]:
+    def step(prompt, schema):
+        raise exc
+    return step
+
+
+def returns(**fields: Any) -> Callable[[str, Any], dict]:
+    def step(prompt, schema):
+        return {"raw": AIMessage(content=""), "parsed": schema(**fields)}
+    return step
+
+
+@pytest.fixture(autouse=True)
+def forget_schema_rejections():
+    yield
+    parsing._schema_rejected.clear()
+
+
+TRUNCATED = '{"document_type": "SYSTEM_SPEC", "use_case": "Live facial recognition", "system_type": "Biom'
+
+
+def test_length_error_is_treated_as_truncated_output():
+    model = ScriptedModel(raises(LengthFinishReasonError(completion=cut_off_completion(TRUNCATED))))
+
+    parsed, content, truncated = parsing._invoke_once(model, "prompt", ExtractedDocument, "extractor")
+
+    assert parsed is None
+    assert content == TRUNCATED
+    assert truncated is True
+
+
+def test_content_filter_error_without_completion_is_truncated_and_empty():
+    model = ScriptedModel(raises(ContentFilterFinishReasonError()))
+
+    assert parsing._invoke_once(model, "prompt", ExtractedDocument, "extractor") == (None, "", True)
+
+
+def bad_request(message: str, param: str = None) -> BadRequestError:
+    response = httpx.Response(400, request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+    body = {"message": message, "type": "invalid_request_error", "param": param}
+    return BadRequestError(message, response=response, body=body)
+
+
+def test_schema_rejected_at_invoke_falls_back_to_text_and_repair():
+    rejection = bad_request("Invalid schema for response_format 'ExtractedDocument'", "response_format")
+    text = '{"document_type": "GUIDANCE", "use_case": "Chatbot", "system_type": "LLM"} trailing'
+    model = ScriptedModel(raises(rejection), lambda prompt, schema: AIMessage(content=text),
+                          lambda prompt, schema: AIMessage(content=text))
+
+    result, content = invoke_for_json(model, "prompt", ExtractedDocument, "schema-rejected-test")
+    # The rejection is remembered: the next call doesn't try the schema again
+    invoke_for_json(model, "prompt", ExtractedDocument, "schema-rejected-test")
+
+    assert result["use_case"] == "Chatbot"
+    assert content == text
+    assert model.schemas == [ExtractedDocument, None, None]
+    assert parsing.parse_stats()["schema-rejected-test"]["repaired"] == 2
+
+
+def test_other_bad_requests_still_propagate():
+    model = ScriptedModel(raises(bad_request("This model's maximum context length is 128000 tokens", "messages")))
+
+    with pytest.raises(BadRequestError):
+        parsing._invoke_once(model, "prompt", ExtractedDocument, "extractor")
+
+
+def test_bound_schemas_carry_no_defaults():
+    from openai.lib._pydantic import to_strict_json_schema
+    from agents.schemas import EUActAnalysis, FrameworkAnalysis
+
+    assert '"default"' not in json.dumps(to_strict_json_schema(EUActAnalysis))
+    # Defaults still apply when validating
+    assert FrameworkAnalysis.model_validate({}).overall_score == 0
+
+
+def test_other_model_errors_still_propagate():
+    model = ScriptedModel(raises(RuntimeError("connection reset")))
+
+    with pytest.raises(RuntimeError):
+        parsing._invoke_once(model, "prompt", ExtractedDocument, "extractor")
+
+
+def test_truncated_structured_response_is_salvaged_not_raised():
+    model = ScriptedModel(
+        raises(LengthFinishReasonError(completion=cut_off_completion(TRUNCATED))),
+        returns(system_type="Biometric identification"),
+    )
+
+    result, content = invoke_for_json(model, "prompt", ExtractedDocument, "salvage-test")
+
+    assert result["document_type"] == "SYSTEM_SPEC"
+    assert result["use_case"] == "Live facial recognition"
+    assert result["system_type"] == "Biometric identification"
+    assert content == TRUNCATED
+    assert parsing.parse_stats()["salvage-test"]["salvaged"] == 1
+
+
+def test_agent_with_unsalvageable_truncation_is_not_evaluated():
+    # Cut off before a single member was complete: nothing to continue from
+    model = ScriptedModel(raises(LengthFinishReasonError(completion=cut_off_completion('{"principle_1_sa'))))
+
+    result = analyze_ico_compliance({"use_case": "Face matching", "full_text": ""}, model)
+
+    assert result["status"] == "NOT_EVALUATED"
+    assert result["score"] == 0
+
+
+# ── Salvage and continuation ──────────────────────────────────────────────
+
+@pytest.mark.parametrize(
+    "content, expected",
+    [
+        # Cut mid-string
+        ('{"a": "done", "b": "half', {"a": "done"}),
+        # Cut mid-number: 12 may be the start of 1234, so it is not kept
+        ('{"a": 1, "b": 12', {"a": 1}),
+        # Cut inside a nested object: the whole member is dropped
+        ('{"a": {"status": "MET"}, "b": {"status": "NOT_', {"a": {"status": "MET"}}),
+        # Cut after a complete member, before the next key
+        ('{"a": [1, 2], ', {"a": [1, 2]}),
+        # Complete object in a code fence
+        ('```json\n{"a": true, "b": null}\n```', {"a": True, "b": None}),
+        # Cut inside the first key
+        ('{"princ', {}),
+        ("no json here", {}),
+    ],
+)
+def test_salvage_json_object(content, expected):
+    assert parsing.salvage_json_object(content) == expected
+
+
+def test_continuation_requests_only_missing_keys_and_merges_them():
+    model = ScriptedModel(
+        raises(LengthFinishReasonError(completion=cut_off_completion(TRUNCATED))),
+        returns(system_type="Biometric identification", keywords=["LFR"]),
+    )
+
+    result, _ = invoke_for_json(model, "Extract the facts.", ExtractedDocument, "continuation-test")
+
+    continuation_prompt, continuation_schema = model.prompts[1], model.schemas[1]
+    assert continuation_prompt.startswith("Extract the facts.")
+    assert "must NOT be repeated: document_type, use_case" in continuation_prompt
+    assert set(continuation_schema.model_fields) == set(ExtractedDocument.model_fields) - {"document_type", "use_case"}
+    assert result["keywords"] == ["LFR"]
+    # Validated against the full schema, so omitted fields get their defaults
+    assert result["region_residency"] == "Not specified"
+    # Both calls are attributed to the caller, not to a schema field name
+    calls = parsing.metrics.LLM_CALLS.values()
+    assert calls[("fake-model", "continuation-test", "ok")] == 2
+
+
+def test_continuation_text_is_filtered_to_missing_keys():
+    def text_reply(prompt, schema):
+        # Structured parsing failed; the model repeated a key it already sent
+        raw = AIMessage(content='{"use_case": "Overwritten", "system_type": "Biometric identification"}')
+        return {"raw": raw, "parsed": None}
+
+    model = ScriptedModel(raises(LengthFinishReasonError(completion=cut_off_completion(TRUNCATED))), text_reply)
+
+    result, _ = invoke_for_json(model, "prompt", ExtractedDocument, "continuation-text-test")
+
+    assert result["use_case"] == "Live facial recognition"
+    assert result["system_type"] == "Biometric identification"
+
+
+def test_salvaged_members_are_kept_when_continuation_fails_validation():
+    def empty_reply(prompt, schema):
+        return {"raw": AIMessage(content="sorry"), "parsed": None}
+
+    # document_type is required, and only use_case survives the cut
+    model = ScriptedModel(
+        raises(LengthFinishReasonError(completion=cut_off_completion('{"use_case": "Chatbot", "document_t'))),
+        empty_reply,
+    )
+
+    result, _ = invoke_for_json(model, "prompt", ExtractedDocument, "continuation-invalid-test")
+
+    assert result == {"use_case": "Chatbot"}
+    assert parsing.parse_stats()["continuation-invalid-test"]["salvaged"] == 1
+
+
+def test_output_tokens_are_reported_per_caller_and_evidence_mode():
+    def reply(prompt, schema):
+        raw = AIMessage(content="", usage_metadata={"input_tokens": 900, "output_tokens": 300, "total_tokens": 1200})
+        return {"raw": raw, "parsed": schema(document_type="GUIDANCE", use_case="x", system_type="y")}
+
+    model = ScriptedModel(reply, reply)
+    invoke_for_json(model, "prompt", ExtractedDocument, "token-test")
+    invoke_for_json(model, "prompt", ExtractedDocument, "token-test")
+
+    stats = parsing.output_token_stats()[f"token-test:{parsing.EVIDENCE_MODE}"]
+    assert stats == {"calls": 2, "output_tokens": 600, "mean_output_tokens": 300.0}
+    exposition = parsing.metrics.registry.render()
+    assert (
+        'compliance_llm_tokens_total{model="fake-model",caller="token-test",direction="output",'
+        f'evidence_mode="{parsing.EVIDENCE_MODE}"}} 600'
+    ) in exposition
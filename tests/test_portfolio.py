@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from agents.portfolio import load_portfolio, rescore, what_if
+from agents.synthesizer import synthesize_gaps
+
+RESULT_KEYS = {"ico": "ico_result", "eu_act": "eu_act_result", "dpa": "dpa_result", "iso": "iso_result"}
+CODES = {"ico": "ICO", "eu_act": "EU_AI_ACT", "dpa": "DPA", "iso": "ISO_42001"}
+
+
+def result(score, gaps=0, **extra):
+    return {"score": score, "critical_gaps_count": gaps, **extra}
+
+
+def not_evaluated(**extra):
+    return {"score": 0, "critical_gaps_count": 0, "status": "NOT_EVALUATED", **extra}
+
+
+ANALYSES = {
+    "all-four": {"ico": result(85), "dpa": result(90), "iso": result(70, 1), "eu_act": result(40, 2)},
+    "compliant": {"ico": result(95), "dpa": result(88), "iso": result(81)},
+    "ico-only": {"ico": result(55, 3)},
+    "timed-out": {"ico": result(80), "dpa": not_evaluated(timed_out=True), "iso": result(60)},
+    "not-evaluated": {"ico": result(70), "dpa": result(75), "eu_act": not_evaluated(risk_tier="UNKNOWN")},
+    "nothing-scored": {"ico": not_evaluated(timed_out=True)},
+}
+
+
+def state_for(results):
+    state = {RESULT_KEYS[key]: value for key, value in results.items()}
+    state["selected_frameworks"] = [CODES[key] for key in results]
+    return state
+
+
+def synthesis_for(results, weights=None):
+    return synthesize_gaps(
+        ico_result=results.get("ico"),
+        eu_act_result=results.get("eu_act"),
+        dpa_result=results.get("dpa"),
+        iso_result=results.get("iso"),
+        selected_frameworks=[CODES[key] for key in results],
+        weights=weights,
+    )
+
+
+@pytest.mark.parametrize("weights", [None, {"ico": 0.25, "dpa": 0.25, "iso": 0.25, "eu_act": 0.25}])
+def test_rescore_matches_synthesize_gaps(weights):
+    portfolio = load_portfolio({name: state_for(results) for name, results in ANALYSES.items()})
+
+    rescored = rescore(portfolio, weights)
+
+    for name, results in ANALYSES.items():
+        synthesis = synthesis_for(results, weights)
+        assert rescored["scores"][name] == synthesis["uk_alignment_score"], name
+        assert rescored["statuses"][name] == synthesis["overall_status"], name
+
+
+def test_unscored_frameworks_are_nan_not_zero():
+    portfolio = load_portfolio({"timed-out": state_for(ANALYSES["timed-out"])})
+
+    assert np.isnan(portfolio.scores[0, 1])   # dpa column
+    # 80 * 0.4 + 60 * 0.2 over 0.6, not dragged down by a 0 for DPA
+    assert rescore(portfolio)["scores"]["timed-out"] == 73
+
+
+def test_stored_records_and_synthesis_only_payloads_are_loaded():
+    synthesis = synthesis_for(ANALYSES["compliant"])
+    analyses = {
+        "record": {"state": state_for(ANALYSES["all-four"])},
+        "summary-only": {"synthesis": synthesis},
+        "empty": {"state": {}},
+    }
+
+    portfolio = load_portfolio(analyses)
+
+    assert portfolio.ids == ["record", "summary-only"]
+    assert rescore(portfolio)["scores"]["summary-only"] == synthesis["uk_alignment_score"]
+
+
+def test_what_if_reports_status_changes_against_current_weights():
+    portfolio = load_portfolio({name: state_for(results) for name, results in ANALYSES.items()})
+
+    comparison = what_if(portfolio, {"current": {"ico": 0.4, "dpa": 0.3, "iso": 0.2, "eu_act": 0.1},
+                                     "eu-heavy": {"ico": 0.1, "dpa": 0.1, "iso": 0.1, "eu_act": 0.7}})
+
+    assert comparison["current"]["status_changes"] == 0
+    assert comparison["current"]["mean_score_delta"] == 0.0
+    assert "all-four" in comparison["eu-heavy"]["changed_ids"]
+    assert comparison["eu-heavy"]["distribution"]["count"] == len(ANALYSES)
+
+
+def test_synthesis_lists_frameworks_that_were_not_evaluated():
+    synthesis = synthesis_for(ANALYSES["not-evaluated"])
+
+    assert synthesis["frameworks_not_evaluated"] == ["EU_AI_ACT"]
+    assert synthesis["frameworks_analyzed"] == ["ICO", "DPA"]
+    assert synthesis_for(ANALYSES["timed-out"])["frameworks_not_evaluated"] == []
@@ -0,0 +1,101 @@
+import pytest
+
+from agents import report_cache as report_cache_module
+from agents.report_cache import ReportCache, open_report, render_report, report_key
+
+
+def writer(payload: bytes):
+    def render(stream):
+        stream.write(payload)
+    return render
+
+
+def test_report_key_ignores_full_text_and_unrelated_state():
+    state = {"extracted_data": {"use_case": "LFR", "full_text": "page one"}, "synthesis": {"uk_alignment_score": 70}}
+    same = {**state, "extracted_data": {"use_case": "LFR", "full_text": "other"}, "status_messages": ["x"]}
+    changed = {**state, "synthesis": {"uk_alignment_score": 71}}
+
+    assert report_key(state) == report_key(same)
+    assert report_key(state) != report_key(changed)
+
+
+def test_lru_eviction_by_entries_and_bytes(tmp_path):
+    cache = ReportCache(str(tmp_path), max_entries=2, max_bytes=100)
+    cache.put("a", writer(b"a" * 10))
+    cache.put("b", writer(b"b" * 10))
+    assert cache.get("a")            # a is now most recently used
+    cache.put("c", writer(b"c" * 10))
+
+    assert cache.get("b") is None
+    assert not (tmp_path / "b.pdf").exists()
+    assert cache.stats()["evictions"] == 1
+
+    # One entry over the byte budget evicts everything older, but is kept itself
+    cache.put("big", writer(b"x" * 150))
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["bytes"] == 150
+    assert cache.get("big")
+
+
+def test_reports_rendered_by_another_worker_are_picked_up(tmp_path):
+    ours, theirs = ReportCache(str(tmp_path)), ReportCache(str(tmp_path))
+    theirs.put("shared", writer(b"%PDF-shared"))
+
+    path = ours.get("shared")
+    assert path and open(path, "rb").read() == b"%PDF-shared"
+    assert ours.stats()["entries"] == 1
+
+
+def test_failed_render_leaves_no_partial_file(tmp_path):
+    cache = ReportCache(str(tmp_path))
+
+    def broken(stream):
+        stream.write(b"%PDF-half")
+        raise RuntimeError("render failed")
+
+    with pytest.raises(RuntimeError):
+        cache.put("k", broken)
+    assert list(tmp_path.iterdir()) == []
+    assert cache.get("k") is None
+
+
+def test_discard_removes_entry_and_file(tmp_path):
+    cache = ReportCache(str(tmp_path))
+    cache.put("k", writer(b"pdf"))
+    cache.discard("k")
+
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["bytes"] == 0
+    assert not (tmp_path / "k.pdf").exists()
+
+
+def test_reports_render_once_per_content(tmp_path, monkeypatch):
+    monkeypatch.setattr(report_cache_module, "report_cache", ReportCache(str(tmp_path)))
+    calls = []
+    monkeypatch.setattr(
+        report_cache_module, "build_report", lambda stream, **inputs: (calls.append(inputs), stream.write(b"%PDF"))
+    )
+    state = {"extracted_data": {"use_case": "LFR"}, "synthesis": {"uk_alignment_score": 70}}
+
+    assert render_report(state) == b"%PDF"
+    stream, key = open_report(state)
+    stream.close()
+
+    assert len(calls) == 1
+    assert key == report_key(state)
+
+
+def test_reports_evicted_by_another_worker_are_rendered_again(tmp_path, monkeypatch):
+    ours, theirs = ReportCache(str(tmp_path), max_entries=1), ReportCache(str(tmp_path), max_entries=1)
+    monkeypatch.setattr(report_cache_module, "report_cache", ours)
+    monkeypatch.setattr(report_cache_module, "build_report", lambda stream, **inputs: stream.write(b"%PDF"))
+    state = {"extracted_data": {"use_case": "LFR"}, "synthesis": {"uk_alignment_score": 70}}
+    key = report_key(state)
+
+    theirs.put(key, writer(b"%PDF"))
+    assert ours.get(key)                      # adopted from the shared directory
+    theirs.put("other", writer(b"%PDF-other"))   # evicts the shared file
+
+    assert ours.get(key) is None
+    assert ours.stats()["entries"] == 0
+    assert render_report(state) == b"%PDF"
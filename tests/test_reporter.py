@@ -0,0 +1,48 @@
+from agents.reporter import _clean_text, generate_report
+
+
+def test_clean_text_passes_plain_ascii_through():
+    text = "Score: 72%\n\tNo changes needed."
+    assert _clean_text(text) is text
+
+
+def test_clean_text_maps_dashes_spaces_and_control_characters():
+    assert _clean_text("non‑breaking – en — em space") == "non-breaking - en - em space"
+    assert _clean_text("bell\x07 and\x00null\nkept\ttab") == "bell  and null\nkept\ttab"
+    # NFKC folds compatibility characters such as ligatures
+    assert _clean_text("ﬁle") == "file"
+
+
+def test_clean_text_handles_none_and_non_strings():
+    assert _clean_text(None) == ""
+    assert _clean_text(42) == "42"
+
+
+def test_report_renders_with_unicode_in_results():
+    pdf = generate_report(
+        extracted_data={"use_case": "Face‑matching — pilot", "data_types": ["biometric data"]},
+        ico_result={"framework": "UK ICO", "score": 60, "critical_gaps_count": 0, "critical_gaps": ["No DPIA – yet"]},
+        eu_act_result=None,
+        dpa_result=None,
+        iso_result=None,
+        synthesis={"uk_alignment_score": 60, "framework_scores": {"UK ICO": 60}, "priority_actions": ["Run a DPIA"]},
+    )
+    assert pdf.startswith(b"%PDF")
+
+
+def test_report_lists_frameworks_that_were_not_evaluated():
+    pdf = generate_report(
+        extracted_data={"use_case": "LFR"},
+        ico_result={"framework": "UK ICO", "score": 60, "critical_gaps_count": 0},
+        eu_act_result={"framework": "EU AI Act", "score": 0, "status": "NOT_EVALUATED"},
+        dpa_result=None,
+        iso_result=None,
+        synthesis={
+            "uk_alignment_score": 60,
+            "framework_scores": {"UK ICO": 60},
+            "frameworks_analyzed": ["ICO"],
+            "frameworks_timed_out": ["DPA"],
+            "frameworks_not_evaluated": ["EU_AI_ACT"],
+        },
+    )
+    assert pdf.startswith(b"%PDF")
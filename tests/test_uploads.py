@@ -0,0 +1,55 @@
+import asyncio
+import hashlib
+
+import pytest
+
+from agents import uploads
+from agents.uploads import CHUNK_SIZE, UploadTooLarge, spool_upload
+
+
+class FakeUpload:
+    """UploadFile stand-in that counts how much of the body was read."""
+
+    def __init__(self, data: bytes, filename="lfr.pdf"):
+        self.data = data
+        self.filename = filename
+        self.read_bytes = 0
+
+    async def read(self, size: int) -> bytes:
+        chunk = self.data[self.read_bytes:self.read_bytes + size]
+        self.read_bytes += len(chunk)
+        return chunk
+
+
+def test_spooled_copy_matches_the_upload_and_its_hash():
+    data = b"%PDF" + bytes(range(256)) * 1000
+    spooled = asyncio.run(spool_upload(FakeUpload(data)))
+
+    assert spooled.file.read() == data
+    assert spooled.size == len(data)
+    assert spooled.sha256 == hashlib.sha256(data).hexdigest()
+    assert spooled.filename == "lfr.pdf"
+
+
+def test_small_uploads_stay_in_memory_and_large_ones_roll_to_disk(monkeypatch):
+    monkeypatch.setattr(uploads, "SPOOL_MAX_BYTES", 1024)
+
+    small = asyncio.run(spool_upload(FakeUpload(b"x" * 100)))
+    large = asyncio.run(spool_upload(FakeUpload(b"x" * 4096)))
+
+    assert not small.file._rolled
+    assert large.file._rolled
+
+
+def test_oversized_uploads_stop_reading_after_one_chunk():
+    upload = FakeUpload(b"x" * (CHUNK_SIZE * 10), filename="huge.pdf")
+
+    with pytest.raises(UploadTooLarge, match="huge.pdf"):
+        asyncio.run(spool_upload(upload, max_bytes=CHUNK_SIZE + 1))
+
+    assert upload.read_bytes == CHUNK_SIZE * 2
+
+
+def test_unnamed_uploads_get_a_default_filename():
+    upload = FakeUpload(b"%PDF", filename=None)
+    assert asyncio.run(spool_upload(upload)).filename == "upload.pdf"